@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks of the per-frame Python hot path of p3dopenvr.
+
+The benchmarks run without any headset, using the simulated OpenVR runtime and an offscreen window. The results are
+printed and can be saved as JSON, a previous result can be given as baseline to detect the regressions :
+
+    python3 hotpath.py --output baseline.json
+    python3 hotpath.py --baseline baseline.json --threshold 0.10
+
+When a baseline is given, the script exits with a non-zero status if any benchmark is slower than the baseline by
+more than the threshold.
+"""
+
+from panda3d.core import load_prc_file_data
+
+load_prc_file_data("", "window-type offscreen")
+load_prc_file_data("", "audio-library-name null")
+
+from direct.showbase.ShowBase import ShowBase
+from direct.actor.Actor import Actor
+from panda3d.core import Character, CharacterJoint, PartGroup, NodePath, LMatrix4
+
+from p3dopenvr.p3dopenvr import P3DOpenVR
+from p3dopenvr.simulated import SimulatedBackend, make_pose_matrix
+from p3dopenvr.skeleton import DefaultLeftHandSkeleton
+from p3dopenvr.hand import LeftHand
+
+import argparse
+import json
+import openvr
+import os
+import platform
+import statistics
+import sys
+import time
+
+main_dir = os.path.dirname(os.path.abspath(__file__))
+action_manifest = os.path.join(main_dir, "..", "samples", "manifest", "actions.json")
+
+# Frame budgets, in microseconds, of the common refresh rates
+budgets = {90: 1e6 / 90, 120: 1e6 / 120, 144: 1e6 / 144}
+
+def measure(func, min_time=0.1, repeat=5):
+    """
+    Return the per-call time, in microseconds, of each of the repeated runs of func.
+    The number of calls in a run is calibrated to last at least min_time seconds.
+    """
+
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed <= 0 else max(2, int(min_time / elapsed) + 1)
+    runs = [elapsed / number * 1e6]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        runs.append((time.perf_counter() - start) / number * 1e6)
+    return runs
+
+def make_hand_model(joint_names):
+    """
+    Create a procedural actor with a flat hierarchy of joints using the given names.
+    """
+
+    character = Character('hand')
+    bundle = character.get_bundle(0)
+    skeleton = PartGroup(bundle, '<skeleton>')
+    wrist = None
+    for name in joint_names:
+        parent = wrist if wrist is not None else skeleton
+        joint = CharacterJoint(character, bundle, parent, name, LMatrix4.ident_mat())
+        if wrist is None:
+            wrist = joint
+    root = NodePath('hand')
+    root.attach_new_node(character)
+    return Actor(root, copy=False)
+
+class HotPathBenchmark:
+    def __init__(self, min_time, repeat):
+        self.min_time = min_time
+        self.repeat = repeat
+        self.results = {}
+        self.base = ShowBase()
+        self.backend = SimulatedBackend(render_size=(64, 64), pace=False)
+        self.backend.set_device_pose(0, lambda t: make_pose_matrix(0, 1.7, 0, yaw=t))
+        self.ovr = P3DOpenVR(self.base, verbose=False, backend=self.backend)
+        self.ovr.init(msaa=0, replicate=0)
+        self.actions = self.ovr.load_action_manifest(action_manifest)
+        self.ovr.add_action_set("/actions/default")
+        default = self.actions.default
+        self.backend.set_action(default.GrabGrip.path, lambda t: int(t * 10) % 2 == 0, '/user/hand/left')
+        self.backend.set_action(default.Pose.path, True, '/user/hand/left')
+        self.backend.set_action(default.SkeletonLeftHand.path, lambda t: t % 1.0, '/user/hand/left')
+        # Move the simulation forward to have valid poses and action data
+        self.base.taskMgr.step()
+
+    def run(self, name, func):
+        runs = measure(func, self.min_time, self.repeat)
+        self.results[name] = {'min': min(runs), 'median': statistics.median(runs)}
+        print("{:<40} {:>10.2f} us {:>10.2f} us".format(name, min(runs), statistics.median(runs)))
+
+    def set_device_count(self, count):
+        """
+        Make sure exactly count devices, besides the HMD, are connected and have a valid pose.
+        """
+
+        backend = self.backend
+        for index in range(1, openvr.k_unMaxTrackedDeviceCount):
+            device = backend.devices.get(index)
+            if index <= count:
+                if device is None:
+                    backend.add_device(openvr.TrackedDeviceClass_GenericTracker, 'sim_tracker', 'SIM-{}'.format(index),
+                                       pose=make_pose_matrix(index * 0.1, 1.0, -1.0), index=index)
+                else:
+                    backend.set_device_connected(index, True)
+            elif device is not None:
+                backend.set_device_connected(index, False)
+        # Process the connection events and retrieve the new poses
+        self.base.taskMgr.step()
+
+    def run_conversions(self):
+        pose = self.ovr.poses[openvr.k_unTrackedDeviceIndex_Hmd]
+        matrix = self.ovr.vr_system.getProjectionMatrix(openvr.Eye_Left, 0.1, 100)
+        self.run('convert_mat', lambda: self.ovr.convert_mat(matrix))
+        self.run('get_pose_modelview', lambda: self.ovr.get_pose_modelview(pose))
+        self.run('update_hmd', lambda: self.ovr.update_hmd(pose))
+
+    def run_tracked_devices(self):
+        # The HMD uses the first slot, so at most 63 other devices can be tracked
+        for count in (1, 8, 32, 63):
+            self.set_device_count(count)
+            self.run('update_tracked_devices[{}]'.format(count), self.ovr.update_tracked_devices)
+        self.set_device_count(2)
+
+    def run_events(self):
+        backend = self.backend
+        for burst in (1, 16, 64):
+            def poll():
+                for _ in range(burst):
+                    backend.queue_event(openvr.VREvent_ButtonPress, 1)
+                self.ovr.poll_events()
+            self.run('poll_events[{}]'.format(burst), poll)
+        self.run('poll_events[0]', self.ovr.poll_events)
+
+    def run_actions(self):
+        ovr = self.ovr
+        default = self.actions.default
+        device = ovr.get_input_source_handle('/user/hand/left')
+        self.run('update_action_state', ovr.update_action_state)
+        self.run('get_digital_action_state', lambda: ovr.get_digital_action_state(default.GrabGrip))
+        self.run('get_digital_action_rising_edge', lambda: ovr.get_digital_action_rising_edge(default.GrabGrip, True))
+        self.run('get_analog_action_value', lambda: ovr.get_analog_action_value(default.Squeeze))
+        self.run('get_action_pose', lambda: ovr.get_action_pose(default.Pose, device))
+        self.run('get_skeletal_bone_data', lambda: ovr.get_skeletal_bone_data(default.SkeletonLeftHand))
+
+    def run_hands(self):
+        ovr = self.ovr
+        default = self.actions.default
+        model = make_hand_model(DefaultLeftHandSkeleton.default_joint_map.keys())
+        hand = LeftHand(ovr, model, default.Pose)
+        hand.set_skeleton(DefaultLeftHandSkeleton(ovr, default.SkeletonLeftHand))
+        self.run('HandSkeleton.update', hand.skeleton.update)
+        self.run('Hand.update', hand.update)
+
+    def run_frame(self):
+        self.run('frame', self.base.taskMgr.step)
+        frame = self.results['frame']['median']
+        for (rate, budget) in budgets.items():
+            print("{:<40} {:>10.1f} %".format('frame budget at {} Hz'.format(rate), frame / budget * 100))
+
+    def run_all(self):
+        self.run_conversions()
+        self.run_tracked_devices()
+        self.run_events()
+        self.run_actions()
+        self.run_hands()
+        self.run_frame()
+        return self.results
+
+def compare(results, baseline, threshold):
+    """
+    Print the relative difference of each result with the baseline and return the list of the regressions.
+    """
+
+    regressions = []
+    print()
+    print("{:<40} {:>12} {:>12} {:>8}".format('benchmark', 'baseline', 'current', 'change'))
+    for (name, result) in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            print("{:<40} {:>12} {:>10.2f}us".format(name, '-', result['min']))
+            continue
+        change = result['min'] / reference['min'] - 1
+        print("{:<40} {:>10.2f}us {:>10.2f}us {:>+7.1f}%".format(name, reference['min'], result['min'], change * 100))
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks of the per-frame hot path of p3dopenvr')
+    parser.add_argument('--output', help='Save the results in the given JSON file')
+    parser.add_argument('--baseline', help='Compare the results with the given JSON file')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Maximum allowed slowdown relative to the baseline')
+    parser.add_argument('--min-time', type=float, default=0.1, help='Minimum duration of each run, in seconds')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of runs of each benchmark')
+    args = parser.parse_args()
+
+    benchmark = HotPathBenchmark(args.min_time, args.repeat)
+    results = benchmark.run_all()
+    if args.output:
+        report = {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'unit': 'us',
+            'results': results,
+        }
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("Regressions:", ', '.join(regressions))
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
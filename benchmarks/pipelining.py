@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Headless test harness of the synchronization of p3dopenvr with the threading models of Panda3D.
+
+Each threading model is run in its own process, as the threading model must be configured before the window is
+opened, using the simulated OpenVR runtime and an offscreen window. The HMD of the simulated runtime moves along the
+x axis at one meter per second, so the position of a pose gives the simulated time it was predicted for.
+
+For each submitted frame, the harness checks that :
+
+* The wait and submit calls are strictly alternated and both eyes are submitted once per frame.
+
+* A frame is submitted at each step of the application, except for the frames still in the pipeline.
+
+* The texture bounds submitted are the bounds of the frame, the resolution of the eyes is changed periodically
+  during the run.
+
+* In pipelined mode, the HMD pose submitted with the textures is the pose used by the App thread to render the
+  frame.
+
+The error between the pose used to render a frame and the pose of the display time of the compositor frame it was
+submitted in is also reported :
+
+    python3 pipelining.py
+    python3 pipelining.py --models "" Cull/Draw --frames 500
+    python3 pipelining.py --explicit-timing --post-present-handoff
+
+The script exits with a non-zero status if any check fails.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+main_dir = os.path.dirname(os.path.abspath(__file__))
+
+default_models = ['', 'Cull', '/Draw', 'Cull/Draw']
+
+def run_model(model, frames, warmup, refresh_rate, explicit_timing=False, post_present_handoff=False, scale_period=20):
+    """
+    Run the given threading model in the current process and return the results.
+    """
+
+    from panda3d.core import load_prc_file_data
+
+    load_prc_file_data("", "window-type offscreen")
+    load_prc_file_data("", "audio-library-name null")
+    if model:
+        load_prc_file_data("", "threading-model " + model)
+
+    from direct.showbase.ShowBase import ShowBase
+    from panda3d.core import ClockObject, Thread
+
+    from p3dopenvr.p3dopenvr import P3DOpenVR
+    from p3dopenvr.simulated import SimulatedBackend, make_pose_matrix
+
+    import openvr
+
+    base = ShowBase()
+    clock = ClockObject.get_global_clock()
+    backend = SimulatedBackend(refresh_rate=refresh_rate)
+    backend.set_device_pose(openvr.k_unTrackedDeviceIndex_Hmd, lambda t: make_pose_matrix(t, 1.7, 0))
+    compositor = backend.compositor
+
+    # Simulated time of the display of each compositor frame
+    display_times = {}
+    wait_get_poses = compositor.waitGetPoses
+
+    def recording_wait(render_poses, game_poses):
+        result = wait_get_poses(render_poses, game_poses)
+        display_times[compositor.frame_index] = backend.time
+        return result
+    compositor.waitGetPoses = recording_wait
+
+    # Frame of Panda3D rendered by each submit, as seen from the pipeline stage of the submitting thread
+    submits = []
+    submit = compositor.submit
+
+    def recording_submit(eye, texture, bounds=None, flags=openvr.Submit_Default):
+        frame = clock.get_frame_count(Thread.get_current_thread())
+        submit(eye, texture, bounds, flags)
+        submits.append((frame, compositor.submits[-1]))
+    compositor.submit = recording_submit
+
+    ovr = P3DOpenVR(base=base, verbose=False, backend=backend)
+    ovr.init(replicate=0, max_resolution_scale=1.2, explicit_timing=explicit_timing, post_present_handoff=post_present_handoff)
+
+    # Position of the HMD pose and right bound of the left eye used by the App thread for each frame
+    app_poses = {}
+    app_bounds = {}
+
+    def record_frame_task(task):
+        frame = clock.get_frame_count()
+        ovr.set_resolution_scale(1.0 if (frame // scale_period) % 2 == 0 else 0.8)
+        app_poses[frame] = ovr.poses[openvr.k_unTrackedDeviceIndex_Hmd].mDeviceToAbsoluteTracking.m[0][3]
+        app_bounds[frame] = ovr.left_bounds.uMax
+        return task.cont
+    base.taskMgr.add(record_frame_task, 'record-frame', sort=ovr.get_update_task_sort())
+
+    start = time.perf_counter()
+    for i in range(frames):
+        base.taskMgr.step()
+    elapsed = time.perf_counter() - start
+
+    threading_model = base.graphicsEngine.get_threading_model()
+    result = {
+        'model': model,
+        'pipelined': ovr.pipeline is not None,
+        'depth': threading_model.get_draw_stage(),
+        'frames': compositor.frame_index,
+        'fps': compositor.frame_index / elapsed,
+        'missed_frames': compositor.missed_frames,
+        'protocol_errors': compositor.protocol_errors,
+        'last_protocol_error': compositor.last_protocol_error,
+    }
+
+    # Both eyes must be submitted once in each complete compositor frame
+    eyes = {}
+    for (frame, record) in submits:
+        eyes.setdefault(record[0], []).append(record[1])
+    incomplete = [index for (index, submitted) in eyes.items()
+                  if index < compositor.frame_index and sorted(submitted) != [openvr.Eye_Left, openvr.Eye_Right]]
+    result['incomplete_frames'] = len(incomplete)
+
+    # Check the pairing of the submitted poses and measure the prediction error, after the warmup
+    mismatches = 0
+    bounds_mismatches = 0
+    errors = []
+    for (frame, record) in submits:
+        if frame < warmup or frame not in app_poses:
+            continue
+        app_x = app_poses[frame]
+        pose = record[5]
+        if result['pipelined'] and (pose is None or abs(pose[0][3] - app_x) > 1e-6):
+            mismatches += 1
+        if record[1] == openvr.Eye_Left and abs(record[3][2] - app_bounds[frame]) > 1e-6:
+            bounds_mismatches += 1
+        display_time = display_times.get(record[0])
+        if display_time is not None:
+            errors.append(abs(app_x - display_time) * 1000.0)
+    result['pose_mismatches'] = mismatches
+    result['bounds_mismatches'] = bounds_mismatches
+    result['mean_error_ms'] = statistics.mean(errors) if errors else 0.0
+    result['max_error_ms'] = max(errors) if errors else 0.0
+    result['ok'] = (result['protocol_errors'] == 0 and result['incomplete_frames'] == 0 and mismatches == 0 and
+                    bounds_mismatches == 0 and result['frames'] >= frames - 2 * (result['depth'] + 1) and
+                    result['pipelined'] == (result['depth'] > 0))
+    base.destroy()
+    return result
+
+def run_process(model, args):
+    """
+    Run the given threading model in a new process and return the results.
+    """
+
+    command = [sys.executable, os.path.abspath(__file__), '--run', model,
+               '--frames', str(args.frames), '--warmup', str(args.warmup), '--refresh-rate', str(args.refresh_rate)]
+    if args.explicit_timing:
+        command.append('--explicit-timing')
+    if args.post_present_handoff:
+        command.append('--post-present-handoff')
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.join(main_dir, '..'), env.get('PYTHONPATH')]))
+    output = subprocess.run(command, env=env, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    for line in reversed(output.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    return {'model': model, 'ok': False, 'last_protocol_error': 'The process failed'}
+
+def main():
+    parser = argparse.ArgumentParser(description='Test harness of the threading models of Panda3D with p3dopenvr')
+    parser.add_argument('--models', nargs='*', default=default_models, help='Threading models to run')
+    parser.add_argument('--frames', type=int, default=300, help='Number of frames of each run')
+    parser.add_argument('--warmup', type=int, default=10, help='Number of frames ignored at the start of each run')
+    parser.add_argument('--refresh-rate', type=float, default=90.0, help='Refresh rate of the simulated HMD')
+    parser.add_argument('--explicit-timing', action='store_true', help='Use the explicit timing mode of the compositor')
+    parser.add_argument('--post-present-handoff', action='store_true', help='Call postPresentHandoff() after the submit')
+    parser.add_argument('--output', help='Save the results in the given JSON file')
+    parser.add_argument('--run', metavar='MODEL', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run is not None:
+        print(json.dumps(run_model(args.run, args.frames, args.warmup, args.refresh_rate,
+                                   args.explicit_timing, args.post_present_handoff)))
+        return
+
+    results = [run_process(model, args) for model in args.models]
+    print("{:<12} {:>6} {:>8} {:>8} {:>9} {:>10} {:>10} {:>10} {:>12} {:>12}  {}".format(
+        'Model', 'Depth', 'Frames', 'FPS', 'Protocol', 'Incomplete', 'Pose', 'Bounds', 'Mean error', 'Max error',
+        'Result'))
+    for result in results:
+        if 'frames' not in result:
+            print("{:<12} {}".format(repr(result['model']), result['last_protocol_error']))
+            continue
+        print("{:<12} {:>6} {:>8} {:>8.1f} {:>9} {:>10} {:>10} {:>10} {:>10.2f}ms {:>10.2f}ms  {}".format(
+            repr(result['model']), result['depth'], result['frames'], result['fps'], result['protocol_errors'],
+            result['incomplete_frames'], result['pose_mismatches'], result['bounds_mismatches'],
+            result['mean_error_ms'], result['max_error_ms'], 'OK' if result['ok'] else 'FAILED'))
+        if result['last_protocol_error']:
+            print("    Last protocol error:", result['last_protocol_error'])
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    if not all(result['ok'] for result in results):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
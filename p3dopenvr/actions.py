@@ -0,0 +1,452 @@
+import json
+import openvr
+
+class ActionSet:
+    """
+    An action set registered to be updated each frame, together with its activation parameters.
+    Any modification of the parameters is applied on the next update of the action state.
+    """
+
+    def __init__(self, ovr, path, handle, priority=0, secondary_action_set=openvr.k_ulInvalidActionSetHandle,
+                 restricted_device=openvr.k_ulInvalidInputValueHandle, enabled=True):
+        """
+        * ovr : Reference to the instance of P3DOpenVR.
+
+        * path : Full path of the action set
+
+        * handle : OpenVR handle of the action set
+
+        * priority : Priority of the action set, see nPriority in VRActiveActionSet_t
+
+        * secondary_action_set : Handle of the secondary action set, see ulSecondaryActionSet in VRActiveActionSet_t
+
+        * restricted_device : Handle of the input source to which the action set is restricted,
+          see ulRestrictedToDevice in VRActiveActionSet_t
+
+        * enabled : If False, the action set is registered but not updated.
+        """
+
+        self.ovr = ovr
+        self.path = path
+        self.handle = handle
+        self.priority = priority
+        self.secondary_action_set = secondary_action_set
+        self.restricted_device = restricted_device
+        self.enabled = enabled
+
+    def set_enabled(self, enabled):
+        """
+        Enable or disable the update of this action set.
+        """
+
+        if enabled != self.enabled:
+            self.enabled = enabled
+            self.ovr.invalidate_action_sets()
+
+    def set_priority(self, priority):
+        """
+        Change the priority of this action set.
+        """
+
+        if priority != self.priority:
+            self.priority = priority
+            self.ovr.invalidate_action_sets()
+
+    def set_secondary_action_set(self, secondary_action_set):
+        """
+        Change the secondary action set, use openvr.k_ulInvalidActionSetHandle to remove it.
+        """
+
+        if secondary_action_set != self.secondary_action_set:
+            self.secondary_action_set = secondary_action_set
+            self.ovr.invalidate_action_sets()
+
+    def set_restricted_device(self, restricted_device):
+        """
+        Restrict this action set to the given input source, use openvr.k_ulInvalidInputValueHandle to remove the
+        restriction.
+        """
+
+        if restricted_device != self.restricted_device:
+            self.restricted_device = restricted_device
+            self.ovr.invalidate_action_sets()
+
+    def fill(self, active_action_set):
+        """
+        Copy the parameters of this action set into the given VRActiveActionSet_t.
+        """
+
+        active_action_set.ulActionSet = self.handle
+        active_action_set.ulRestrictedToDevice = self.restricted_device
+        active_action_set.ulSecondaryActionSet = self.secondary_action_set
+        active_action_set.nPriority = self.priority
+
+class DigitalActionSample:
+    """
+    State of a digital action sampled once per frame, with the edge detection precomputed.
+    """
+
+    __slots__ = ('data', 'active', 'state', 'rising_edge', 'falling_edge', 'origin')
+
+    def __init__(self, data):
+        """
+        * data : The InputDigitalActionData_t returned by OpenVR
+        """
+
+        self.data = data
+        self.active = bool(data.bActive)
+        self.origin = data.activeOrigin
+        changed = self.active and bool(data.bChanged)
+        self.state = self.active and bool(data.bState)
+        self.rising_edge = changed and self.state
+        self.falling_edge = changed and not data.bState
+
+class InputSnapshot:
+    """
+    Per-frame cache of the state of the actions.
+
+    The registered actions are sampled once right after the update of the action state, any other action is sampled
+    on its first access in the frame. All the readers of an action during a frame share the same sample, so only one
+    call is made to OpenVR per action and per frame.
+    """
+
+    digital = 'digital'
+    analog = 'analog'
+    pose = 'pose'
+    skeletal = 'skeletal'
+
+    def __init__(self, vr_input):
+        """
+        * vr_input : The OpenVR IVRInput interface
+        """
+
+        self.vr_input = vr_input
+        self.registered_actions = {}
+        self.registered_action_sets = {}
+        self.digital_samples = {}
+        self.analog_samples = {}
+        self.pose_samples = {}
+        self.skeletal_samples = {}
+        self.summary_samples = {}
+        self.origin_device_paths = {}
+
+    def register(self, action, action_type, device=openvr.k_ulInvalidInputValueHandle, action_set=None):
+        """
+        Register an action to be sampled each frame.
+
+        * action : OpenVR handle of the action
+
+        * action_type : One of InputSnapshot.digital, analog, pose or skeletal
+
+        * device : For pose actions, handle of the device to which the pose is restricted.
+
+        * action_set : ActionSet instance of the action, if any. The action is not sampled while the set is disabled.
+        """
+
+        devices = self.registered_actions.setdefault((action, action_type), set())
+        if action_type == self.pose:
+            devices.add(device)
+        if action_set is not None:
+            self.registered_action_sets[(action, action_type)] = action_set
+
+    def unregister(self, action, action_type):
+        """
+        Remove the given action from the list of actions sampled each frame.
+        """
+
+        self.registered_actions.pop((action, action_type), None)
+        self.registered_action_sets.pop((action, action_type), None)
+
+    def clear(self):
+        """
+        Invalidate all the samples, this must be called each time the action state is updated.
+        """
+
+        self.digital_samples.clear()
+        self.analog_samples.clear()
+        self.pose_samples.clear()
+        self.skeletal_samples.clear()
+        self.summary_samples.clear()
+        self.origin_device_paths.clear()
+
+    def update(self):
+        """
+        Invalidate the previous samples and sample all the registered actions of the enabled action sets.
+        """
+
+        self.clear()
+        for ((action, action_type), devices) in self.registered_actions.items():
+            action_set = self.registered_action_sets.get((action, action_type))
+            if action_set is not None and not action_set.enabled:
+                continue
+            if action_type == self.digital:
+                self.get_digital(action)
+            elif action_type == self.analog:
+                self.get_analog(action)
+            elif action_type == self.pose:
+                for device in devices:
+                    self.get_pose(action, device)
+            elif action_type == self.skeletal:
+                self.get_skeletal(action)
+
+    def get_digital(self, action):
+        """
+        Return the DigitalActionSample of the given action for the current frame.
+        """
+
+        sample = self.digital_samples.get(action)
+        if sample is None:
+            sample = DigitalActionSample(self.vr_input.getDigitalActionData(action, openvr.k_ulInvalidInputValueHandle))
+            self.digital_samples[action] = sample
+        return sample
+
+    def get_analog(self, action):
+        """
+        Return the InputAnalogActionData_t of the given action for the current frame.
+        """
+
+        sample = self.analog_samples.get(action)
+        if sample is None:
+            sample = self.vr_input.getAnalogActionData(action, openvr.k_ulInvalidInputValueHandle)
+            self.analog_samples[action] = sample
+        return sample
+
+    def get_pose(self, action, device=openvr.k_ulInvalidInputValueHandle):
+        """
+        Return the InputPoseActionData_t of the given action and device for the next frame.
+        """
+
+        key = (action, device)
+        sample = self.pose_samples.get(key)
+        if sample is None:
+            sample = self.vr_input.getPoseActionDataForNextFrame(action, openvr.TrackingUniverseStanding, device)
+            self.pose_samples[key] = sample
+        return sample
+
+    def get_skeletal(self, action):
+        """
+        Return the InputSkeletalActionData_t of the given action for the current frame.
+        """
+
+        sample = self.skeletal_samples.get(action)
+        if sample is None:
+            sample = self.vr_input.getSkeletalActionData(action)
+            self.skeletal_samples[action] = sample
+        return sample
+
+    def get_summary(self, action, summary_type=openvr.VRSummaryType_FromAnimation):
+        """
+        Return the VRSkeletalSummaryData_t of the given skeletal action for the current frame.
+        """
+
+        key = (action, summary_type)
+        sample = self.summary_samples.get(key)
+        if sample is None:
+            sample = self.vr_input.getSkeletalSummaryData(action, summary_type)
+            self.summary_samples[key] = sample
+        return sample
+
+    def get_origin_device_path(self, origin):
+        """
+        Return the handle of the device path of the given action origin, the result is cached for the current frame.
+        """
+
+        device_path = self.origin_device_paths.get(origin)
+        if device_path is None:
+            origin_info = self.vr_input.getOriginTrackedDeviceInfo(origin)
+            device_path = origin_info.devicePath
+            self.origin_device_paths[origin] = device_path
+        return device_path
+
+class Action(int):
+    """
+    Handle of an action resolved from the action manifest. As it is an int, it can be used directly wherever an
+    OpenVR action handle is expected.
+    """
+
+    def __new__(cls, handle, path, action_type):
+        action = int.__new__(cls, handle)
+        action.path = path
+        action.name = path.rsplit('/', 1)[-1]
+        action.type = action_type
+        return action
+
+    @property
+    def handle(self):
+        return int(self)
+
+    def __repr__(self):
+        return "Action('{}', {}, {})".format(self.path, self.type, int(self))
+
+class ActionTable:
+    """
+    Attribute-accessible table of actions, accessing an unknown action raises an AttributeError.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._actions = {}
+
+    def _add(self, action):
+        if action.name in self.__dict__ or hasattr(type(self), action.name):
+            raise ValueError("Action '{}' in '{}' collides with an attribute of the table".format(action.path, self._name))
+        self._actions.setdefault(action.name, action)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self._actions[name]
+        except KeyError:
+            raise AttributeError("Unknown action '{}' in '{}'".format(name, self._name)) from None
+
+    def __iter__(self):
+        return iter(self._actions.values())
+
+    def __len__(self):
+        return len(self._actions)
+
+    def __contains__(self, name):
+        return name in self._actions
+
+class ActionSetTable(ActionTable):
+    """
+    Action set resolved from the action manifest. The actions of the set are available as attributes, using the
+    last component of their path, and are also grouped by type, e.g. action_set.boolean.GrabGrip
+    """
+
+    action_types = ('boolean', 'vector1', 'vector2', 'vector3', 'vibration', 'pose', 'skeleton')
+
+    def __init__(self, handle, path):
+        ActionTable.__init__(self, path)
+        self.handle = handle
+        self.path = path
+        self.name = path.rsplit('/', 1)[-1]
+        for action_type in self.action_types:
+            setattr(self, action_type, ActionTable(path + ':' + action_type))
+
+    def _add(self, action):
+        if action.type not in self.action_types:
+            raise ValueError("Unknown type '{}' of action '{}'".format(action.type, action.path))
+        ActionTable._add(self, action)
+        getattr(self, action.type)._add(action)
+
+    def get_snapshot_type(self, action):
+        """
+        Return the type of sample of the given action in InputSnapshot, or None if the action is not sampled.
+        """
+
+        if action.type == 'boolean':
+            return InputSnapshot.digital
+        elif action.type in ('vector1', 'vector2', 'vector3'):
+            return InputSnapshot.analog
+        elif action.type == 'skeleton':
+            return InputSnapshot.skeletal
+        return None
+
+    def register_actions(self, input_snapshot, action_set=None):
+        """
+        Register all the input actions of this set to be sampled each frame in the given input snapshot, while the
+        given ActionSet instance, if any, is enabled.
+        Pose actions are not registered as they depend on the device they are restricted to.
+        """
+
+        for action in self:
+            snapshot_type = self.get_snapshot_type(action)
+            if snapshot_type is not None:
+                input_snapshot.register(action, snapshot_type, action_set=action_set)
+
+    def unregister_actions(self, input_snapshot):
+        """
+        Remove all the input actions of this set from the actions sampled each frame in the given input snapshot.
+        """
+
+        for action in self:
+            snapshot_type = self.get_snapshot_type(action)
+            if snapshot_type is not None:
+                input_snapshot.unregister(action, snapshot_type)
+
+class ActionManifest:
+    """
+    Content of an action manifest with all the handles of the action sets, actions and input sources resolved once.
+    The action sets are available as attributes, using the last component of their path, e.g.
+    manifest.default.GrabGrip is the handle of '/actions/default/in/GrabGrip'.
+    """
+
+    default_input_sources = ('/user/head', '/user/hand/left', '/user/hand/right', '/user/gamepad', '/user/treadmill', '/user/stylus')
+
+    def __init__(self, vr_input, filename):
+        """
+        * vr_input : The OpenVR IVRInput interface
+
+        * filename : Path to the action manifest, it must be the manifest given to setActionManifestPath()
+        """
+
+        self.vr_input = vr_input
+        self.filename = filename
+        self.action_sets = {}
+        self.actions = {}
+        self.input_sources = {}
+        with open(filename) as manifest_file:
+            manifest = json.load(manifest_file)
+        for action_set_desc in manifest.get('action_sets', []):
+            self.add_action_set(action_set_desc['name'])
+        for action_desc in manifest.get('actions', []):
+            path = action_desc['name']
+            action_set_path = path.rsplit('/', 2)[0]
+            action_set = self.add_action_set(action_set_path)
+            action = Action(vr_input.getActionHandle(path), path, action_desc.get('type', 'boolean'))
+            self.actions[path.lower()] = action
+            action_set._add(action)
+        for input_source in self.default_input_sources:
+            self.get_input_source(input_source)
+
+    def add_action_set(self, path):
+        """
+        Return the resolved action set with the given full path, its handle is resolved when it is first added.
+        """
+
+        action_set = self.action_sets.get(path.lower())
+        if action_set is None:
+            action_set = ActionSetTable(self.vr_input.getActionSetHandle(path), path)
+            self.action_sets[path.lower()] = action_set
+        return action_set
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        for action_set in self.action_sets.values():
+            if action_set.name == name:
+                return action_set
+        raise AttributeError("Unknown action set '{}' in '{}'".format(name, self.filename))
+
+    def get_action_set(self, path):
+        """
+        Return the resolved action set with the given full path, raise a KeyError if it is not in the manifest.
+        """
+
+        try:
+            return self.action_sets[path.lower()]
+        except KeyError:
+            raise KeyError("Unknown action set '{}' in '{}'".format(path, self.filename)) from None
+
+    def get_action(self, path):
+        """
+        Return the resolved action with the given full path, raise a KeyError if it is not in the manifest.
+        """
+
+        try:
+            return self.actions[path.lower()]
+        except KeyError:
+            raise KeyError("Unknown action '{}' in '{}'".format(path, self.filename)) from None
+
+    def get_input_source(self, path):
+        """
+        Return the handle of the given input source, the handle is resolved only once.
+        """
+
+        handle = self.input_sources.get(path)
+        if handle is None:
+            handle = self.vr_input.getInputSourceHandle(path)
+            self.input_sources[path] = handle
+        return handle
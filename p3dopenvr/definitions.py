@@ -32,3 +32,8 @@ class HandSkeletonBone(IntEnum):
     Aux_MiddleFinger = 28
     Aux_RingFinger = 29
     Aux_PinkyFinger = 30
+
+class HandSkeletonLOD(IntEnum):
+    Full = 0
+    Summary = 1
+    Frozen = 2
@@ -0,0 +1,324 @@
+"""
+Flight recorder keeping the timeline of the last frames and dumping it to disk when a hitch is detected.
+
+Each frame is recorded in a preallocated slot of a ring buffer as a handful of timestamps and counters, so the
+recorder can stay enabled in production. A dump is triggered when the compositor reports a dropped or reprojected
+frame, or when the interval between two frames exceeds the configured budget.
+"""
+
+from panda3d.core import AsyncTaskManager
+
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+
+class FlightRecorder:
+    """
+    Ring buffer of the timeline of the last frames.
+    """
+
+    # Fields of a frame slot, the timestamps are in seconds from time.perf_counter()
+    frame = 0
+    wait_start = 1
+    wait_end = 2
+    poses_end = 3
+    events_end = 4
+    hmd_end = 5
+    devices_end = 6
+    actions_end = 7
+    draw_left_start = 8
+    draw_left_end = 9
+    draw_right_start = 10
+    draw_right_end = 11
+    submit_left_start = 12
+    submit_left_end = 13
+    submit_right_start = 14
+    submit_right_end = 15
+    event_count = 16
+    device_count = 17
+    compositor_frame = 18
+    application_gpu_ms = 19
+    compositor_cpu_ms = 20
+    dropped_frames = 21
+    reprojection_flags = 22
+    field_count = 23
+
+    # Number of frames ignored after the recorder is enabled, the first frames are usually slow to load the
+    # shaders and textures
+    warmup_frames = 10
+
+    # Durations reported in the dump, as (name, start field, end field)
+    durations = (
+        ('wait_ms', wait_start, wait_end),
+        ('poses_ms', wait_end, poses_end),
+        ('events_ms', poses_end, events_end),
+        ('hmd_ms', events_end, hmd_end),
+        ('devices_ms', hmd_end, devices_end),
+        ('actions_ms', devices_end, actions_end),
+        ('draw_left_ms', draw_left_start, draw_left_end),
+        ('draw_right_ms', draw_right_start, draw_right_end),
+        ('submit_left_ms', submit_left_start, submit_left_end),
+        ('submit_right_ms', submit_right_start, submit_right_end),
+    )
+
+    def __init__(self, ovr, size=256, budget_ms=None, dump_dir='.', cooldown=10.0, watchdog=True, long_task_ms=2.0):
+        """
+        * ovr : Reference to the instance of P3DOpenVR.
+
+        * size : Number of frames kept in the ring buffer.
+
+        * budget_ms : Maximum interval between two frames, in milliseconds, before a dump is triggered.
+          If None, only the compositor reports trigger a dump.
+
+        * dump_dir : Directory in which the dumps are written.
+
+        * cooldown : Minimum delay between two dumps, in seconds.
+
+        * watchdog : If True and a budget is set, a background thread captures the Python stacks of the main thread
+          while a frame exceeds the budget, so the long-running code can be identified in the dump.
+
+        * long_task_ms : Tasks whose last run took longer than this are reported in the dump.
+        """
+
+        self.ovr = ovr
+        self.size = size
+        self.budget_ms = budget_ms
+        self.dump_dir = dump_dir
+        self.cooldown = cooldown
+        self.long_task_ms = long_task_ms
+        self.slots = [[0.0] * self.field_count for _ in range(size)]
+        self.empty_slot = [0.0] * self.field_count
+        self.index = 0
+        self.current = self.slots[0]
+        self.frames = 0
+        self.wait_start_time = 0.0
+        self.last_compositor_frame = 0
+        self.last_dump = None
+        self.dumps = []
+        self.dump_handler = None
+        self.main_thread_id = threading.get_ident()
+        self.stacks = []
+        self.watchdog = None
+        self.watchdog_stop = threading.Event()
+        if watchdog and budget_ms is not None:
+            self.watchdog = threading.Thread(target=self.watchdog_loop, name='openvr-flight-recorder', daemon=True)
+            self.watchdog.start()
+
+    def get_budget(self):
+        """
+        Return the frame budget in seconds.
+        """
+
+        if self.budget_ms is not None:
+            return self.budget_ms / 1000.0
+        return None
+
+    def set_dump_handler(self, dump_handler):
+        """
+        Register a handler called with the name of each written dump. The handler is called from the thread writing
+        the dump.
+        """
+
+        self.dump_handler = dump_handler
+
+    def stop(self):
+        """
+        Stop the watchdog thread, if started.
+        """
+
+        self.watchdog_stop.set()
+        if self.watchdog is not None:
+            self.watchdog.join()
+            self.watchdog = None
+
+    def begin_wait(self):
+        """
+        Called just before waitGetPoses()
+        """
+
+        self.wait_start_time = time.perf_counter()
+
+    def end_wait(self):
+        """
+        Called just after waitGetPoses(), the previous frame is complete and checked against the budget, then a new
+        slot is used for the new frame.
+        """
+
+        now = time.perf_counter()
+        previous = self.current
+        budget = self.get_budget()
+        if budget is not None and self.frames > 0 and now - previous[self.wait_end] > budget:
+            self.trigger('budget', "Frame interval {:.2f} ms".format((now - previous[self.wait_end]) * 1000.0))
+        self.frames += 1
+        self.index = (self.index + 1) % self.size
+        current = self.slots[self.index]
+        current[:] = self.empty_slot
+        current[self.frame] = self.frames
+        current[self.wait_start] = self.wait_start_time
+        current[self.wait_end] = now
+        self.current = current
+
+    def stamp(self, field, slot=None):
+        """
+        Record the current time in the given field of the current frame, or of the given slot. With a pipelined
+        threading model, the Draw thread renders an older frame than the App thread and stamps the slot of that frame.
+        """
+
+        if slot is None:
+            slot = self.current
+        slot[field] = time.perf_counter()
+
+    def record_counts(self, event_count, device_count):
+        """
+        Record the number of events processed and of active devices during the current frame.
+        """
+
+        current = self.current
+        current[self.event_count] = event_count
+        current[self.device_count] = device_count
+
+    def record_compositor(self, compositor_stats):
+        """
+        Record the last frame timing reported by the compositor and trigger a dump if the frame was dropped or
+        reprojected.
+        """
+
+        current = self.current
+        current[self.compositor_frame] = compositor_stats.frame_index
+        current[self.application_gpu_ms] = compositor_stats.application_gpu_ms
+        current[self.compositor_cpu_ms] = compositor_stats.compositor_cpu_ms
+        current[self.dropped_frames] = compositor_stats.dropped_frames
+        current[self.reprojection_flags] = compositor_stats.reprojection_flags
+        if compositor_stats.frame_index != self.last_compositor_frame:
+            self.last_compositor_frame = compositor_stats.frame_index
+            if compositor_stats.dropped_frames > 0:
+                self.trigger('dropped', "{} dropped frames".format(compositor_stats.dropped_frames))
+            elif compositor_stats.reprojected:
+                self.trigger('reprojected', "Reprojection flags {:#x}".format(compositor_stats.reprojection_flags))
+
+    def watchdog_loop(self):
+        """
+        Capture the stack of the main thread once per frame when the frame exceeds the budget.
+        """
+
+        captured_frame = None
+        budget = self.get_budget()
+        while not self.watchdog_stop.is_set():
+            self.watchdog_stop.wait(budget / 2)
+            current = self.current
+            frame = current[self.frame]
+            if frame == captured_frame or current[self.wait_end] == 0.0:
+                continue
+            elapsed = time.perf_counter() - current[self.wait_end]
+            if elapsed > budget:
+                captured_frame = frame
+                stack_frame = sys._current_frames().get(self.main_thread_id)
+                if stack_frame is not None:
+                    stack = traceback.format_stack(stack_frame)
+                    self.stacks.append({'frame': int(frame), 'elapsed_ms': elapsed * 1000.0, 'stack': stack})
+                    del self.stacks[:-8]
+
+    def trigger(self, reason, details):
+        """
+        Dump the ring buffer, unless a dump was written less than cooldown seconds ago.
+        """
+
+        if self.frames <= self.warmup_frames:
+            return None
+        now = time.monotonic()
+        if self.last_dump is not None and now - self.last_dump < self.cooldown:
+            return None
+        self.last_dump = now
+        return self.dump(reason, details)
+
+    def get_frames(self):
+        """
+        Return the recorded frames, from the oldest to the newest, with the duration of each stage in milliseconds.
+        """
+
+        frames = []
+        for i in range(1, self.size + 1):
+            slot = self.slots[(self.index + i) % self.size]
+            if slot[self.frame] == 0:
+                continue
+            record = {
+                'frame': int(slot[self.frame]),
+                'time': slot[self.wait_start],
+                'event_count': int(slot[self.event_count]),
+                'device_count': int(slot[self.device_count]),
+                'compositor_frame': int(slot[self.compositor_frame]),
+                'application_gpu_ms': slot[self.application_gpu_ms],
+                'compositor_cpu_ms': slot[self.compositor_cpu_ms],
+                'dropped_frames': int(slot[self.dropped_frames]),
+                'reprojection_flags': int(slot[self.reprojection_flags]),
+            }
+            for (name, start, end) in self.durations:
+                if slot[start] != 0.0 and slot[end] != 0.0:
+                    record[name] = (slot[end] - slot[start]) * 1000.0
+            frames.append(record)
+        for (previous, record) in zip(frames, frames[1:]):
+            record['interval_ms'] = (record['time'] - previous['time']) * 1000.0
+        return frames
+
+    def get_task_timings(self):
+        """
+        Return the timing of the tasks whose last run was longer than long_task_ms.
+        """
+
+        tasks = []
+        for task in AsyncTaskManager.get_global_ptr().get_tasks():
+            if task.get_dt() * 1000.0 < self.long_task_ms:
+                continue
+            timing = {
+                'name': task.get_name(),
+                'dt_ms': task.get_dt() * 1000.0,
+                'max_dt_ms': task.get_max_dt() * 1000.0,
+                'average_dt_ms': task.get_average_dt() * 1000.0,
+            }
+            function = getattr(task, 'get_function', None)
+            if function is not None:
+                code = getattr(function(), '__code__', None)
+                if code is not None:
+                    timing['function'] = "{}:{} {}".format(code.co_filename, code.co_firstlineno, code.co_name)
+            tasks.append(timing)
+        tasks.sort(key=lambda timing: timing['dt_ms'], reverse=True)
+        return tasks
+
+    def dump(self, reason='manual', details=''):
+        """
+        Write the content of the ring buffer, the timing of the long tasks and the captured stacks into a JSON file.
+        The data is collected immediately and written by a background thread. Return the name of the file.
+        """
+
+        data = {
+            'reason': reason,
+            'details': details,
+            'time': time.time(),
+            'budget_ms': self.budget_ms,
+            'frames': self.get_frames(),
+            'tasks': self.get_task_timings(),
+            'stacks': list(self.stacks),
+        }
+        filename = os.path.join(self.dump_dir, 'openvr-flight-{}-{}.json'.format(time.strftime('%Y%m%d-%H%M%S'), self.frames))
+        self.dumps.append(filename)
+        thread = threading.Thread(target=self.write_dump, args=(filename, data), name='openvr-flight-dump')
+        thread.start()
+        return filename
+
+    def write_dump(self, filename, data):
+        """
+        Write the collected data into the given file and notify the dump handler, if any. Called from the dump thread.
+        """
+
+        try:
+            os.makedirs(self.dump_dir, exist_ok=True)
+            with open(filename, 'w') as dump_file:
+                json.dump(data, dump_file, indent=1)
+        except OSError as e:
+            print("Could not write flight recorder dump:", e)
+            return
+        if self.dump_handler is not None:
+            self.dump_handler(filename)
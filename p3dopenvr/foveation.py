@@ -0,0 +1,217 @@
+from panda3d.core import NodePath, CardMaker, Camera, MatrixLens, OrthographicLens, TextureStage, BitMask32
+from panda3d.core import GeomVertexData, GeomVertexFormat, GeomVertexWriter, GeomTriangles, GeomNode, Geom, InternalName
+
+from .hiddenarea import crop_hidden_area_vertices, make_crop_mat
+
+class FoveatedRenderer:
+    """
+    Fixed foveated rendering of one eye.
+
+    The periphery of the eye is rendered at a lower resolution with the eye camera, while the center, around the
+    optical axis of the lens, is rendered at full resolution by a second camera whose projection is cropped to the
+    center region. Both images are then composited into the eye texture that is submitted to OpenVR.
+
+    The center region is masked out of the periphery pass with a quad written at the near plane, like the hidden area
+    mesh, so the early-z test discards the pixels that would be overwritten by the center image.
+
+    The eye cameras use the camera mask bit of their eye, 0 for the left eye and 1 for the right eye, the center
+    cameras use the bit 2 for the left eye and 3 for the right eye.
+    """
+
+    center_cameras_mask = BitMask32.bit(2) | BitMask32.bit(3)
+
+    def __init__(self, ovr, name, eye, camera, width, height, msaa, callback, center_size=0.5, periphery_scale=0.5):
+        """
+        * ovr : Reference to the instance of P3DOpenVR.
+
+        * name : Prefix of the name of the buffers.
+
+        * eye : The OpenVR eye rendered.
+
+        * camera : The eye camera, used to render the periphery. The center camera is attached to the same parent.
+
+        * width, height : Size of the submitted eye texture.
+
+        * msaa : Multisampling level of the periphery and center buffers.
+
+        * callback : Draw callback attached to the composite pass, it is called once the eye texture is complete.
+
+        * center_size : Size of the center region, as a fraction of the width and height of the eye.
+
+        * periphery_scale : Resolution of the periphery relative to the resolution of the eye.
+        """
+
+        self.ovr = ovr
+        self.eye = eye
+        self.camera = camera
+        self.center_size = center_size
+        self.periphery_scale = periphery_scale
+        self.camera_bit = eye
+        self.center_bit = 2 + eye
+        self.hidden_area_mesh_np = None
+        camera.node().set_camera_mask(BitMask32.bit(self.camera_bit))
+
+        # Center region in normalized device coordinates, snapped to the pixels of the eye texture
+        self.region = self.get_center_region(width, height)
+        x_min, x_max, y_min, y_max = self.region
+        center_width = max(1, int(round((x_max - x_min) / 2 * width)))
+        center_height = max(1, int(round((y_max - y_min) / 2 * height)))
+        periphery_width = max(1, int(round(width * periphery_scale)))
+        periphery_height = max(1, int(round(height * periphery_scale)))
+
+        # Periphery pass, using the eye camera at a lower resolution
+        self.periphery_texture = ovr.create_render_texture()
+        buffer = ovr.create_render_buffer(name + '-periphery-buffer', self.periphery_texture, periphery_width, periphery_height, msaa)
+        self.periphery_dr = ovr.create_display_region(buffer, camera, None)
+        self.attach_center_mask(periphery_width, periphery_height)
+
+        # Center pass, using a camera whose projection is cropped to the center region
+        center_cam_node = Camera(name + '-center-cam')
+        center_cam_node.set_lens(MatrixLens())
+        center_cam_node.set_camera_mask(BitMask32.bit(self.center_bit))
+        self.center_cam = camera.get_parent().attach_new_node(center_cam_node)
+        self.update_projection(camera.node().get_lens().get_user_mat())
+        self.center_texture = ovr.create_render_texture()
+        buffer = ovr.create_render_buffer(name + '-center-buffer', self.center_texture, center_width, center_height, msaa)
+        self.center_dr = ovr.create_display_region(buffer, self.center_cam, None)
+
+        # Composite pass, drawing both images into the eye texture
+        self.composite_root = NodePath(name + '-composite')
+        self.composite_root.set_depth_test(0)
+        self.composite_root.set_depth_write(0)
+        cm = CardMaker(name + '-periphery-quad')
+        cm.set_frame_fullscreen_quad()
+        self.periphery_quad = self.composite_root.attach_new_node(cm.generate())
+        self.periphery_quad.set_texture(self.periphery_texture)
+        self.periphery_quad.set_bin('fixed', 0)
+        cm = CardMaker(name + '-center-quad')
+        cm.set_frame(x_min, x_max, y_min, y_max)
+        self.center_quad = self.composite_root.attach_new_node(cm.generate())
+        self.center_quad.set_texture(self.center_texture)
+        self.center_quad.set_bin('fixed', 1)
+        lens = OrthographicLens()
+        lens.set_film_size(2, 2)
+        lens.set_near_far(-1000, 1000)
+        composite_cam = self.composite_root.attach_new_node(Camera(name + '-composite-cam', lens))
+        self.texture = ovr.create_render_texture()
+        buffer = ovr.create_buffer(name + '-buffer', self.texture, width, height, None)
+        ovr.buffers.append(buffer)
+        self.display_region = ovr.create_display_region(buffer, composite_cam, callback)
+
+    def get_center_region(self, width, height):
+        """
+        Return the region, as (x_min, x_max, y_min, y_max) in normalized device coordinates, centered on the optical
+        axis of the lens and aligned on the pixels of the eye texture.
+        """
+
+        projection = self.ovr.vr_system.getProjectionMatrix(self.eye, self.ovr.near, self.ovr.far)
+        # The optical axis (0, 0, -1) is projected at (-m[0][2], -m[1][2])
+        center_x = -projection.m[0][2]
+        center_y = -projection.m[1][2]
+        return (self.snap_range(center_x, self.center_size, width) +
+                self.snap_range(center_y, self.center_size, height))
+
+    def snap_range(self, center, size, pixels):
+        """
+        Return the range of the given size around center, in [-1, 1] and aligned on the pixels.
+        """
+
+        length = max(1, min(pixels, int(round(size * pixels))))
+        start = int(round((center + 1) / 2 * pixels - length / 2))
+        start = min(max(start, 0), pixels - length)
+        return (start / pixels * 2 - 1, (start + length) / pixels * 2 - 1)
+
+    def get_crop_mat(self):
+        """
+        Return the matrix mapping the center region to the whole clip space.
+        """
+
+        return make_crop_mat(self.region)
+
+    def update_projection(self, projection_mat):
+        """
+        Update the lens of the center camera from the projection matrix of the eye.
+        """
+
+        self.center_cam.node().get_lens().set_user_mat(projection_mat * self.get_crop_mat())
+
+    def create_clip_space_node(self, name, vertices, triangles):
+        """
+        Create a mesh from the given (x, y) vertices in clip space, placed on the near plane, and the given triangles,
+        as triplets of vertex indices.
+        """
+
+        node = GeomNode(name)
+        gvd = GeomVertexData('gvd', GeomVertexFormat.get_v3(), Geom.UH_static)
+        gvw = GeomVertexWriter(gvd, InternalName.get_vertex())
+        for (x, y) in vertices:
+            gvw.add_data3(x, y, -1)
+        prim = GeomTriangles(Geom.UH_static)
+        for triangle in triangles:
+            prim.add_vertices(*triangle)
+        geom = Geom(gvd)
+        geom.add_primitive(prim)
+        node.add_geom(geom)
+        return node
+
+    def attach_clip_space_node(self, node, camera_bit):
+        """
+        Attach a mesh defined in clip space to the eye, and show it only to the camera using the given bit.
+        """
+
+        np = self.camera.get_parent().attach_new_node(node)
+        self.ovr.set_hidden_area_mesh_state(np)
+        np.hide(~BitMask32.bit(camera_bit))
+        return np
+
+    def attach_center_mask(self, periphery_width, periphery_height):
+        """
+        Attach the quad covering the center region in the periphery pass. The quad is shrunk by one texel of the
+        periphery to avoid blending the mask color with the periphery along the edges of the center.
+        """
+
+        x_min, x_max, y_min, y_max = self.region
+        texel_x = 2.0 / periphery_width
+        texel_y = 2.0 / periphery_height
+        x_min += texel_x
+        x_max -= texel_x
+        y_min += texel_y
+        y_max -= texel_y
+        if x_min >= x_max or y_min >= y_max:
+            return None
+        node = self.create_clip_space_node('foveation-mask',
+                                           ((x_min, y_min), (x_max, y_min), (x_max, y_max), (x_min, y_max)),
+                                           ((0, 1, 2), (0, 2, 3)))
+        return self.attach_clip_space_node(node, self.camera_bit)
+
+    def attach_hidden_area_mesh(self):
+        """
+        Attach the hidden area mesh of the eye to the center pass, cropped to the center region.
+        """
+
+        vertices = crop_hidden_area_vertices(self.ovr.get_hidden_area_vertices(self.eye), self.region)
+        node = self.ovr.create_hidden_area_mesh(vertices)
+        node.set_name('hidden-area-mesh-center')
+        self.hidden_area_mesh_np = self.attach_clip_space_node(node, self.center_bit)
+        return self.hidden_area_mesh_np
+
+    def update_hidden_area_mesh(self):
+        """
+        Rebuild the cropped hidden area mesh of the center pass from the current hidden area mesh of the eye.
+        """
+
+        if self.hidden_area_mesh_np is None:
+            return
+        vertices = crop_hidden_area_vertices(self.ovr.get_hidden_area_vertices(self.eye), self.region)
+        self.ovr.replace_hidden_area_mesh(self.hidden_area_mesh_np, self.ovr.create_hidden_area_mesh(vertices))
+
+    def set_viewport(self, u, v):
+        """
+        Render the periphery and the center into the given fraction of their buffers, used when the resolution of
+        the eye texture is changed.
+        """
+
+        self.ovr.set_display_region_dimensions(self.periphery_dr, 0, u, 0, v)
+        self.ovr.set_display_region_dimensions(self.center_dr, 0, u, 0, v)
+        self.periphery_quad.set_tex_scale(TextureStage.get_default(), u, v)
+        self.center_quad.set_tex_scale(TextureStage.get_default(), u, v)
@@ -25,6 +25,7 @@ class Hand:
             model = Actor(model)
         self.model = model
         self.path = path
+        self.device = None
         self.pose = pose
         self.hand_np = self.ovr.tracking_space.attach_new_node(name)
         self.model.reparent_to(self.hand_np)
@@ -41,16 +42,28 @@ class Hand:
         self.skeleton = skeleton
         self.skeleton.set_model(self.model)
 
+    def set_late_latch(self, enabled=True):
+        """
+        If enabled, the position and orientation of the hand are updated again when the poses are late latched,
+        see P3DOpenVR.enable_late_latch().
+        """
+
+        if enabled:
+            self.ovr.add_late_latch_pose(self.pose, self.hand_np, self.ovr.get_input_source_handle(self.path))
+        else:
+            self.ovr.remove_late_latch_pose(self.hand_np)
+
     def update(self):
         """
         Retrieve the hand position and orientation and update the model in the tracking space.
         """
 
-        # Retrieve the actual device linked with this hand
-        device = self.ovr.vr_input.getInputSourceHandle(self.path)
+        # Retrieve the actual device linked with this hand, the handle is resolved only once
+        if self.device is None:
+            self.device = self.ovr.get_input_source_handle(self.path)
 
         # Retrieve the pose for that device
-        hand_pose = self.ovr.get_action_pose(self.pose, device)
+        hand_pose = self.ovr.get_action_pose(self.pose, self.device)
 
         if  hand_pose.pose.bPoseIsValid:
             # The pose is valid, show the hand and update it
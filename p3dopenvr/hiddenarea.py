@@ -0,0 +1,239 @@
+from panda3d.core import GeomVertexData, GeomVertexFormat, GeomVertexWriter, GeomTriangles, GeomLinestrips, GeomNode, Geom, InternalName
+from panda3d.core import LMatrix4
+
+from array import array
+import ctypes
+import hashlib
+import openvr
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Size in bytes of a HmdVector2_t
+vertex_size = ctypes.sizeof(openvr.HmdVector2_t)
+
+def get_vertex_count(mesh_type, count):
+    """
+    Return the number of vertices of a hidden area mesh. For the line loop type, the count returned by OpenVR is
+    the number of vertices, otherwise it is the number of triangles.
+    """
+
+    if mesh_type == openvr.k_eHiddenAreaMesh_LineLoop:
+        return count
+    return count * 3
+
+def get_hidden_area_vertices(mask, mesh_type=openvr.k_eHiddenAreaMesh_Standard):
+    """
+    Copy the vertices of the given HiddenAreaMesh_t into a bytes object holding the x, y coordinates as float32.
+    """
+
+    count = get_vertex_count(mesh_type, mask.unTriangleCount)
+    if count == 0 or not mask.pVertexData:
+        return b''
+    return ctypes.string_at(mask.pVertexData, count * vertex_size)
+
+def get_vertices_bounds(vertices):
+    """
+    Return the bounds of the given vertices in clip space, as (x_min, x_max, y_min, y_max), or None if there is no
+    vertex.
+    """
+
+    if not vertices:
+        return None
+    if np is not None:
+        points = np.frombuffer(vertices, dtype=np.float32).reshape(-1, 2)
+        low = points.min(axis=0)
+        high = points.max(axis=0)
+        x_min, y_min, x_max, y_max = float(low[0]), float(low[1]), float(high[0]), float(high[1])
+    else:
+        points = array('f', vertices)
+        x_min, x_max = min(points[0::2]), max(points[0::2])
+        y_min, y_max = min(points[1::2]), max(points[1::2])
+    return (x_min * 2 - 1, x_max * 2 - 1, y_min * 2 - 1, y_max * 2 - 1)
+
+# Directions of the diagonal edges of the bounding octagon of a visible area
+diagonal_directions = ((1.0, 1.0), (-1.0, 1.0), (1.0, -1.0), (-1.0, -1.0))
+
+def get_vertices_diagonal_bounds(vertices):
+    """
+    Return the bounds of the given vertices in clip space along each of the diagonal_directions, i.e. the maximum of
+    dx * x + dy * y over the vertices, or None if there is no vertex. With the bounds of get_vertices_bounds() they
+    form the bounding octagon of the vertices.
+    """
+
+    if not vertices:
+        return None
+    if np is not None:
+        points = np.frombuffer(vertices, dtype=np.float32).reshape(-1, 2) * 2.0 - 1.0
+        return tuple(float((points[:, 0] * dx + points[:, 1] * dy).max()) for (dx, dy) in diagonal_directions)
+    points = array('f', vertices)
+    xs = [x * 2 - 1 for x in points[0::2]]
+    ys = [y * 2 - 1 for y in points[1::2]]
+    return tuple(max(x * dx + y * dy for (x, y) in zip(xs, ys)) for (dx, dy) in diagonal_directions)
+
+def make_diagonal_crop_mat(diagonal_bounds):
+    """
+    Return the matrix mapping the region of the clip space delimited by the given diagonal bounds, as returned by
+    get_vertices_diagonal_bounds(), to the whole clip space. The region is a square rotated by 45 degrees, the x axis
+    of the result follows x + y and the y axis follows y - x. The matrix is applied after the projection matrix.
+    """
+
+    up_right, up_left, down_right, down_left = diagonal_bounds
+    u_min, u_max = -down_left, up_right
+    v_min, v_max = -down_right, up_left
+    u_scale = 2.0 / (u_max - u_min)
+    v_scale = 2.0 / (v_max - v_min)
+    return LMatrix4(u_scale, -v_scale, 0, 0,
+                    u_scale, v_scale, 0, 0,
+                    0, 0, 1, 0,
+                    -(u_max + u_min) / (u_max - u_min), -(v_max + v_min) / (v_max - v_min), 0, 1)
+
+def make_crop_mat(region):
+    """
+    Return the matrix mapping the given region of the clip space, as (x_min, x_max, y_min, y_max), to the whole clip
+    space. The matrix is applied after the projection matrix.
+    """
+
+    x_min, x_max, y_min, y_max = region
+    return LMatrix4(2.0 / (x_max - x_min), 0, 0, 0,
+                    0, 2.0 / (y_max - y_min), 0, 0,
+                    0, 0, 1, 0,
+                    -(x_max + x_min) / (x_max - x_min), -(y_max + y_min) / (y_max - y_min), 0, 1)
+
+def crop_hidden_area_vertices(vertices, region):
+    """
+    Map the given region of the clip space, as (x_min, x_max, y_min, y_max), to the whole [0, 1] range of the mesh
+    coordinates. Return the new vertices.
+    """
+
+    x_min, x_max, y_min, y_max = region
+    scale = (2.0 / (x_max - x_min), 2.0 / (y_max - y_min))
+    offset = ((-1 - x_min) / (x_max - x_min), (-1 - y_min) / (y_max - y_min))
+    if np is not None:
+        points = np.frombuffer(vertices, dtype=np.float32).reshape(-1, 2)
+        return (points * np.array(scale, dtype=np.float32) + np.array(offset, dtype=np.float32)).astype(np.float32).tobytes()
+    points = array('f', vertices)
+    for i in range(len(points)):
+        points[i] = points[i] * scale[i % 2] + offset[i % 2]
+    return points.tobytes()
+
+def make_hidden_area_geom_node(vertices, mesh_type=openvr.k_eHiddenAreaMesh_Standard, name='hidden-area-mesh'):
+    """
+    Create the GeomNode of the given vertices, as returned by get_hidden_area_vertices(). The vertices are placed in
+    clip space on the near plane and the primitives are not indexed. The line loop is closed by repeating the first
+    vertex.
+    """
+
+    if mesh_type == openvr.k_eHiddenAreaMesh_LineLoop:
+        vertices = vertices + vertices[:vertex_size]
+        prim = GeomLinestrips(Geom.UH_static)
+    else:
+        prim = GeomTriangles(Geom.UH_static)
+    count = len(vertices) // vertex_size
+    gvd = GeomVertexData('gvd', GeomVertexFormat.get_v3(), Geom.UH_static)
+    gvd.unclean_set_num_rows(count)
+    if np is not None:
+        points = np.frombuffer(vertices, dtype=np.float32).reshape(count, 2)
+        view = np.asarray(memoryview(gvd.modify_array(0))).view(np.float32).reshape(count, 3)
+        # The clip space in Panda3D has [-1, 1] coordinates, the received coordinates are in [0, 1]
+        np.multiply(points, 2.0, out=view[:, :2])
+        view[:, :2] -= 1.0
+        view[:, 2] = -1.0
+    else:
+        points = array('f', vertices)
+        gvw = GeomVertexWriter(gvd, InternalName.get_vertex())
+        for i in range(count):
+            gvw.set_data3(points[i * 2] * 2 - 1, points[i * 2 + 1] * 2 - 1, -1)
+    if count > 0:
+        prim.add_consecutive_vertices(0, count)
+        prim.close_primitive()
+    geom = Geom(gvd)
+    geom.add_primitive(prim)
+    node = GeomNode(name)
+    node.add_geom(geom)
+    return node
+
+def get_default_cache_dir():
+    """
+    Return the default directory of the hidden area mesh cache, in the user cache directory.
+    """
+
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA', os.path.expanduser('~'))
+    else:
+        base = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'p3dopenvr', 'hidden-area-mesh')
+
+class HiddenAreaMeshCache:
+    """
+    On-disk cache of the hidden area meshes, keyed by the model and serial number of the HMD and the IPD.
+
+    Each mesh is stored as the raw float32 coordinates of its vertices, so a cached mesh can be used without querying
+    the runtime.
+    """
+
+    def __init__(self, vr_system, directory=None):
+        self.vr_system = vr_system
+        self.directory = directory if directory is not None else get_default_cache_dir()
+        self.key = None
+
+    def get_headset_key(self):
+        """
+        Return the key identifying the current headset, built from its model, serial number and IPD.
+        """
+
+        hmd = openvr.k_unTrackedDeviceIndex_Hmd
+        model = self.vr_system.getStringTrackedDeviceProperty(hmd, openvr.Prop_ModelNumber_String)
+        serial = self.vr_system.getStringTrackedDeviceProperty(hmd, openvr.Prop_SerialNumber_String)
+        ipd = self.vr_system.getFloatTrackedDeviceProperty(hmd, openvr.Prop_UserIpdMeters_Float)
+        # The IPD is rounded to a tenth of millimeter to absorb the noise of the measure
+        return "{}|{}|{:.4f}".format(model, serial, ipd)
+
+    def invalidate(self):
+        """
+        Retrieve again the headset properties used as key, this must be called when the IPD changes.
+        """
+
+        self.key = None
+
+    def get_filename(self, eye, mesh_type):
+        """
+        Return the path of the cache file of the given mesh for the current headset.
+        """
+
+        if self.key is None:
+            self.key = self.get_headset_key()
+        digest = hashlib.sha1("{}|{}|{}".format(self.key, eye, mesh_type).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + '.bin')
+
+    def load(self, eye, mesh_type):
+        """
+        Return the cached vertices of the given mesh, or None if the mesh is not in the cache.
+        """
+
+        try:
+            with open(self.get_filename(eye, mesh_type), 'rb') as cache_file:
+                vertices = cache_file.read()
+        except OSError:
+            return None
+        if len(vertices) % vertex_size != 0:
+            return None
+        return vertices
+
+    def store(self, eye, mesh_type, vertices):
+        """
+        Write the vertices of the given mesh in the cache. Errors are only reported, the cache is an optimization.
+        """
+
+        filename = self.get_filename(eye, mesh_type)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_filename = filename + '.tmp'
+            with open(temp_filename, 'wb') as cache_file:
+                cache_file.write(vertices)
+            os.replace(temp_filename, filename)
+        except OSError as e:
+            print("Could not write hidden area mesh cache:", e)
@@ -0,0 +1,115 @@
+import openvr
+
+from .poses import PoseEngine
+
+def get_display_timing(vr_system):
+    """
+    Return the duration of a frame of the HMD and the delay between the vsync and the emission of the photons.
+    """
+
+    hmd = openvr.k_unTrackedDeviceIndex_Hmd
+    frame_duration = 1.0 / 90
+    refresh_rate = vr_system.getFloatTrackedDeviceProperty(hmd, openvr.Prop_DisplayFrequency_Float)
+    if refresh_rate > 0:
+        frame_duration = 1.0 / refresh_rate
+    vsync_to_photons = vr_system.getFloatTrackedDeviceProperty(hmd, openvr.Prop_SecondsFromVsyncToPhotons_Float)
+    return frame_duration, vsync_to_photons
+
+def get_seconds_to_photons(vr_system, frame_duration, vsync_to_photons):
+    """
+    Return the time remaining until the photons of the next frame are emitted.
+    """
+
+    result, seconds_since_vsync, frame_counter = vr_system.getTimeSinceLastVsync()
+    if not result:
+        seconds_since_vsync = 0.0
+    return max(0.0, frame_duration - seconds_since_vsync + vsync_to_photons)
+
+class LateLatch:
+    """
+    Late update of the HMD, the tracked devices and the registered pose actions just before the cull.
+
+    The poses retrieved by waitGetPoses() at the start of the frame are predicted for the display time of the frame
+    as seen at that moment. Once the application tasks have run, the poses are predicted again using the time
+    remaining until the photons of the frame are emitted, and only the anchors are updated. The HMD pose used is then
+    submitted with the eye textures so the compositor can correct the reprojection accordingly.
+    """
+
+    def __init__(self, ovr, devices=True):
+        """
+        * ovr : Reference to the instance of P3DOpenVR.
+
+        * devices : If True, the anchors of the tracked devices are also updated.
+        """
+
+        self.ovr = ovr
+        self.devices = devices
+        poses_t = openvr.TrackedDevicePose_t * openvr.k_unMaxTrackedDeviceCount
+        self.poses = poses_t()
+        self.pose_engine = PoseEngine(self.poses)
+        self.action_poses = []
+        self.predicted_seconds = 0.0
+        self.frame_duration = 1.0 / 90
+        self.vsync_to_photons = 0.0
+        self.update_timing()
+
+    def update_timing(self):
+        """
+        Retrieve the refresh rate of the HMD and the delay between the vsync and the emission of the photons.
+        """
+
+        self.frame_duration, self.vsync_to_photons = get_display_timing(self.ovr.vr_system)
+
+    def get_seconds_to_photons(self):
+        """
+        Return the time remaining until the photons of the frame being prepared are emitted. With a pipelined
+        threading model, the frame is only submitted after the frames still in the pipeline.
+        """
+
+        seconds = get_seconds_to_photons(self.ovr.vr_system, self.frame_duration, self.vsync_to_photons)
+        return seconds + self.ovr.get_pipeline_latency()
+
+    def add_action_pose(self, action, node_path, device=openvr.k_ulInvalidInputValueHandle):
+        """
+        Register a node path whose transform is set from the given pose action.
+        """
+
+        self.action_poses.append((action, device, node_path))
+
+    def remove_action_pose(self, node_path):
+        """
+        Unregister the given node path, its transform is no longer set from a pose action.
+        """
+
+        self.action_poses = [entry for entry in self.action_poses if entry[2] != node_path]
+
+    def update(self):
+        """
+        Predict the poses for the current time and update the anchors.
+        """
+
+        ovr = self.ovr
+        seconds = self.get_seconds_to_photons()
+        self.predicted_seconds = seconds
+        ovr.vr_system.getDeviceToAbsoluteTrackingPose(openvr.TrackingUniverseStanding, seconds, self.poses)
+        pose_engine = self.pose_engine
+        pose_engine.update()
+        hmd = openvr.k_unTrackedDeviceIndex_Hmd
+        if pose_engine.is_valid(hmd):
+            ovr.hmd_anchor.set_mat(pose_engine.get_mat(hmd))
+            ovr.set_render_pose(self.poses[hmd].mDeviceToAbsoluteTracking)
+        if self.devices:
+            for (device_index, anchor) in ovr.tracked_devices_anchors.items():
+                if pose_engine.is_valid(device_index):
+                    anchor.set_mat(pose_engine.get_mat(device_index))
+        for (action, device, node_path) in self.action_poses:
+            data = ovr.vr_input.getPoseActionDataRelativeToNow(action, openvr.TrackingUniverseStanding, seconds, device)
+            if data.bActive and data.pose.bPoseIsValid:
+                node_path.set_mat(ovr.get_pose_modelview(data.pose))
+
+    def clear(self):
+        """
+        Restore the submit of the eye textures without pose.
+        """
+
+        self.ovr.clear_render_pose()
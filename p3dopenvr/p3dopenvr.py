@@ -1,14 +1,28 @@
 from panda3d.core import load_prc_file_data, NodePath, CardMaker, LQuaternion, compose_matrix
-from panda3d.core import GeomVertexData, GeomVertexFormat, GeomVertexWriter, GeomTriangles, GeomNode, Geom, InternalName
-from panda3d.core import CullFaceAttrib, Shader, BitMask32
+from panda3d.core import CullFaceAttrib, ColorWriteAttrib, StencilAttrib, RenderState, Shader, BitMask32
 from panda3d.core import LMatrix3, LMatrix4, LVector2, LVector3, LVector4, CS_yup_right, CS_default
 from panda3d.core import WindowProperties, FrameBufferProperties, GraphicsPipe, GraphicsOutput, GraphicsEngine, Texture, PythonCallbackObject
-from panda3d.core import Camera, MatrixLens, OrthographicLens
+from panda3d.core import Camera, MatrixLens, OrthographicLens, TextureStage, ConfigVariableBool, ClockObject, Thread
+from panda3d.core import IntersectionBoundingVolume
 
 import atexit
 import openvr
 import os
 
+from .poses import PoseEngine, convert_pose_mat, bone_transforms_to_matrices
+from .actions import ActionSet, ActionManifest, InputSnapshot
+from .stats import VRStats
+from .flightrecorder import FlightRecorder
+from .resolution import DynamicResolution
+from .foveation import FoveatedRenderer
+from .submit import SubmitDescriptor
+from .waiter import PoseWaiter
+from .latelatch import LateLatch
+from .pipeline import FramePipeline
+from .scheduler import FrameScheduler
+from .hiddenarea import HiddenAreaMeshCache, get_hidden_area_vertices, make_hidden_area_geom_node, get_vertices_bounds, make_crop_mat
+from .hiddenarea import diagonal_directions, get_vertices_diagonal_bounds, make_diagonal_crop_mat
+
 # HMD screens are never a power of 2 size
 load_prc_file_data("", "textures-power-2 none")
 
@@ -19,30 +33,43 @@ os.environ['__GL_SYNC_TO_VBLANK'] = "0"
 # MESA OpenGL drivers requires this env variable to be set to 0 to disable v-sync
 os.environ['vblank_mode'] = "0"
 
-@atexit.register
-def exitfunc():
-    openvr.shutdown()
-
 class P3DOpenVR():
-    def __init__(self, base=None, verbose=True):
+    def __init__(self, base=None, verbose=True, backend=None):
         """
         Wrapper around pyopenvr to allow it to work with Panda3D.
         See the init() method below for the actual initialization.
 
         * verbose specifies if the library prints status information when running.
+
+        * backend : Module or object providing the OpenVR entry points, init(), VRApplications(), VRCompositor() and
+          VRInput(). If None, the openvr module is used. See simulated.SimulatedBackend to run without a headset.
         """
 
         if base is None:
             base = __builtins__.get('base')
         self.base = base
         self.verbose = verbose
+        self.backend = backend if backend is not None else openvr
+        self.stats = VRStats()
+        self.flight_recorder = None
+        self.dynamic_resolution = None
         self.vr_system = None
         self.vr_applications = None
         self.vr_input = None
         self.compositor = None
         self.poses = None
+        self.pose_engine = None
         self.action_set_handles = []
+        self.action_sets = []
+        self.active_action_sets = None
+        self.action_sets_dirty = False
+        self.input_snapshot = None
+        self.action_manifest = None
+        self.input_sources = {}
+        self.bone_buffers = {}
+        self.reference_transforms = {}
         self.buffers = []
+        self.display_regions = []
         self.nextsort = self.base.win.getSort() - 1000
         self.tracking_space = None
         self.hmd_anchor = None
@@ -50,12 +77,54 @@ class P3DOpenVR():
         self.right_eye_anchor = None
         self.left_cam = None
         self.right_cam = None
+        self.near = 0.2
+        self.far = 500.0
+        self.projection_left = None
+        self.projection_right = None
+        self.eye_transforms_dirty = True
+        self.projections_dirty = False
         self.ham_shader = None
+        self.hidden_area_meshes = {}
+        self.hidden_area_mesh_nps = {}
+        self.hidden_area_meshes_dirty = False
+        self.hidden_area_mesh_cache = None
+        self.hidden_area_stencil = False
+        self.tight_cull_bounds = False
         self.tracked_devices_anchors = {}
+        self.inactive_devices_anchors = {}
+        self.active_devices = set()
         self.empty_world = None
         self.coord_mat = LMatrix4.convert_mat(CS_yup_right, CS_default)
         self.coord_mat_inv = LMatrix4.convert_mat(CS_default, CS_yup_right)
         self.submit_together = True
+        self.side_by_side = False
+        self.left_bounds = None
+        self.right_bounds = None
+        self.left_submit = None
+        self.right_submit = None
+        self.submit_descriptors = []
+        self.texture_submits = {}
+        self.full_bounds = self.make_texture_bounds(0, 0, 1, 1)
+        self.pose_waiter = None
+        self.late_latch = None
+        self.late_latch_task = None
+        self.late_latch_sort = 49
+        self.scheduler = None
+        self.pipeline = None
+        self.explicit_timing = False
+        self.post_present_handoff = False
+        self.timing_frame = -1
+        self.frame_start_dr = None
+        self.gsg = None
+        self.prepared_objects = None
+        self.left_dr = None
+        self.right_dr = None
+        self.buffer_size = None
+        self.max_resolution_scale = 1.0
+        self.resolution_scale = 1.0
+        self.replicated_eye = 0
+        self.foveated_renderers = []
+        self.quad = None
         self.event_handlers = []
         self.submit_error_handler = None
         self.new_tracked_device_handler = None
@@ -90,9 +159,9 @@ class P3DOpenVR():
             print("COULD NOT CREATE BUFFER")
         return buffer
 
-    def create_renderer(self, name, camera, width, height, msaa, callback, cc=None):
+    def create_render_texture(self):
         """
-        Create and configure a render to texture pipeline and attach it the given camera and draw callback.
+        Create the texture that will receive the rendering of an eye buffer.
         """
 
         texture = Texture()
@@ -100,22 +169,85 @@ class P3DOpenVR():
         texture.set_wrap_v(Texture.WMClamp)
         texture.set_minfilter(Texture.FT_linear)
         texture.set_magfilter(Texture.FT_linear)
+        return texture
+
+    def create_render_buffer(self, name, texture, width, height, msaa):
+        """
+        Create the offscreen buffer used to render one or both eyes into the given texture.
+        """
+
         fbprops = FrameBufferProperties()
         fbprops.setRgbaBits(1, 1, 1, 1)
         if msaa > 0:
             fbprops.setMultisamples(msaa)
+        if self.hidden_area_stencil:
+            fbprops.set_stencil_bits(8)
         buffer = self.create_buffer(name, texture, width, height, fbprops=fbprops)
-        dr = buffer.make_display_region()
+        if self.hidden_area_stencil and buffer is not None:
+            buffer.set_clear_stencil_active(True)
+            buffer.set_clear_stencil(0)
+        self.buffers.append(buffer)
+        return buffer
+
+    def create_display_region(self, buffer, camera, callback, cc=None, dimensions=None):
+        """
+        Create a display region in the given buffer and attach it the given camera and draw callback.
+        If dimensions is not None, it is a tuple (left, right, bottom, top) specifying the part of the buffer covered.
+        """
+
+        if dimensions is not None:
+            dr = buffer.make_display_region(*dimensions)
+        else:
+            dr = buffer.make_display_region()
         dr.set_camera(camera)
         dr.set_active(1)
-        self.buffers.append(buffer)
         if callback is not None:
             dr.set_draw_callback(PythonCallbackObject(callback))
         if cc is not None:
             dr.setClearColorActive(1)
             dr.setClearColor(cc)
+        self.display_regions.append(dr)
+        return dr
+
+    def create_renderer(self, name, camera, width, height, msaa, callback, cc=None):
+        """
+        Create and configure a render to texture pipeline and attach it the given camera and draw callback.
+        """
+
+        texture = self.create_render_texture()
+        buffer = self.create_render_buffer(name, texture, width, height, msaa)
+        self.create_display_region(buffer, camera, callback, cc)
         return texture
 
+    def create_side_by_side_renderer(self, name, left_camera, right_camera, width, height, msaa, callback, cc=None):
+        """
+        Create and configure a single render to texture pipeline twice as wide as an eye buffer.
+        The left camera renders into the left half of the texture and the right camera into the right half.
+        The draw callback is attached to the right display region, which is rendered last.
+        """
+
+        texture = self.create_render_texture()
+        buffer = self.create_render_buffer(name, texture, width * 2, height, msaa)
+        if cc is not None:
+            # Clear the whole buffer at once instead of once per display region
+            buffer.setClearColorActive(1)
+            buffer.setClearColor(cc)
+        self.create_display_region(buffer, left_camera, None, dimensions=(0, 0.5, 0, 1))
+        self.create_display_region(buffer, right_camera, callback, dimensions=(0.5, 1, 0, 1))
+        return texture
+
+    def make_texture_bounds(self, u_min, v_min, u_max, v_max):
+        """
+        Create the bounds specifying which part of a submitted texture is used by the compositor.
+        """
+
+        bounds = openvr.VRTextureBounds_t()
+        bounds.uMin = u_min
+        bounds.vMin = v_min
+        bounds.uMax = u_max
+        bounds.vMax = v_max
+        return bounds
+
     def create_camera(self, name, projection_mat):
         """
         Create a camera with the given projection matrix.
@@ -175,9 +307,10 @@ class P3DOpenVR():
         self.empty_world = NodePath()
         self.base.camera.reparent_to(self.empty_world)
 
-    def replicate(self, texture):
+    def replicate(self, texture, bounds=None):
         """
         Attach the given texture to a full window quad.
+        If bounds is not None, only the given part of the texture is displayed.
         """
 
         cm = CardMaker("replicate-quad")
@@ -186,6 +319,9 @@ class P3DOpenVR():
         self.quad.set_depth_test(0)
         self.quad.set_depth_write(0)
         self.quad.set_texture(texture)
+        if bounds is not None:
+            self.quad.set_tex_offset(TextureStage.get_default(), bounds.uMin, bounds.vMin)
+            self.quad.set_tex_scale(TextureStage.get_default(), bounds.uMax - bounds.uMin, bounds.vMax - bounds.vMin)
 
         lens = OrthographicLens()
         lens.set_film_size(2, 2)
@@ -194,6 +330,91 @@ class P3DOpenVR():
         self.base.cam.node().set_lens(lens)
         self.base.cam.reparent_to(self.quad)
 
+    def set_replicate_bounds(self, bounds):
+        """
+        Change the part of the texture displayed on the replicate quad.
+        """
+
+        if self.quad is not None:
+            self.quad.set_tex_offset(TextureStage.get_default(), bounds.uMin, bounds.vMin)
+            self.quad.set_tex_scale(TextureStage.get_default(), bounds.uMax - bounds.uMin, bounds.vMax - bounds.vMin)
+
+    def set_display_region_dimensions(self, dr, left, right, bottom, top):
+        """
+        Change the dimensions of the given display region. With a pipelined threading model, Panda3D 1.10 drops the
+        draw callback of the display region when its dimensions are changed, the callback is then set again.
+        """
+
+        callback = dr.get_draw_callback()
+        dr.set_dimensions(left, right, bottom, top)
+        if callback is not None and dr.get_draw_callback() is None:
+            dr.set_draw_callback(callback)
+
+    def set_resolution_scale(self, scale):
+        """
+        Change the rendered resolution of the eyes, relative to the recommended render target size.
+        Only the viewport of each eye inside the preallocated buffers is changed, together with the texture bounds
+        submitted to the compositor. The scale is clamped to max_resolution_scale.
+        """
+
+        scale = min(scale, self.max_resolution_scale)
+        width, height = self.buffer_size
+        # Use an integer number of pixels to avoid sampling outside of the rendered area
+        u = max(1, int(round(width * scale / self.max_resolution_scale))) / width
+        v = max(1, int(round(height * scale / self.max_resolution_scale))) / height
+        self.resolution_scale = scale
+        if self.side_by_side:
+            self.set_display_region_dimensions(self.left_dr, 0, 0.5 * u, 0, v)
+            self.set_display_region_dimensions(self.right_dr, 0.5, 0.5 + 0.5 * u, 0, v)
+            self.left_bounds = self.make_texture_bounds(0, 0, 0.5 * u, v)
+            self.right_bounds = self.make_texture_bounds(0.5, 0, 0.5 + 0.5 * u, v)
+        else:
+            self.set_display_region_dimensions(self.left_dr, 0, u, 0, v)
+            self.set_display_region_dimensions(self.right_dr, 0, u, 0, v)
+            self.left_bounds = self.make_texture_bounds(0, 0, u, v)
+            self.right_bounds = self.make_texture_bounds(0, 0, u, v)
+            for renderer in self.foveated_renderers:
+                renderer.set_viewport(u, v)
+        if self.pipeline is not None:
+            # The descriptors are used by the Draw thread, the bounds are applied to the frame being prepared
+            self.pipeline.set_bounds(self.left_bounds, self.right_bounds)
+        else:
+            self.left_submit.bounds = self.left_bounds
+            self.right_submit.bounds = self.right_bounds
+        if self.replicated_eye == 1:
+            self.set_replicate_bounds(self.left_bounds)
+        elif self.replicated_eye == 2:
+            self.set_replicate_bounds(self.right_bounds)
+
+    def get_resolution_scale(self):
+        """
+        Return the current rendered resolution of the eyes, relative to the recommended render target size.
+        """
+
+        return self.resolution_scale
+
+    def enable_dynamic_resolution(self, **kwargs):
+        """
+        Enable the dynamic resolution controller, the rendered resolution is then adjusted each frame according to
+        the GPU time reported by the compositor. The frame timing of the compositor is enabled if needed.
+        See DynamicResolution for the parameters. Return the instance of DynamicResolution.
+        """
+
+        if not self.stats.frame_timing_enabled:
+            self.enable_frame_timing()
+        self.dynamic_resolution = DynamicResolution(self, **kwargs)
+        return self.dynamic_resolution
+
+    def disable_dynamic_resolution(self, reset=True):
+        """
+        Disable the dynamic resolution controller. If reset is True, the resolution is restored to the recommended
+        size.
+        """
+
+        self.dynamic_resolution = None
+        if reset:
+            self.set_resolution_scale(1.0)
+
     def get_ham_shader(self):
         """
         Return a trivial shader that will directly place the mesh in the clip space
@@ -215,44 +436,171 @@ void main() {
 """)
         return self.ham_shader
 
-    def create_hidden_area_mesh(self, mask):
+    def get_hidden_area_vertices(self, eye, mesh_type=openvr.k_eHiddenAreaMesh_Standard):
         """
-        Using the provided mask configuration, create the mesh that will cover the area not visible from the HMD
+        Return the vertices of the hidden area mesh of the given eye and type, as float32 x, y coordinates.
+        The mesh is retrieved once from the on-disk cache, if enabled, or from the runtime.
         """
 
-        gvf = GeomVertexFormat.get_v3()
-        gvd = GeomVertexData('gvd', gvf, Geom.UH_static)
-        geom = Geom(gvd)
-        gvw = GeomVertexWriter(gvd, InternalName.get_vertex())
-        for i in range(mask.unTriangleCount * 3):
-            vertex = mask.pVertexData[i]
-            # The clip space in Panda3D has [-1, 1] coordinates, the received coordinates are in [0, 1]
-            gvw.add_data3(vertex[0] * 2 - 1, vertex[1] * 2 - 1, -1)
-        prim = GeomTriangles(Geom.UH_static)
-        for i in range(mask.unTriangleCount):
-            prim.add_vertices(i * 3, i *3 + 1, i * 3 + 2)
-        geom.add_primitive(prim)
-        node = GeomNode('hidden-area-mesh')
-        node.add_geom(geom)
-        return node
+        key = (eye, mesh_type)
+        vertices = self.hidden_area_meshes.get(key)
+        if vertices is None:
+            cache = self.hidden_area_mesh_cache
+            if cache is not None:
+                vertices = cache.load(eye, mesh_type)
+            if vertices is None:
+                mask = self.vr_system.getHiddenAreaMesh(eye, type_=mesh_type)
+                vertices = get_hidden_area_vertices(mask, mesh_type)
+                if cache is not None and vertices:
+                    cache.store(eye, mesh_type, vertices)
+            self.hidden_area_meshes[key] = vertices
+        return vertices
 
-    def attach_hidden_area_mesh(self, eye, anchor, camera_mask):
+    def create_hidden_area_mesh(self, mask, mesh_type=openvr.k_eHiddenAreaMesh_Standard):
         """
-        Create and attach the two meshes that will hide the areas not visible from the HMD.
+        Using the provided mask configuration, create the mesh that will cover the area not visible from the HMD.
+        The mask is either a HiddenAreaMesh_t or the vertices returned by get_hidden_area_vertices().
+        With the line loop type, the mesh is made of a closed line strip.
+        """
+
+        if isinstance(mask, openvr.HiddenAreaMesh_t):
+            mask = get_hidden_area_vertices(mask, mesh_type)
+        return make_hidden_area_geom_node(mask, mesh_type)
+
+    def set_hidden_area_mesh_state(self, np):
+        """
+        Configure the render state of a mesh masking a part of the eye. By default, the mesh is drawn in black on
+        the near plane. In stencil mode, the mesh is only written in the stencil buffer.
         """
 
-        left_eye_mask = self.vr_system.getHiddenAreaMesh(eye, type_=openvr.k_eHiddenAreaMesh_Standard)
-        left_mesh = self.create_hidden_area_mesh(left_eye_mask)
-        np = anchor.attach_new_node(left_mesh)
         # The winding order is not specified, it is recommended to disable backface culling
         np.set_attrib(CullFaceAttrib.make(CullFaceAttrib.M_cull_none))
         np.set_shader(self.get_ham_shader(), 10000)
         # Make sure that the mesh is rendered first to allow early-z optimization
         np.set_bin("background", 0)
+        if self.hidden_area_stencil:
+            np.set_attrib(StencilAttrib.make(True, StencilAttrib.SCF_always,
+                                             StencilAttrib.SO_keep, StencilAttrib.SO_replace, StencilAttrib.SO_replace,
+                                             1, 0, 0xff), 10000)
+            np.set_attrib(ColorWriteAttrib.make(ColorWriteAttrib.C_off))
+            np.set_depth_write(False)
+            np.set_depth_test(False)
+
+    def set_hidden_area_stencil_test(self, camera_node):
+        """
+        Configure the given camera to skip the pixels masked in the stencil buffer by the hidden area mesh.
+        """
+
+        camera_node.set_initial_state(RenderState.make(
+            StencilAttrib.make(True, StencilAttrib.SCF_not_equal,
+                               StencilAttrib.SO_keep, StencilAttrib.SO_keep, StencilAttrib.SO_keep,
+                               1, 0xff, 0)))
+
+    def get_visible_vertices(self, eye):
+        """
+        Return the vertices of the outline of the area visible from the HMD, or of the mesh covering it if the
+        outline is not available, as returned by get_hidden_area_vertices().
+        """
+
+        vertices = self.get_hidden_area_vertices(eye, openvr.k_eHiddenAreaMesh_LineLoop)
+        if not vertices:
+            vertices = self.get_hidden_area_vertices(eye, openvr.k_eHiddenAreaMesh_Inverse)
+        return vertices
+
+    def get_visible_region(self, eye):
+        """
+        Return the bounds of the area visible from the HMD, as (x_min, x_max, y_min, y_max) in clip space, or None
+        if the runtime does not provide the visible area.
+        """
+
+        region = get_vertices_bounds(self.get_visible_vertices(eye))
+        if region is None:
+            return None
+        x_min, x_max, y_min, y_max = region
+        region = (max(x_min, -1.0), min(x_max, 1.0), max(y_min, -1.0), min(y_max, 1.0))
+        if region[0] >= region[1] or region[2] >= region[3]:
+            return None
+        return region
+
+    def get_visible_cull_bounds(self, eye, projection):
+        """
+        Return the cull bounds of the given eye restricted to the bounding octagon of the visible area : the
+        intersection of the frustum cropped to the bounding rectangle of the area and of the frustum cropped to its
+        bounding square rotated by 45 degrees, which cuts the corners of the rectangle outside of the area.
+        """
+
+        region = self.get_visible_region(eye)
+        lens = MatrixLens()
+        if region is None:
+            # set_cull_bounds() does not accept None, the uncropped frustum is used instead
+            lens.set_user_mat(projection)
+            return lens.make_bounds()
+        lens.set_user_mat(projection * make_crop_mat(region))
+        bounds = lens.make_bounds()
+        diagonal_bounds = get_vertices_diagonal_bounds(self.get_visible_vertices(eye))
+        x_min, x_max, y_min, y_max = region
+        cut = False
+        for ((dx, dy), bound) in zip(diagonal_directions, diagonal_bounds):
+            corner = max(dx * x_min, dx * x_max) + max(dy * y_min, dy * y_max)
+            cut = cut or bound < corner - 1e-3
+        if not cut:
+            return bounds
+        lens.set_user_mat(projection * make_diagonal_crop_mat(diagonal_bounds))
+        volume = IntersectionBoundingVolume()
+        volume.add_component(bounds)
+        volume.add_component(lens.make_bounds())
+        return volume
+
+    def update_cull_bounds(self):
+        """
+        Restrict the cull frustum of each eye camera to the bounding octagon of the visible area, the objects only
+        present in the hidden corners of the eyes are then culled.
+        """
+
+        for (eye, camera, projection) in ((openvr.Eye_Left, self.left_cam, self.projection_left),
+                                          (openvr.Eye_Right, self.right_cam, self.projection_right)):
+            camera.node().set_cull_bounds(self.get_visible_cull_bounds(eye, projection))
+
+    def attach_hidden_area_mesh(self, eye, anchor, camera_mask):
+        """
+        Create and attach the two meshes that will hide the areas not visible from the HMD.
+        """
+
+        mesh = self.create_hidden_area_mesh(self.get_hidden_area_vertices(eye))
+        np = anchor.attach_new_node(mesh)
+        self.set_hidden_area_mesh_state(np)
         # Hide this mesh from the opposite camera
         np.hide(BitMask32.bit(camera_mask))
+        self.hidden_area_mesh_nps[eye] = np
+        return np
+
+    def replace_hidden_area_mesh(self, np, mesh):
+        """
+        Replace the geometry of an attached hidden area mesh, keeping its render state.
+        """
+
+        node = np.node()
+        node.remove_all_geoms()
+        node.add_geoms_from(mesh)
+
+    def update_hidden_area_meshes(self):
+        """
+        Rebuild the attached hidden area meshes, and the cull bounds derived from them, after the meshes have been
+        invalidated.
+        """
 
-    def init(self, near=0.2, far=500.0, root=None, submit_together=True, msaa=0, replicate=1, srgb=None, hidden_area_mesh=True):
+        for (eye, np) in self.hidden_area_mesh_nps.items():
+            self.replace_hidden_area_mesh(np, self.create_hidden_area_mesh(self.get_hidden_area_vertices(eye)))
+        for renderer in self.foveated_renderers:
+            renderer.update_hidden_area_mesh()
+        if self.tight_cull_bounds:
+            self.update_cull_bounds()
+        self.hidden_area_meshes_dirty = False
+
+    def init(self, near=0.2, far=500.0, root=None, submit_together=True, msaa=0, replicate=1, srgb=None, hidden_area_mesh=True,
+             side_by_side=False, max_resolution_scale=1.0, foveation=False, foveation_center=0.5, foveation_periphery=0.5,
+             hidden_area_mesh_cache=True, tight_cull_bounds=False, threaded_wait=False, threaded_wait_sort=45,
+             pipelined=None, explicit_timing=False, post_present_handoff=False, poses_sort=-1000):
         """
         Initialize OpenVR. This method will create the rendering buffers, the cameras associated with each eyes
         and the various anchors in the tracked space. It will also start the tasks responsible for the correct
@@ -275,9 +623,67 @@ void main() {
 
         * hidden_area_mesh : If True, a mask will be applied on each camera to cover the area not seen from the HMD
           This will trigger the early-z optimization on the GPU and avoid rendering unseen pixels.
+          If set to 'stencil', the mask is written in the stencil buffer instead and the masked pixels are skipped
+          by the stencil test, even with shaders disabling the early-z optimization. The stencil test is only
+          enabled by Panda3D if 'framebuffer-stencil' is set before the window is opened.
+
+        * side_by_side : If True, both eyes are rendered into a single double-wide buffer, the left eye in the left
+          half and the right eye in the right half. Both halves are submitted at once using texture bounds.
+          This halves the number of offscreen buffers and framebuffer switches. submit_together is ignored.
+
+        * max_resolution_scale : The eye buffers are allocated with the recommended size multiplied by this scale,
+          the rendered resolution can then be changed up to this scale without reallocation, see
+          set_resolution_scale(). The rendering starts at the recommended size.
+
+        * foveation : If True, the center of each eye is rendered at full resolution and the periphery at a lower
+          resolution, both images are then composited into the submitted eye texture. Side by side rendering is not
+          supported with foveation.
+
+        * foveation_center : Size of the full resolution center region, as a fraction of the width and height of the
+          eye. The region is centered on the optical axis of the lens.
+
+        * foveation_periphery : Resolution of the periphery relative to the resolution of the eye.
+
+        * hidden_area_mesh_cache : If True, the hidden area meshes are cached on disk in the user cache directory, so
+          they are not retrieved from the runtime on the next start. A directory can also be given. Set to False to
+          disable the cache.
+
+        * tight_cull_bounds : If True, the cull frustum of each eye is restricted to the bounding octagon of the area
+          visible from the HMD, the objects only present in the hidden corners are then culled instead of being
+          rendered.
+
+        * threaded_wait : If True, waitGetPoses() is called by a worker thread as soon as the frame is submitted,
+          and the task updating the poses is run with the sort threaded_wait_sort, just before the rendering.
+          The tasks with a lower sort, e.g. the simulation, run during the wait but see the poses of the previous
+          frame. The tasks using get_update_task_sort() still run after the update of the poses.
+
+        * pipelined : If True, OpenVR is synchronized with a pipelined threading model of Panda3D, e.g.
+          'threading-model Cull/Draw' : waitGetPoses() is called by the Draw thread after the submit, the poses are
+          predicted for the frame the App thread prepares and each frame is submitted with the pose it was rendered
+          with. If None, it is enabled when the Draw stage does not run in the App thread. See FramePipeline.
+
+        * explicit_timing, post_present_handoff : Timing mode of the compositor, see set_timing_mode().
+
+        * poses_sort : Sort of the task updating the poses, unless the threaded wait is used. The other tasks of the
+          application can be scheduled relative to it, see get_update_task_sort() and enable_scheduler().
         """
 
         self.submit_together = submit_together
+        self.side_by_side = side_by_side
+        self.hidden_area_stencil = hidden_area_mesh == 'stencil'
+        if self.hidden_area_stencil and not ConfigVariableBool('framebuffer-stencil', False).get_value():
+            print("WARNING: 'framebuffer-stencil' is not enabled, using the depth hidden area mesh")
+            self.hidden_area_stencil = False
+        self.tight_cull_bounds = tight_cull_bounds
+        if foveation and side_by_side:
+            raise Exception("Foveation is not supported with side by side rendering")
+        pipeline_depth = self.base.graphicsEngine.get_threading_model().get_draw_stage()
+        if pipelined is None:
+            pipelined = pipeline_depth > 0
+        if pipelined and threaded_wait:
+            raise Exception("Threaded wait is not supported with a pipelined threading model")
+        self.near = near
+        self.far = far
         if srgb is None:
             self.color_space = openvr.ColorSpace_Auto
         else:
@@ -289,15 +695,27 @@ void main() {
         # Create a OpenVR array that will store the pose of all the tracked devices.
         poses_t = openvr.TrackedDevicePose_t * openvr.k_unMaxTrackedDeviceCount
         self.poses = poses_t()
+        self.pose_engine = PoseEngine(self.poses)
 
         # Initialise OpenVR and retrieve the main components
-        self.vr_system = openvr.init(openvr.VRApplication_Scene)
-        self.vr_applications = openvr.VRApplications()
+        self.vr_system = self.backend.init(openvr.VRApplication_Scene)
+        # Only the runtime actually initialised is shut down when exiting
+        atexit.register(self.backend.shutdown)
+        self.vr_applications = self.backend.VRApplications()
+        if hidden_area_mesh_cache:
+            directory = hidden_area_mesh_cache if isinstance(hidden_area_mesh_cache, str) else None
+            self.hidden_area_mesh_cache = HiddenAreaMeshCache(self.vr_system, directory)
         width, height = self.vr_system.getRecommendedRenderTargetSize()
-        self.compositor = openvr.VRCompositor()
-        self.vr_input = openvr.VRInput()
+        self.compositor = self.backend.VRCompositor()
+        self.vr_input = self.backend.VRInput()
+        self.input_snapshot = InputSnapshot(self.vr_input)
         if self.compositor is None:
             raise Exception("Unable to create compositor") 
+        if pipelined:
+            self.pipeline = FramePipeline(self, pipeline_depth)
+
+        # Retrieve the devices already connected, the registry is then kept up to date using the device events.
+        self.scan_active_devices()
 
         # Create the tracking space anchors
         if root is None:
@@ -308,9 +726,9 @@ void main() {
         self.right_eye_anchor = self.hmd_anchor.attach_new_node('right-eye')
 
         # Create the projection matrices for the left and right camera.
-        # TODO: This should be updated in the update task in the case the user update the IOD
-        self.projection_left = self.coord_mat_inv * self.convert_mat(self.vr_system.getProjectionMatrix(openvr.Eye_Left, near, far))
-        self.projection_right = self.coord_mat_inv * self.convert_mat(self.vr_system.getProjectionMatrix(openvr.Eye_Right, near, far))
+        # They are updated when the IPD or the projection changes, see update_projections()
+        self.projection_left = self.get_projection_mat(openvr.Eye_Left)
+        self.projection_right = self.get_projection_mat(openvr.Eye_Right)
 
         # Create the cameras and attach them in the tracking space
         left_cam_node = self.create_camera('left-cam', self.projection_left)
@@ -319,9 +737,37 @@ void main() {
         self.left_cam = self.left_eye_anchor.attach_new_node(left_cam_node)
         self.right_cam = self.right_eye_anchor.attach_new_node(right_cam_node)
 
-        # Create the renderer linked to each camera
-        self.left_texture = self.create_renderer('left-buffer', self.left_cam, width, height, msaa, self.left_cb)
-        self.right_texture = self.create_renderer('right-buffer', self.right_cam, width, height, msaa, self.right_cb)
+        # Create the renderer linked to each camera, the buffers are allocated at the maximum resolution
+        self.max_resolution_scale = max_resolution_scale
+        width = int(round(width * max_resolution_scale))
+        height = int(round(height * max_resolution_scale))
+        self.buffer_size = (width, height)
+        if self.side_by_side:
+            self.left_texture = self.create_side_by_side_renderer('stereo-buffer', self.left_cam, self.right_cam, width, height, msaa, self.stereo_cb)
+            self.right_texture = self.left_texture
+            self.left_dr, self.right_dr = self.display_regions[-2:]
+        elif foveation:
+            left_renderer = FoveatedRenderer(self, 'left', openvr.Eye_Left, self.left_cam, width, height, msaa, self.left_cb,
+                                             foveation_center, foveation_periphery)
+            right_renderer = FoveatedRenderer(self, 'right', openvr.Eye_Right, self.right_cam, width, height, msaa, self.right_cb,
+                                              foveation_center, foveation_periphery)
+            self.foveated_renderers = [left_renderer, right_renderer]
+            self.left_texture = left_renderer.texture
+            self.left_dr = left_renderer.display_region
+            self.right_texture = right_renderer.texture
+            self.right_dr = right_renderer.display_region
+        else:
+            self.left_texture = self.create_renderer('left-buffer', self.left_cam, width, height, msaa, self.left_cb)
+            self.left_dr = self.display_regions[-1]
+            self.right_texture = self.create_renderer('right-buffer', self.right_cam, width, height, msaa, self.right_cb)
+            self.right_dr = self.display_regions[-1]
+        self.left_submit = SubmitDescriptor(openvr.Eye_Left, self.left_texture, None, self.color_space)
+        self.right_submit = SubmitDescriptor(openvr.Eye_Right, self.right_texture, None, self.color_space)
+        self.submit_descriptors = [self.left_submit, self.right_submit]
+        self.set_resolution_scale(1.0)
+
+        if explicit_timing or post_present_handoff:
+            self.set_timing_mode(explicit_timing, post_present_handoff)
 
         # The main camera is useless, so we disable it
         self.disable_main_cam()
@@ -330,17 +776,31 @@ void main() {
             # If the hidden area mesh is used, assign a mask on each camera to hide the opposite mesh
             left_cam_node.set_camera_mask(BitMask32.bit(0))
             right_cam_node.set_camera_mask(BitMask32.bit(1))
-            self.attach_hidden_area_mesh(openvr.Eye_Left, self.left_eye_anchor, 1)
-            self.attach_hidden_area_mesh(openvr.Eye_Right, self.right_eye_anchor, 0)
-
+            if self.hidden_area_stencil:
+                self.set_hidden_area_stencil_test(left_cam_node)
+                self.set_hidden_area_stencil_test(right_cam_node)
+            left_mesh = self.attach_hidden_area_mesh(openvr.Eye_Left, self.left_eye_anchor, 1)
+            right_mesh = self.attach_hidden_area_mesh(openvr.Eye_Right, self.right_eye_anchor, 0)
+            if self.foveated_renderers:
+                # The center passes use their own cropped meshes
+                left_mesh.hide(FoveatedRenderer.center_cameras_mask)
+                right_mesh.hide(FoveatedRenderer.center_cameras_mask)
+                for renderer in self.foveated_renderers:
+                    renderer.attach_hidden_area_mesh()
+                    if self.hidden_area_stencil:
+                        self.set_hidden_area_stencil_test(renderer.center_cam.node())
+        if self.tight_cull_bounds:
+            self.update_cull_bounds()
+
+        self.replicated_eye = replicate
         if replicate == 1:
             if self.verbose:
                 print("Replicating left eye")
-            self.replicate(self.left_texture)
+            self.replicate(self.left_texture, self.left_bounds)
         elif replicate == 2:
             if self.verbose:
                 print("Replicating right eye")
-            self.replicate(self.right_texture)
+            self.replicate(self.right_texture, self.right_bounds)
         else:
             if self.verbose:
                 print("Eye replication disabled")
@@ -350,17 +810,50 @@ void main() {
             self.init_action()
 
         # Launch the main task that will synchronize Panda3D with OpenVR
-        # TODO: The sort number should be configurable and by default be placed after the gc tasks.
-        self.task = taskMgr.add(self.update_poses_task, "openvr-update-poses", sort=-1000)
+        if self.pipeline is not None:
+            # The first frame must be submitted after a wait, the next waits are done by the Draw thread
+            self.compositor.waitGetPoses(self.poses, None)
+            self.task = taskMgr.add(self.update_poses_task, "openvr-update-poses", sort=poses_sort)
+        elif threaded_wait:
+            self.pose_waiter = PoseWaiter(self.compositor)
+            self.pose_waiter.request_wait()
+            self.task = taskMgr.add(self.update_poses_task, "openvr-update-poses", sort=threaded_wait_sort)
+        else:
+            self.task = taskMgr.add(self.update_poses_task, "openvr-update-poses", sort=poses_sort)
 
     def get_update_task_sort(self):
         """
         Return the correct sort number to use for any update task. They must always be run after the task updating
-        the poses.
+        the poses. See also enable_scheduler() to run the tasks in distinct phases of the frame.
         """
 
         return self.task.get_sort() + 1
 
+    def enable_scheduler(self, sorts=None, budgets=None, report_interval=1.0):
+        """
+        Enable the frame phase scheduler, running the jobs of the application in the named phases of the VR frame,
+        each with its own sort and optional time budget. If the late latching is enabled, the poses are then late
+        latched at the start of the late-latch phase. See FrameScheduler for the parameters.
+        Return the instance of FrameScheduler.
+        """
+
+        self.disable_scheduler()
+        self.scheduler = FrameScheduler(self, sorts, budgets, report_interval)
+        if self.late_latch is not None:
+            self.attach_late_latch()
+        return self.scheduler
+
+    def disable_scheduler(self):
+        """
+        Disable the frame phase scheduler, the jobs of all the phases are removed.
+        """
+
+        if self.scheduler is not None:
+            self.scheduler.remove()
+            self.scheduler = None
+            if self.late_latch is not None:
+                self.attach_late_latch()
+
     def identify_application(self, application_filename, app_key, temporary=True, force=False):
         """
         Register the application in OpenVR, this will allow any custom configuration made in the OpenVR implementation
@@ -411,7 +904,10 @@ void main() {
 
     def load_action_manifest(self, action_filename, action_path=None):
         """
-        Load the action manifest given in parameter.
+        Load the action manifest given in parameter and resolve the handles of all the action sets, actions and the
+        common input sources it contains. The resolved handles are available in action_manifest, e.g.
+        action_manifest.default.GrabGrip for the action '/actions/default/in/GrabGrip', and the returned
+        ActionManifest.
 
         action_filename : Path to the action manifest main configuration file.
 
@@ -421,30 +917,191 @@ void main() {
         if self.verbose:
             print("Loading", action_filename)
         self.vr_input.setActionManifestPath(action_filename)
+        self.action_manifest = ActionManifest(self.vr_input, action_filename)
+        self.input_sources.update(self.action_manifest.input_sources)
         if action_path is not None:
             print("WARNING: 'action_path' parameter of load_action_manifest() is deprecated and will be removed in a next release")
             self.add_action_set(action_path)
+        return self.action_manifest
+
+    def get_input_source_handle(self, input_source_path):
+        """
+        Return the handle of the given input source, e.g. "/user/hand/left". The handle is resolved only once.
+        """
 
-    def add_action_set(self, action_set_path):
+        handle = self.input_sources.get(input_source_path)
+        if handle is None:
+            handle = self.vr_input.getInputSourceHandle(input_source_path)
+            self.input_sources[input_source_path] = handle
+        return handle
+
+    def add_action_set(self, action_set_path, priority=0, secondary_action_set_path=None, restricted_device_path=None, enabled=True):
         """
-        Add the given action set to the list of action sets to update each frame.
+        Add the given action set to the list of action sets to update each frame and return its ActionSet instance.
+        If the action set is already registered, the existing instance is returned unmodified.
 
         action_set_path : Full path of the action set
+
+        priority : Priority of the action set, higher priority sets can block the inputs of lower priority sets.
+
+        secondary_action_set_path : Full path of the secondary action set, if any.
+
+        restricted_device_path : Path of the input source to which the action set is restricted, e.g. "/user/hand/left"
+
+        enabled : If False, the action set is registered but not updated until it is enabled.
         """
 
-        self.action_set_handles.append(self.vr_input.getActionSetHandle(action_set_path))
+        action_set = self.get_action_set(action_set_path)
+        if action_set is not None:
+            return action_set
+        if secondary_action_set_path is not None:
+            secondary_action_set = self.vr_input.getActionSetHandle(secondary_action_set_path)
+        else:
+            secondary_action_set = openvr.k_ulInvalidActionSetHandle
+        if restricted_device_path is not None:
+            restricted_device = self.get_input_source_handle(restricted_device_path)
+        else:
+            restricted_device = openvr.k_ulInvalidInputValueHandle
+        action_set = ActionSet(self,
+                               action_set_path,
+                               self.vr_input.getActionSetHandle(action_set_path),
+                               priority,
+                               secondary_action_set,
+                               restricted_device,
+                               enabled)
+        self.action_sets.append(action_set)
+        self.invalidate_action_sets()
+        if self.action_manifest is not None and action_set_path.lower() in self.action_manifest.action_sets:
+            # Sample all the input actions of the set once per frame
+            self.action_manifest.get_action_set(action_set_path).register_actions(self.input_snapshot, action_set)
+        return action_set
+
+    def get_action_set(self, action_set_path):
+        """
+        Return the registered ActionSet instance for the given path, or None if the action set is not registered.
+        """
+
+        for action_set in self.action_sets:
+            if action_set.path == action_set_path:
+                return action_set
+        return None
+
+    def remove_action_set(self, action_set_path):
+        """
+        Remove the given action set from the list of action sets to update each frame, its actions are no longer
+        sampled each frame.
+        """
+
+        action_set = self.get_action_set(action_set_path)
+        if action_set is not None:
+            self.action_sets.remove(action_set)
+            self.invalidate_action_sets()
+            if self.action_manifest is not None and action_set_path.lower() in self.action_manifest.action_sets:
+                self.action_manifest.get_action_set(action_set_path).unregister_actions(self.input_snapshot)
+
+    def enable_action_set(self, action_set_path, enabled=True):
+        """
+        Enable or disable the update of the given registered action set. The actions of a disabled set are no
+        longer sampled each frame.
+        """
+
+        action_set = self.get_action_set(action_set_path)
+        if action_set is not None:
+            action_set.set_enabled(enabled)
+
+    def invalidate_action_sets(self):
+        """
+        Request the array of active action sets to be rebuilt before the next update of the action state.
+        """
+
+        self.action_sets_dirty = True
+
+    def build_active_action_sets(self):
+        """
+        Rebuild the array of active action sets given to updateActionState(), this is only done when the list of
+        registered action sets or their parameters have changed.
+        """
+
+        enabled_action_sets = [action_set for action_set in self.action_sets if action_set.enabled]
+        self.action_set_handles = [action_set.handle for action_set in enabled_action_sets]
+        if len(enabled_action_sets) > 0:
+            self.active_action_sets = (openvr.VRActiveActionSet_t * len(enabled_action_sets))()
+            for (i, action_set) in enumerate(enabled_action_sets):
+                action_set.fill(self.active_action_sets[i])
+        else:
+            self.active_action_sets = None
+        self.action_sets_dirty = False
+
+    def get_projection_mat(self, eye):
+        """
+        Return the projection matrix of the given eye, using the current near and far planes.
+        """
+
+        return self.coord_mat_inv * self.convert_mat(self.vr_system.getProjectionMatrix(eye, self.near, self.far))
+
+    def set_near_far(self, near, far):
+        """
+        Change the near and far planes of the cameras, the projection matrices are rebuilt immediately.
+        """
+
+        self.near = near
+        self.far = far
+        self.update_projections()
+
+    def update_projections(self):
+        """
+        Retrieve the projection matrices of both eyes and update the lenses of the cameras.
+        """
+
+        self.projection_left = self.get_projection_mat(openvr.Eye_Left)
+        self.projection_right = self.get_projection_mat(openvr.Eye_Right)
+        self.left_cam.node().get_lens().set_user_mat(self.projection_left)
+        self.right_cam.node().get_lens().set_user_mat(self.projection_right)
+        for renderer in self.foveated_renderers:
+            renderer.update_projection(renderer.camera.node().get_lens().get_user_mat())
+        if self.tight_cull_bounds:
+            self.update_cull_bounds()
+        self.projections_dirty = False
+
+    def update_eye_transforms(self):
+        """
+        Retrieve the eye to head transforms and update the anchors of the eyes in the tracking space.
+        """
+
+        view_left = self.vr_system.getEyeToHeadTransform(openvr.Eye_Left)
+        self.left_eye_anchor.set_mat(convert_pose_mat(view_left.m))
+        view_right = self.vr_system.getEyeToHeadTransform(openvr.Eye_Right)
+        self.right_eye_anchor.set_mat(convert_pose_mat(view_right.m))
+        self.eye_transforms_dirty = False
+
+    def invalidate_eye_transforms(self, projections=False):
+        """
+        Request the eye transforms, and optionally the projections, to be retrieved again on the next HMD update.
+        The hidden area meshes are also retrieved again and the attached masks rebuilt.
+        """
+
+        self.eye_transforms_dirty = True
+        # The hidden area meshes depend on the IPD
+        self.hidden_area_meshes = {}
+        self.hidden_area_meshes_dirty = True
+        if self.hidden_area_mesh_cache is not None:
+            self.hidden_area_mesh_cache.invalidate()
+        if projections:
+            self.projections_dirty = True
 
     def update_hmd(self, pose):
         """
-        Update the anchors linked to the headset and the eyes in the tracking space
+        Update the anchors linked to the headset and the eyes in the tracking space.
+        The eye transforms and projections are only retrieved again when they have been invalidated.
         """
 
-        modelview = self.convert_mat(pose.mDeviceToAbsoluteTracking)
-        self.hmd_anchor.set_mat(self.coord_mat_inv * modelview * self.coord_mat)
-        view_left = self.convert_mat(self.vr_system.getEyeToHeadTransform(openvr.Eye_Left))
-        self.left_eye_anchor.set_mat(self.coord_mat_inv * view_left * self.coord_mat)
-        view_right = self.convert_mat(self.vr_system.getEyeToHeadTransform(openvr.Eye_Right))
-        self.right_eye_anchor.set_mat(self.coord_mat_inv * view_right * self.coord_mat)
+        self.hmd_anchor.set_mat(self.pose_engine.get_mat(openvr.k_unTrackedDeviceIndex_Hmd))
+        if self.eye_transforms_dirty:
+            self.update_eye_transforms()
+        if self.projections_dirty:
+            self.update_projections()
+        if self.hidden_area_meshes_dirty:
+            self.update_hidden_area_meshes()
 
     def set_new_tracked_device_handler(self, event_handler):
         """
@@ -456,15 +1113,72 @@ void main() {
 
         self.new_tracked_device_handler = event_handler
 
+    def scan_active_devices(self):
+        """
+        Rebuild the registry of the active devices by querying the connection state of every device slot.
+        This is done only at initialization, afterwards the registry is updated from the device events.
+        """
+
+        self.active_devices.clear()
+        for i in range(1, openvr.k_unMaxTrackedDeviceCount):
+            if self.vr_system.isTrackedDeviceConnected(i):
+                self.active_devices.add(i)
+
+    def get_device_anchor_name(self, device_index):
+        """
+        Return the name of the anchor of the given tracked device.
+        """
+
+        model_name = self.vr_system.getStringTrackedDeviceProperty(device_index, openvr.Prop_RenderModelName_String)
+        return str(device_index) + ':' + model_name
+
+    def activate_tracked_device(self, device_index):
+        """
+        Add the given device to the registry of the active devices.
+        """
+
+        self.active_devices.add(device_index)
+
+    def deactivate_tracked_device(self, device_index):
+        """
+        Remove the given device from the registry of the active devices. Its anchor, if any, is detached from the
+        tracking space and kept aside to be reused if the same device is reconnected.
+        """
+
+        self.active_devices.discard(device_index)
+        device_anchor = self.tracked_devices_anchors.pop(device_index, None)
+        if device_anchor is not None:
+            device_anchor.detach_node()
+            self.inactive_devices_anchors[device_index] = device_anchor
+
+    def refresh_tracked_device(self, device_index):
+        """
+        Update the name of the anchor of the given device after its properties have changed.
+        """
+
+        device_anchor = self.tracked_devices_anchors.get(device_index)
+        if device_anchor is not None:
+            device_anchor.set_name(self.get_device_anchor_name(device_index))
+
     def update_tracked_device(self, device_index, pose):
         """
         Update the anchor linked to the tracked device in the tracking space. If the device is not yet in the list of
         tracked devices, the new_tracked_device handler will be called.
+        If the anchor of a previously deactivated device is available and the device is the same model, the anchor is
+        reattached to the tracking space and the handler is not called again.
         """
 
         if not device_index in self.tracked_devices_anchors:
-            model_name = self.vr_system.getStringTrackedDeviceProperty(device_index, openvr.Prop_RenderModelName_String)
-            np_name = str(device_index) + ':' + model_name
+            np_name = self.get_device_anchor_name(device_index)
+            device_anchor = self.inactive_devices_anchors.pop(device_index, None)
+            if device_anchor is not None:
+                if device_anchor.get_name() == np_name:
+                    device_anchor.reparent_to(self.tracking_space)
+                    self.tracked_devices_anchors[device_index] = device_anchor
+                    device_anchor.set_mat(self.pose_engine.get_mat(device_index))
+                    return
+                # A different device is now using this slot, the old anchor can not be reused
+                device_anchor.remove_node()
             device_anchor = self.tracking_space.attach_new_node(np_name)
             self.tracked_devices_anchors[device_index] = device_anchor
             if hasattr(self, 'new_tracked_device'):
@@ -477,20 +1191,16 @@ void main() {
                     self.new_tracked_device_handler(device_index, device_anchor)
         else:
             device_anchor = self.tracked_devices_anchors[device_index]
-        modelview = self.convert_mat(pose.mDeviceToAbsoluteTracking)
-        modelview = self.coord_mat_inv * modelview * self.coord_mat
-        device_anchor.set_mat(modelview)
+        device_anchor.set_mat(self.pose_engine.get_mat(device_index))
 
     def update_tracked_devices(self):
         """
-        Update all the tracked devices linked with the observed poses
+        Update all the active tracked devices linked with the observed poses
         """
 
-        for i in range(1, len(self.poses)):
-            pose = self.poses[i]
-            if not pose.bPoseIsValid:
-                continue
-            self.update_tracked_device(i, pose)
+        for i in self.active_devices:
+            if self.pose_engine.is_valid(i):
+                self.update_tracked_device(i, self.poses[i])
 
     def register_event_handler(self, event_handler):
         """
@@ -514,11 +1224,14 @@ void main() {
     def poll_events(self):
         """
         Retrieve and forward all the events pending in the VR system to the registered event handlers.
+        Return the number of processed events.
         """
 
+        event_count = 0
         event = openvr.VREvent_t()
         has_events = self.vr_system.pollNextEvent(event)
         while has_events:
+            event_count += 1
             if event.eventType == openvr.VREvent_InputFocusCaptured:
                 if self.verbose:
                     print("Application captured the input focus")
@@ -527,6 +1240,23 @@ void main() {
                 if self.verbose:
                     print("Application released the input focus")
                 self.has_focus = False
+            elif event.eventType == openvr.VREvent_TrackedDeviceActivated:
+                if event.trackedDeviceIndex != openvr.k_unTrackedDeviceIndex_Hmd:
+                    self.activate_tracked_device(event.trackedDeviceIndex)
+            elif event.eventType == openvr.VREvent_TrackedDeviceDeactivated:
+                self.deactivate_tracked_device(event.trackedDeviceIndex)
+            elif event.eventType == openvr.VREvent_TrackedDeviceUpdated:
+                self.refresh_tracked_device(event.trackedDeviceIndex)
+                if event.trackedDeviceIndex == openvr.k_unTrackedDeviceIndex_Hmd:
+                    self.invalidate_eye_transforms(projections=True)
+            elif event.eventType == openvr.VREvent_IpdChanged:
+                self.invalidate_eye_transforms()
+            elif event.eventType == openvr.VREvent_LensDistortionChanged:
+                self.invalidate_eye_transforms(projections=True)
+            elif event.eventType == openvr.VREvent_PropertyChanged:
+                if event.trackedDeviceIndex == openvr.k_unTrackedDeviceIndex_Hmd and \
+                        event.data.property.prop in (openvr.Prop_UserIpdMeters_Float, openvr.Prop_UserHeadToEyeDepthMeters_Float):
+                    self.invalidate_eye_transforms(projections=True)
             if hasattr(self, 'process_vr_event'):
                 if not self.process_vr_event_notified:
                     print("WARNING: 'update_action()' method is deprecated and will be removed in a next release")
@@ -536,19 +1266,19 @@ void main() {
                 for event_handler in self.event_handlers:
                     event_handler(event)
             has_events = self.vr_system.pollNextEvent(event)
+        return event_count
 
     def update_action_state(self):
         """
         Update the state of all the registered action sets.
         """
 
-        nb_of_action_sets = len(self.action_set_handles)
-        if nb_of_action_sets > 0:
-            action_sets = (openvr.VRActiveActionSet_t * nb_of_action_sets)()
-            for i in range(nb_of_action_sets):
-                action_set = action_sets[i]
-                action_set.ulActionSet = self.action_set_handles[i]
-            self.vr_input.updateActionState(action_sets)
+        if self.action_sets_dirty:
+            self.build_active_action_sets()
+        if self.active_action_sets is not None:
+            self.vr_input.updateActionState(self.active_action_sets)
+        # Sample all the registered actions once for this frame
+        self.input_snapshot.update()
         if hasattr(self, 'update_action'):
             if not self.update_action_notified:
                 print("WARNING: 'update_action()' method is deprecated and will be removed in a next release")
@@ -564,12 +1294,50 @@ void main() {
 
         if self.compositor is None:
             return task.cont
+        stats = self.stats
+        recorder = self.flight_recorder
         # waitGetPoses() is a blocking call, it will returns only when OpenVR allow us to start rendering the next
-        # frame.
-        self.compositor.waitGetPoses(self.poses, None)
+        # frame. In threaded mode, the wait has already been started by the worker and only the remaining time is
+        # spent here. In pipelined mode, the wait is done by the Draw thread and the poses are only predicted.
+        if recorder is not None:
+            recorder.begin_wait()
+        stats.wait_poses.start()
+        if self.pipeline is not None:
+            self.pipeline.predict_poses(self.poses)
+        elif self.pose_waiter is not None:
+            if not self.pose_waiter.acquire(self.poses):
+                # The previous poses are kept and the frame, rendered with stale poses, is not submitted
+                stats.wait_timeouts += 1
+                if stats.wait_timeouts == 1:
+                    print("WARNING: No poses received from the wait thread, the previous poses are used")
+                if recorder is not None:
+                    recorder.trigger('wait-timeout', "{} wait timeouts".format(stats.wait_timeouts))
+        else:
+            self.compositor.waitGetPoses(self.poses, None)
+        stats.wait_poses.stop()
+        if recorder is not None:
+            recorder.end_wait()
+            if self.pipeline is not None:
+                self.pipeline.set_recorder_slot(recorder.current)
+        stats.convert_poses.start()
+        self.pose_engine.update()
+        stats.convert_poses.stop()
+        if stats.frame_timing_enabled:
+            stats.update_frame_timing(self.compositor)
+            if recorder is not None:
+                recorder.record_compositor(stats.compositor)
+            if self.dynamic_resolution is not None:
+                self.dynamic_resolution.update(stats.compositor)
+        if recorder is not None:
+            recorder.stamp(FlightRecorder.poses_end)
 
         # Poll and forward all the pending events
-        self.poll_events()
+        stats.events.start()
+        event_count = self.poll_events()
+        stats.events.stop()
+        if recorder is not None:
+            recorder.stamp(FlightRecorder.events_end)
+            recorder.record_counts(event_count, len(self.active_devices))
 
         # Retrieve the HMD pose, or bail out if it is not available.
         hmd_pose = self.poses[openvr.k_unTrackedDeviceIndex_Hmd]
@@ -577,16 +1345,258 @@ void main() {
             if self.verbose:
                 print("HMD pose is not valid")
             return task.cont
+        stats.hmd.start()
         self.update_hmd(hmd_pose)
+        if self.pipeline is not None:
+            self.pipeline.set_render_pose(hmd_pose.mDeviceToAbsoluteTracking)
+        stats.hmd.stop()
+        if recorder is not None:
+            recorder.stamp(FlightRecorder.hmd_end)
 
         # Update any explicitly tracked devices
+        stats.devices.start()
         self.update_tracked_devices()
+        stats.devices.stop()
+        if recorder is not None:
+            recorder.stamp(FlightRecorder.devices_end)
 
         # Update all the action sets
+        stats.actions.start()
         self.update_action_state()
+        stats.actions.stop()
+        if recorder is not None:
+            recorder.stamp(FlightRecorder.actions_end)
 
         return task.cont
 
+    def set_timing_mode(self, explicit=True, post_present_handoff=True):
+        """
+        Configure when the compositor considers that the frame starts and ends.
+
+        * explicit : If True, the explicit timing mode of the compositor is enabled and the timing data of the frame
+          is submitted from within the Draw context, just before the first display region of the frame is drawn,
+          instead of being recorded by waitGetPoses(). Note that OpenVR only supports it with Vulkan and D3D12, if
+          the runtime rejects the timing data, the implicit timing mode is restored.
+
+        * post_present_handoff : If True, postPresentHandoff() is called right after the final submit, so the
+          compositor can start its work without waiting for the next call to waitGetPoses(). With the explicit
+          timing mode, the compositor then relies on it.
+        """
+
+        if explicit:
+            if post_present_handoff:
+                mode = openvr.VRCompositorTimingMode_Explicit_ApplicationPerformsPostPresentHandoff
+            else:
+                mode = openvr.VRCompositorTimingMode_Explicit_RuntimePerformsPostPresentHandoff
+            if self.frame_start_dr is None:
+                # The left eye callback is called at the start of the frame, otherwise a callback is added on the
+                # first display region rendered
+                first_dr = self.display_regions[0]
+                if first_dr.get_draw_callback() is None:
+                    first_dr.set_draw_callback(PythonCallbackObject(self.frame_start_cb))
+                self.frame_start_dr = first_dr
+        else:
+            mode = openvr.VRCompositorTimingMode_Implicit
+        self.compositor.setExplicitTimingMode(mode)
+        self.explicit_timing = explicit
+        self.post_present_handoff = post_present_handoff
+        self.timing_frame = -1
+
+    def is_waiting_poses(self):
+        """
+        Return True if the wait thread is still waiting for the poses of the current frame. This happens when the
+        wait timed out, the frame is then rendered with the previous poses and must not be submitted.
+        """
+
+        return self.pose_waiter is not None and self.pose_waiter.waiting
+
+    def begin_frame(self):
+        """
+        Called from within the Draw context just before the first GPU work of the frame. In explicit timing mode,
+        the timing data is submitted once per frame.
+        """
+
+        if not self.explicit_timing or self.is_waiting_poses():
+            return
+        thread = Thread.get_current_thread()
+        frame = ClockObject.get_global_clock().get_frame_count(thread)
+        if frame == self.timing_frame:
+            return
+        self.timing_frame = frame
+        self.stats.timing_data.start(thread)
+        try:
+            self.compositor.submitExplicitTimingData()
+        except openvr.error_code.CompositorError as e:
+            print("WARNING: Explicit timing data rejected by the compositor, using the implicit timing mode:", repr(e))
+            self.set_timing_mode(False, self.post_present_handoff)
+        self.stats.timing_data.stop(thread)
+
+    def frame_start_cb(self, cbdata):
+        """
+        Draw callback linked with the first display region rendered, when it is not the left eye.
+        """
+
+        self.begin_frame()
+        cbdata.upcall()
+
+    def get_pipeline_latency(self):
+        """
+        Return the time between the preparation of a frame by the App thread and its submit, in addition to the
+        current frame, when a pipelined threading model is used.
+        """
+
+        if self.pipeline is not None:
+            return self.pipeline.get_latency()
+        return 0.0
+
+    def set_render_pose(self, matrix):
+        """
+        Submit the eye textures of the frame being prepared together with the given HMD pose, as a HmdMatrix34_t.
+        This must be used when the frame is not rendered with the poses retrieved at the start of the frame.
+        """
+
+        if self.pipeline is not None:
+            self.pipeline.set_render_pose(matrix)
+        else:
+            for descriptor in self.submit_descriptors:
+                descriptor.set_render_pose(matrix)
+
+    def clear_render_pose(self):
+        """
+        Submit the eye textures without pose. In pipelined mode, the pose is always submitted.
+        """
+
+        if self.pipeline is None:
+            for descriptor in self.submit_descriptors:
+                descriptor.clear_render_pose()
+
+    def update_late_latch_task(self, task):
+        """
+        Task updating the anchors with the latest predicted poses, just before the cull.
+        """
+
+        self.late_latch.update()
+        return task.cont
+
+    def enable_late_latch(self, sort=49, devices=True):
+        """
+        Enable the late latching of the poses. Just before the cull, the poses of the HMD and, if devices is True,
+        of the tracked devices are predicted again for the time remaining until the photons of the frame are
+        emitted, and their anchors are updated. The HMD pose used is submitted with the eye textures.
+        The pose actions registered with add_late_latch_pose() are also updated.
+
+        * sort : Sort of the late latch task, it must run after all the application tasks and before igLoop. When the
+          scheduler is enabled, the poses are late latched in the late-latch phase instead.
+
+        Return the instance of LateLatch.
+        """
+
+        self.disable_late_latch()
+        self.late_latch = LateLatch(self, devices)
+        self.late_latch_sort = sort
+        self.attach_late_latch()
+        return self.late_latch
+
+    def attach_late_latch(self):
+        """
+        Run the late latching at the start of the late-latch phase of the scheduler, if enabled, or in its own task.
+        """
+
+        if self.late_latch_task is not None:
+            taskMgr.remove(self.late_latch_task)
+            self.late_latch_task = None
+        if self.scheduler is not None:
+            self.scheduler.add_job(FrameScheduler.late_latch, self.late_latch.update, "openvr-late-latch", first=True)
+        else:
+            self.late_latch_task = taskMgr.add(self.update_late_latch_task, "openvr-late-latch", sort=self.late_latch_sort)
+
+    def disable_late_latch(self):
+        """
+        Disable the late latching of the poses.
+        """
+
+        if self.late_latch is not None:
+            if self.late_latch_task is not None:
+                taskMgr.remove(self.late_latch_task)
+            if self.scheduler is not None:
+                self.scheduler.remove_job(FrameScheduler.late_latch, "openvr-late-latch")
+            self.late_latch.clear()
+            self.late_latch = None
+            self.late_latch_task = None
+
+    def add_late_latch_pose(self, action, node_path, device=openvr.k_ulInvalidInputValueHandle):
+        """
+        Update the transform of the given node path from the given pose action when the poses are late latched.
+        """
+
+        if self.late_latch is not None:
+            self.late_latch.add_action_pose(action, node_path, device)
+
+    def remove_late_latch_pose(self, node_path):
+        """
+        Stop updating the transform of the given node path when the poses are late latched.
+        """
+
+        if self.late_latch is not None:
+            self.late_latch.remove_action_pose(node_path)
+
+    def enable_flight_recorder(self, size=256, budget_ms=None, dump_dir='.', cooldown=10.0, watchdog=True, long_task_ms=2.0):
+        """
+        Enable the flight recorder, keeping the timeline of the last frames and dumping it into dump_dir when the
+        compositor reports a dropped or reprojected frame, or when a frame exceeds the budget.
+        The frame timing of the compositor is enabled if needed. Return the instance of FlightRecorder.
+
+        * budget_ms : Maximum interval between two frames, in milliseconds. If None, 1.5 times the refresh period of
+          the HMD is used.
+
+        See FlightRecorder for the other parameters.
+        """
+
+        self.disable_flight_recorder()
+        if budget_ms is None:
+            refresh_rate = self.vr_system.getFloatTrackedDeviceProperty(openvr.k_unTrackedDeviceIndex_Hmd, openvr.Prop_DisplayFrequency_Float)
+            if refresh_rate > 0:
+                budget_ms = 1500.0 / refresh_rate
+        if not self.stats.frame_timing_enabled:
+            self.enable_frame_timing()
+        self.flight_recorder = FlightRecorder(self, size, budget_ms, dump_dir, cooldown, watchdog, long_task_ms)
+        return self.flight_recorder
+
+    def disable_flight_recorder(self):
+        """
+        Disable the flight recorder, if enabled.
+        """
+
+        if self.flight_recorder is not None:
+            self.flight_recorder.stop()
+            self.flight_recorder = None
+
+    def enable_frame_timing(self, enabled=True, cumulative_interval=0):
+        """
+        Enable or disable the retrieval, once per frame, of the frame timing from the compositor. The counters are
+        available in stats.compositor and are also reported as PStats levels.
+
+        * cumulative_interval : If not 0, the cumulative statistics of the compositor are also retrieved every
+          cumulative_interval frames and stored in stats.compositor.cumulative_stats
+        """
+
+        self.stats.enable_frame_timing(enabled, cumulative_interval)
+
+    def get_frame_timing(self, frames_ago=0):
+        """
+        Return the openvr.Compositor_FrameTiming of the given frame, or None if not available.
+        """
+
+        result, timing = self.compositor.getFrameTiming(frames_ago)
+        return timing if result else None
+
+    def get_cumulative_stats(self):
+        """
+        Return the openvr.Compositor_CumulativeStats accumulated by the compositor since the application started.
+        """
+
+        return self.stats.compositor.update_cumulative_stats(self.compositor)
+
     def set_submit_error_handler(self, error_handler):
         """
         Register a handler called when submit_texture() fails. If no handler is registered, the catched
@@ -597,23 +1607,75 @@ void main() {
 
         self.submit_error_handler = error_handler
 
-    def submit_texture(self, eye, texture):
+    def get_submit_descriptor(self, eye, texture, bounds=None):
+        """
+        Return a submit descriptor of the given eye for submit_texture(). The descriptor is kept across frames and
+        is only replaced when the texture changes.
+
+        * bounds : Part of the texture containing the eye image. If None, the whole texture is used.
+        """
+
+        descriptor = self.texture_submits.get(eye)
+        if descriptor is None or descriptor.texture is not texture:
+            descriptor = SubmitDescriptor(eye, texture, None, self.color_space)
+            self.texture_submits[eye] = descriptor
+        descriptor.bounds = bounds if bounds is not None else self.full_bounds
+        return descriptor
+
+    def submit_texture(self, eye, texture, bounds=None):
         """
         Submit to OpenVR the rendered frame for the given eye.
         Note that this method must be called from within the Draw context in order to have the texture bound.
+
+        * bounds : Part of the texture containing the eye image. If None, the whole texture is used.
         """
 
+        self.submit_textures((self.get_submit_descriptor(eye, texture, bounds), ))
+
+    def get_draw_recorder_slot(self, recorder):
+        """
+        Return the slot of the given flight recorder of the frame rendered by the current thread, or None if the frame is
+        not recorded. With a pipelined threading model, the Draw thread renders an older frame than the one being
+        prepared by the App thread, its slot is retrieved from the record of the frame in the pipeline.
+        """
+
+        if recorder is None:
+            return None
+        if self.pipeline is not None:
+            return self.pipeline.get_recorder_slot()
+        return recorder.current
+
+    def submit_textures(self, descriptors):
+        """
+        Submit to OpenVR the textures described by the given submit descriptors, in order.
+        The native handles are only resolved again when the texture contexts have changed.
+        Note that this method must be called from within the Draw context in order to have the textures bound.
+        Nothing is submitted while the wait thread is still waiting for the poses.
+        """
+
+        if self.is_waiting_poses():
+            return
+        if self.gsg is None:
+            self.gsg = self.base.win.get_gsg()
+            self.prepared_objects = self.gsg.get_prepared_objects()
+        recorder = self.flight_recorder
+        slot = self.get_draw_recorder_slot(recorder)
+        # The collectors are reported to the Draw thread, which is not the main thread with a threaded pipeline
+        thread = Thread.get_current_thread()
         try:
-            # Retrieve the texture OpenGL binding
-            texture_context = texture.prepare_now(0, self.base.win.gsg.prepared_objects, self.base.win.gsg)
-            handle = texture_context.get_native_id()
-            if handle != 0:
-                ovr_texture = openvr.Texture_t()
-                ovr_texture.handle = texture_context.get_native_id()
-                ovr_texture.eType = openvr.TextureType_OpenGL
-                ovr_texture.eColorSpace = self.color_space
-                self.compositor.submit(eye, ovr_texture)
+            self.stats.submit.start(thread)
+            for descriptor in descriptors:
+                if not descriptor.resolve(self.prepared_objects, self.gsg):
+                    continue
+                left = descriptor.eye == openvr.Eye_Left
+                if slot is not None:
+                    recorder.stamp(FlightRecorder.submit_left_start if left else FlightRecorder.submit_right_start, slot)
+                self.compositor.submit(descriptor.eye, descriptor.ovr_texture, descriptor.bounds, descriptor.flags)
+                if slot is not None:
+                    recorder.stamp(FlightRecorder.submit_left_end if left else FlightRecorder.submit_right_end, slot)
+            self.stats.submit.stop(thread)
         except Exception as e:
+            self.stats.submit.stop(thread)
             if hasattr(self, 'on_texture_submit_error'):
                 if not self.on_texture_submit_error_notified:
                     print("WARNING: 'on_texture_submit_error()' is deprecated and will be removed in a future release")
@@ -632,11 +1694,23 @@ void main() {
         the result to OpenVR, if the eyes are submitted separately.
         """
 
+        self.begin_frame()
         # Perform the actual Draw job
+        recorder = self.flight_recorder
+        slot = self.get_draw_recorder_slot(recorder)
+        if slot is not None:
+            recorder.stamp(FlightRecorder.draw_left_start, slot)
+        thread = Thread.get_current_thread()
+        self.stats.draw_left.start(thread)
         cbdata.upcall()
+        self.stats.draw_left.stop(thread)
+        if slot is not None:
+            recorder.stamp(FlightRecorder.draw_left_end, slot)
         if not self.submit_together:
             # Submit the left eye texture if we are not submitting left and right textures at the same time
-            self.submit_texture(openvr.Eye_Left, self.left_texture)
+            if self.pipeline is not None:
+                self.pipeline.prepare_submit(self.left_submit, self.right_submit)
+            self.submit_textures((self.left_submit, ))
 
     def right_cb(self, cbdata):
         """
@@ -645,20 +1719,92 @@ void main() {
         """
 
         # Perform the actual Draw job
+        recorder = self.flight_recorder
+        slot = self.get_draw_recorder_slot(recorder)
+        if slot is not None:
+            recorder.stamp(FlightRecorder.draw_right_start, slot)
+        thread = Thread.get_current_thread()
+        self.stats.draw_right.start(thread)
         cbdata.upcall()
+        self.stats.draw_right.stop(thread)
+        if slot is not None:
+            recorder.stamp(FlightRecorder.draw_right_end, slot)
+        if self.pipeline is not None:
+            self.pipeline.prepare_submit(self.left_submit, self.right_submit)
         if self.submit_together:
-            # Submit the left eye texture if we are submitting left and right textures at the same time
-            self.submit_texture(openvr.Eye_Left, self.left_texture)
-        # In any case, submit the right eye texture
-        self.submit_texture(openvr.Eye_Right, self.right_texture)
+            # Submit both textures at the same time
+            self.submit_textures(self.submit_descriptors)
+        else:
+            self.submit_textures((self.right_submit, ))
+        self.end_frame()
+
+    def stereo_cb(self, cbdata):
+        """
+        Draw callback that is linked with the right half of the side by side buffer. As the right half is rendered
+        last, once the frame rendering is done, both halves of the texture are submitted to OpenVR.
+        """
+
+        # Perform the actual Draw job
+        recorder = self.flight_recorder
+        slot = self.get_draw_recorder_slot(recorder)
+        if slot is not None:
+            recorder.stamp(FlightRecorder.draw_left_start, slot)
+        thread = Thread.get_current_thread()
+        self.stats.draw_stereo.start(thread)
+        cbdata.upcall()
+        self.stats.draw_stereo.stop(thread)
+        if slot is not None:
+            recorder.stamp(FlightRecorder.draw_left_end, slot)
+        if self.pipeline is not None:
+            self.pipeline.prepare_submit(self.left_submit, self.right_submit)
+        self.submit_textures(self.submit_descriptors)
+        self.end_frame()
+
+    def end_frame(self):
+        """
+        Called from within the Draw context once the frame is complete and submitted.
+        """
+
+        if self.post_present_handoff and not self.is_waiting_poses():
+            # Let the compositor start its work now instead of at the next wait
+            thread = Thread.get_current_thread()
+            self.stats.handoff.start(thread)
+            self.compositor.postPresentHandoff()
+            self.stats.handoff.stop(thread)
+        if self.pose_waiter is not None:
+            # Start waiting for the next frame
+            self.pose_waiter.request_wait()
+        elif self.pipeline is not None:
+            # Wait for the next frame before the next submit, this paces the pipeline
+            self.pipeline.wait()
 
     def get_pose_modelview(self, pose):
         """
         Return the transform matrix corresponding to the given pose in the tracked space reference frame
         """
 
-        modelview = self.convert_mat(pose.mDeviceToAbsoluteTracking)
-        return self.coord_mat_inv * modelview * self.coord_mat
+        return convert_pose_mat(pose.mDeviceToAbsoluteTracking.m)
+
+    def register_action(self, action, action_type, device=openvr.k_ulInvalidInputValueHandle):
+        """
+        Register an action to be sampled once per frame, right after the update of the action state.
+        Actions that are not registered are sampled on their first access in the frame.
+
+        action : OpenVR handle of the action, can be retrieved using vr_input.getActionHandle()
+
+        action_type : One of InputSnapshot.digital, InputSnapshot.analog, InputSnapshot.pose or InputSnapshot.skeletal
+
+        device : For pose actions, handle of the device to which the pose is restricted.
+        """
+
+        self.input_snapshot.register(action, action_type, device)
+
+    def get_origin_device_path(self, origin):
+        """
+        Return the handle of the device linked to the given action origin, the result is cached for the current frame.
+        """
+
+        return self.input_snapshot.get_origin_device_path(origin)
 
     def get_action_pose(self, action, device=openvr.k_ulInvalidInputValueHandle):
         """
@@ -669,12 +1815,16 @@ void main() {
         device : Handle of a device. If specified, restrict the pose to the linked device.
         """
 
-        pose_data = self.vr_input.getPoseActionDataForNextFrame(
-            action,
-            openvr.TrackingUniverseStanding,
-            device,
-        )
-        return pose_data
+        return self.input_snapshot.get_pose(action, device)
+
+    def get_digital_action_data(self, action):
+        """
+        Return the state of the digital action for the current frame as a DigitalActionSample.
+
+        action : OpenVR handle of the action, can be retrieved using vr_input.getActionHandle()
+        """
+
+        return self.input_snapshot.get_digital(action)
 
     def get_digital_action_rising_edge(self, action, device_path=False):
         """
@@ -685,14 +1835,13 @@ void main() {
         device_path : If true, returns also the handle of the device that triggered the action.
         """
 
-        action_data = self.vr_input.getDigitalActionData(action, openvr.k_ulInvalidInputValueHandle)
-        if device_path is not None:
-            if action_data.bActive:
-                origin_info = self.vr_input.getOriginTrackedDeviceInfo(action_data.activeOrigin)
-                device_path = origin_info.devicePath
+        sample = self.input_snapshot.get_digital(action)
+        if device_path:
+            if sample.active:
+                device_path = self.input_snapshot.get_origin_device_path(sample.origin)
             else:
                 device_path = openvr.k_ulInvalidInputValueHandle
-        return action_data.bActive and action_data.bChanged and action_data.bState, device_path
+        return sample.rising_edge, device_path
 
     def get_digital_action_falling_edge(self, action, device_path=False):
         """
@@ -703,14 +1852,13 @@ void main() {
         device_path : If true, returns also the handle of the device that triggered the action.
         """
 
-        action_data = self.vr_input.getDigitalActionData(action, openvr.k_ulInvalidInputValueHandle)
+        sample = self.input_snapshot.get_digital(action)
         if device_path:
-            if action_data.bActive:
-                origin_info = self.vr_input.getOriginTrackedDeviceInfo(action_data.activeOrigin)
-                device_path = origin_info.devicePath
+            if sample.active:
+                device_path = self.input_snapshot.get_origin_device_path(sample.origin)
             else:
                 device_path = openvr.k_ulInvalidInputValueHandle
-        return action_data.bActive and action_data.bChanged and not action_data.bState, device_path
+        return sample.falling_edge, device_path
 
     def get_digital_action_state(self, action, device_path=False):
         """
@@ -721,14 +1869,13 @@ void main() {
         device_path : If true, returns also the handle of the device that triggered the action.
         """
 
-        action_data = self.vr_input.getDigitalActionData(action, openvr.k_ulInvalidInputValueHandle)
+        sample = self.input_snapshot.get_digital(action)
         if device_path:
-            if action_data.bActive:
-                origin_info = self.vr_input.getOriginTrackedDeviceInfo(action_data.activeOrigin)
-                device_path = origin_info.devicePath
+            if sample.active:
+                device_path = self.input_snapshot.get_origin_device_path(sample.origin)
             else:
                 device_path = openvr.k_ulInvalidInputValueHandle
-        return action_data.bActive and action_data.bState, device_path
+        return sample.state, device_path
 
     def get_analog_action_value(self, action, device_path=False):
         """
@@ -739,11 +1886,10 @@ void main() {
         device_path : If true, returns also the handle of the device that triggered the action.
         """
 
-        analog_data = self.vr_input.getAnalogActionData(action, openvr.k_ulInvalidInputValueHandle)
+        analog_data = self.input_snapshot.get_analog(action)
         if device_path:
             if analog_data.bActive:
-                origin_info = self.vr_input.getOriginTrackedDeviceInfo(analog_data.activeOrigin)
-                device_path = origin_info.devicePath
+                device_path = self.input_snapshot.get_origin_device_path(analog_data.activeOrigin)
             else:
                 device_path = openvr.k_ulInvalidInputValueHandle
         if analog_data.bActive:
@@ -796,10 +1942,38 @@ void main() {
             print("ERROR: Invalid bone index {}".format(bone_index))
         return LMatrix4.ident_mat()
 
+    def get_bone_transform_mats(self, bone_transform_array, out=None):
+        """
+        Returns the transforms of all the bones of the array, converted at once into a (N, 4, 4) NumPy array.
+        Each matrix is the same as the one returned by get_bone_transform_mat(). Returns None if NumPy is not available.
+
+        bone_transform_array : Array containing all the bones transformations
+
+        out : If not None, preallocated (N, 4, 4) float32 array receiving the result.
+        """
+
+        return bone_transforms_to_matrices(bone_transform_array, out)
+
+    def get_bone_buffer(self, action):
+        """
+        Returns the array of bone transforms preallocated for the given action. The array is allocated on first use
+        and then reused for each frame.
+
+        action : OpenVR handle of the action, can be retrieved using vr_input.getActionHandle()
+        """
+
+        bone_buffer = self.bone_buffers.get(action)
+        if bone_buffer is None:
+            bone_count = self.vr_input.getBoneCount(action)
+            bone_buffer = (openvr.VRBoneTransform_t * bone_count)()
+            self.bone_buffers[action] = bone_buffer
+        return bone_buffer
+
     def get_skeletal_bone_data(self, action, device_path=False):
         """
         Returns the skeleton bone data provided by the given action. The individual bone transform must be extracted
-        using either get_bone_transform() or get_bone_transform_mat()
+        using either get_bone_transform() or get_bone_transform_mat(), or all at once using get_bone_transform_mats().
+        Note that the returned array is reused and overwritten by the next call for the same action.
 
         action : OpenVR handle of the action, can be retrieved using vr_input.getActionHandle()
 
@@ -807,29 +1981,42 @@ void main() {
         """
 
         # Retrieve the data of the action, this will gives the active status and the device.
-        skeleton_data = self.vr_input.getSkeletalActionData(action)
+        skeleton_data = self.input_snapshot.get_skeletal(action)
         if skeleton_data.bActive == 0:
             return None, None
 
         # Retrieve the bones data from the action. The bone transforms are all defined in their parent's reference frame,
         # and the default range is as if there is no controller.
-        boneCount = self.vr_input.getBoneCount(action)
-        bone_transform_arr = [openvr.VRBoneTransform_t()] * boneCount
-        arr = (openvr.VRBoneTransform_t * len(bone_transform_arr))(*bone_transform_arr)
+        arr = self.get_bone_buffer(action)
         self.vr_input.getSkeletalBoneData(action, openvr.VRSkeletalTransformSpace_Parent, openvr.VRSkeletalMotionRange_WithoutController, arr)
 
         if device_path:
             if skeleton_data.bActive:
-                origin_info = self.vr_input.getOriginTrackedDeviceInfo(skeleton_data.activeOrigin)
-                device_path = origin_info.devicePath
+                device_path = self.input_snapshot.get_origin_device_path(skeleton_data.activeOrigin)
             else:
                 device_path = openvr.k_ulInvalidInputValueHandle
         return arr, device_path
 
+    def get_skeletal_summary_data(self, action, summary_type=openvr.VRSummaryType_FromAnimation):
+        """
+        Returns the summary of the skeleton provided by the given action, i.e. the curl of each finger and the splay
+        between them, or None if the action is not active. The result is cached for the current frame.
+
+        action : OpenVR handle of the action, can be retrieved using vr_input.getActionHandle()
+
+        summary_type : Either openvr.VRSummaryType_FromAnimation or openvr.VRSummaryType_FromDevice
+        """
+
+        skeleton_data = self.input_snapshot.get_skeletal(action)
+        if skeleton_data.bActive == 0:
+            return None
+        return self.input_snapshot.get_summary(action, summary_type)
+
     def get_skeletal_reference_transform(self, action, pose, device_path=False):
         """
         Returns the skeleton bone reference data provided by the given action. The individual bone transform must be
         extracted using either get_bone_transform() or get_bone_transform_mat()
+        The reference transforms do not change, they are retrieved only once for each action and pose.
 
         action : OpenVR handle of the action, can be retrieved using vr_input.getActionHandle()
 
@@ -838,22 +2025,22 @@ void main() {
         device_path : If true, returns also the handle of the device that triggered the action.
         """
 
-        skeleton_data = self.vr_input.getSkeletalActionData(action)
+        skeleton_data = self.input_snapshot.get_skeletal(action)
         if skeleton_data.bActive == 0:
             if device_path:
                 return None, openvr.k_ulInvalidInputValueHandle
             else:
                 return None, None
 
-        boneCount = self.vr_input.getBoneCount(action)
-        bone_transform_arr = [openvr.VRBoneTransform_t()] * boneCount
-        arr = (openvr.VRBoneTransform_t * len(bone_transform_arr))(*bone_transform_arr)
-        self.vr_input.getSkeletalReferenceTransforms(action, openvr.VRSkeletalTransformSpace_Parent, pose, arr)
+        arr = self.reference_transforms.get((action, pose))
+        if arr is None:
+            arr = (openvr.VRBoneTransform_t * len(self.get_bone_buffer(action)))()
+            self.vr_input.getSkeletalReferenceTransforms(action, openvr.VRSkeletalTransformSpace_Parent, pose, arr)
+            self.reference_transforms[(action, pose)] = arr
 
         if device_path:
             if skeleton_data.bActive:
-                origin_info = self.vr_input.getOriginTrackedDeviceInfo(skeleton_data.activeOrigin)
-                device_path = origin_info.devicePath
+                device_path = self.input_snapshot.get_origin_device_path(skeleton_data.activeOrigin)
             else:
                 device_path = openvr.k_ulInvalidInputValueHandle
         return arr, device_path
@@ -864,10 +2051,7 @@ void main() {
         """
 
         if self.poses is None: return 
-        for i in range(1, len(self.poses)):
-            pose = self.poses[i]
-            if not pose.bPoseIsValid:
-                continue
-            model_name = openvr.VRSystem().getStringTrackedDeviceProperty(i, openvr.Prop_RenderModelName_String)
-            model_serial = openvr.VRSystem().getStringTrackedDeviceProperty(i, openvr.Prop_SerialNumber_String)
+        for i in sorted(self.active_devices):
+            model_name = self.vr_system.getStringTrackedDeviceProperty(i, openvr.Prop_RenderModelName_String)
+            model_serial = self.vr_system.getStringTrackedDeviceProperty(i, openvr.Prop_SerialNumber_String)
             print(i, model_name, model_serial)
@@ -0,0 +1,164 @@
+from panda3d.core import ClockObject, Thread
+
+import ctypes
+import openvr
+
+from .latelatch import get_display_timing, get_seconds_to_photons
+
+class FrameRecord:
+    """
+    State of the frame prepared by the App thread and needed when the frame is submitted : the HMD pose used to
+    render it, the bounds of the eye images and the slot of the flight recorder of the frame.
+    """
+
+    def __init__(self):
+        self.frame = -1
+        self.pose = openvr.HmdMatrix34_t()
+        self.has_pose = False
+        self.left_bounds = None
+        self.right_bounds = None
+        self.recorder_slot = None
+
+class FramePipeline:
+    """
+    Synchronization of OpenVR with a pipelined threading model of Panda3D, e.g. 'threading-model Cull/Draw'.
+
+    With a pipelined threading model, the App thread prepares the frame N while the Draw thread renders and submits
+    the frame N - depth. waitGetPoses() can then no longer be called by the App thread, as the wait for the next
+    frame must only start once the previous frame has been submitted. Instead, waitGetPoses() is called by the Draw
+    thread just after the final submit, which keeps the wait and submit calls strictly alternated, and the wait paces
+    the whole pipeline.
+
+    As the frame prepared by the App thread is only submitted depth frames later, its poses are predicted with
+    getDeviceToAbsoluteTrackingPose() for the display time of the frame it will be submitted in. The HMD pose and
+    the texture bounds of each App frame are kept in a ring of records indexed by the frame number. The Draw thread
+    retrieves the record of the frame it renders, as seen from its pipeline stage, and submits the textures with the
+    pose they were rendered with.
+    """
+
+    def __init__(self, ovr, depth, size=8):
+        """
+        * ovr : Reference to the instance of P3DOpenVR.
+
+        * depth : Number of frames between the App and the Draw stages of the pipeline.
+
+        * size : Number of frame records kept, it must be larger than depth.
+        """
+
+        self.ovr = ovr
+        self.depth = depth
+        self.clock = ClockObject.get_global_clock()
+        self.records = [FrameRecord() for i in range(max(size, depth + 2))]
+        poses_t = openvr.TrackedDevicePose_t * openvr.k_unMaxTrackedDeviceCount
+        self.wait_poses = poses_t()
+        self.frame_duration, self.vsync_to_photons = get_display_timing(ovr.vr_system)
+        self.submitted_frame = -1
+        self.missing_records = 0
+
+    def get_latency(self):
+        """
+        Return the additional time needed for a frame to go through the pipeline.
+        """
+
+        return self.depth * self.frame_duration
+
+    def predict_poses(self, poses):
+        """
+        Predict the poses for the display time of the frame being prepared by the App thread.
+        """
+
+        vr_system = self.ovr.vr_system
+        seconds = get_seconds_to_photons(vr_system, self.frame_duration, self.vsync_to_photons) + self.get_latency()
+        vr_system.getDeviceToAbsoluteTrackingPose(openvr.TrackingUniverseStanding, seconds, poses)
+
+    def get_record(self):
+        """
+        Return the record of the frame being prepared by the App thread, the record is reset when a new frame is
+        started.
+        """
+
+        frame = self.clock.get_frame_count()
+        record = self.records[frame % len(self.records)]
+        if record.frame != frame:
+            record.frame = frame
+            record.has_pose = False
+            record.recorder_slot = None
+            record.left_bounds = self.ovr.left_bounds
+            record.right_bounds = self.ovr.right_bounds
+        return record
+
+    def set_render_pose(self, matrix):
+        """
+        Store the HMD pose used to render the frame prepared by the App thread, as a HmdMatrix34_t.
+        """
+
+        record = self.get_record()
+        ctypes.memmove(ctypes.byref(record.pose), ctypes.byref(matrix), ctypes.sizeof(record.pose))
+        record.has_pose = True
+
+    def set_bounds(self, left_bounds, right_bounds):
+        """
+        Store the texture bounds of the eyes of the frame prepared by the App thread.
+        """
+
+        record = self.get_record()
+        record.left_bounds = left_bounds
+        record.right_bounds = right_bounds
+
+    def set_recorder_slot(self, slot):
+        """
+        Store the slot of the flight recorder of the frame prepared by the App thread.
+        """
+
+        self.get_record().recorder_slot = slot
+
+    def get_recorder_slot(self):
+        """
+        Return the slot of the flight recorder of the frame rendered by the current thread, or None if the frame was
+        not recorded. This must be called from within the Draw context.
+        """
+
+        frame = self.clock.get_frame_count(Thread.get_current_thread())
+        record = self.records[frame % len(self.records)]
+        if record.frame != frame:
+            return None
+        return record.recorder_slot
+
+    def prepare_submit(self, left_submit, right_submit):
+        """
+        Configure the submit descriptors with the record of the frame rendered by the current thread. This must be
+        called from within the Draw context.
+        """
+
+        frame = self.clock.get_frame_count(Thread.get_current_thread())
+        if frame == self.submitted_frame:
+            return
+        self.submitted_frame = frame
+        record = self.records[frame % len(self.records)]
+        if record.frame != frame:
+            # The frame was prepared before the pipeline was set up, the compositor uses the pose of the last wait
+            self.missing_records += 1
+            left_submit.bounds = self.ovr.left_bounds
+            right_submit.bounds = self.ovr.right_bounds
+            left_submit.clear_render_pose()
+            right_submit.clear_render_pose()
+            return
+        left_submit.bounds = record.left_bounds
+        right_submit.bounds = record.right_bounds
+        if record.has_pose:
+            left_submit.set_render_pose(record.pose)
+            right_submit.set_render_pose(record.pose)
+        else:
+            left_submit.clear_render_pose()
+            right_submit.clear_render_pose()
+
+    def wait(self):
+        """
+        Wait for the next frame, this is called by the Draw thread once the last eye has been submitted.
+        """
+
+        thread = Thread.get_current_thread()
+        stats = self.ovr.stats
+        stats.draw_wait_poses.start(thread)
+        self.ovr.compositor.waitGetPoses(self.wait_poses, None)
+        stats.draw_wait_poses.stop(thread)
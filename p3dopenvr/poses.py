@@ -0,0 +1,163 @@
+from panda3d.core import LMatrix4
+
+import ctypes
+import openvr
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def convert_pose_mat(m):
+    """
+    Convert the content of a OpenVR 3x4 matrix into a Panda3D 4x4 matrix, including the conversion from the OpenVR
+    coordinate system (Y-up right handed) into the Panda3D coordinate system (Z-up right handed).
+    This is equivalent to coord_mat_inv * convert_mat(mat) * coord_mat, but the conversion is done using a fixed
+    axis permutation instead of two matrix multiplications.
+
+    * m : The m field of a HmdMatrix34_t
+    """
+
+    return LMatrix4(
+        m[0][0], -m[2][0], m[1][0], 0.0,
+        -m[0][2], m[2][2], -m[1][2], 0.0,
+        m[0][1], -m[2][1], m[1][1], 0.0,
+        m[0][3], -m[2][3], m[1][3], 1.0)
+
+if np is not None:
+    # Source indices in the OpenVR 3x4 matrix of each of the converted 4x3 upper part of the Panda3D matrix
+    # together with the sign of each element, see convert_pose_mat() for the actual formula.
+    _pose_rows = np.array([[0, 2, 1]] * 4)
+    _pose_cols = np.array([[0] * 3, [2] * 3, [1] * 3, [3] * 3])
+    _pose_signs = np.array([[1, -1, 1], [-1, 1, -1], [1, -1, 1], [1, -1, 1]], dtype=np.float32)
+    # Permutation and signs to convert a OpenVR vector into a Panda3D vector
+    _vector_perm = np.array([0, 2, 1])
+    _vector_signs = np.array([1, -1, 1], dtype=np.float32)
+    # Permutation and signs to convert a 4x4 matrix in the OpenVR coordinate system into the Panda3D coordinate system
+    _mat_perm = np.array([0, 2, 1, 3])
+    _mat_signs = np.outer([1, -1, 1, 1], [1, -1, 1, 1]).astype(np.float32)
+
+    def make_pose_dtype():
+        """
+        Return the NumPy structured type matching the memory layout of openvr.TrackedDevicePose_t
+        """
+
+        pose_t = openvr.TrackedDevicePose_t
+        return np.dtype({
+            'names': ['matrix', 'velocity', 'angular_velocity', 'tracking_result', 'valid', 'connected'],
+            'formats': [(np.float32, (3, 4)), (np.float32, (3,)), (np.float32, (3,)), np.uint32, np.bool_, np.bool_],
+            'offsets': [pose_t.mDeviceToAbsoluteTracking.offset, pose_t.vVelocity.offset, pose_t.vAngularVelocity.offset,
+                        pose_t.eTrackingResult.offset, pose_t.bPoseIsValid.offset, pose_t.bDeviceIsConnected.offset],
+            'itemsize': ctypes.sizeof(pose_t),
+        })
+
+class PoseEngine:
+    """
+    Batched conversion of the poses of all the tracked devices.
+
+    When NumPy is available, the ctypes array of poses is viewed as a NumPy structured array, without any copy, and
+    all the poses are converted at once into the Panda3D coordinate system after each call to waitGetPoses().
+    The result is stored in the matrices attribute, a contiguous (N, 4, 4) array, together with the valid, velocity
+    and angular_velocity columns.
+
+    Without NumPy, the poses are converted one by one when requested.
+    """
+
+    def __init__(self, poses):
+        """
+        * poses : The ctypes array of openvr.TrackedDevicePose_t filled by waitGetPoses()
+        """
+
+        self.poses = poses
+        self.count = len(poses)
+        self.matrices = None
+        self.valid = None
+        self.connected = None
+        self.velocity = None
+        self.angular_velocity = None
+        if np is not None:
+            raw = (ctypes.c_char * ctypes.sizeof(poses)).from_buffer(poses)
+            self.view = np.frombuffer(raw, dtype=make_pose_dtype(), count=self.count)
+            self.valid = self.view['valid']
+            self.connected = self.view['connected']
+            self.matrices = np.zeros((self.count, 4, 4), dtype=np.float32)
+            self.matrices[:, 3, 3] = 1.0
+            self.velocity = np.zeros((self.count, 3), dtype=np.float32)
+            self.angular_velocity = np.zeros((self.count, 3), dtype=np.float32)
+
+    def update(self):
+        """
+        Convert all the poses currently stored in the array of poses.
+        """
+
+        if np is None:
+            return
+        np.multiply(self.view['matrix'][:, _pose_rows, _pose_cols], _pose_signs, out=self.matrices[:, :, :3])
+        np.multiply(self.view['velocity'][:, _vector_perm], _vector_signs, out=self.velocity)
+        np.multiply(self.view['angular_velocity'][:, _vector_perm], _vector_signs, out=self.angular_velocity)
+
+    def is_valid(self, device_index):
+        """
+        Return True if the pose of the given device is valid.
+        """
+
+        return bool(self.poses[device_index].bPoseIsValid)
+
+    def get_valid_devices(self, first=0):
+        """
+        Return the list of the indices of the devices with a valid pose, starting from the given index.
+        """
+
+        if np is None:
+            return [i for i in range(first, self.count) if self.poses[i].bPoseIsValid]
+        return (np.flatnonzero(self.valid[first:]) + first).tolist()
+
+    def get_mat(self, device_index):
+        """
+        Return the transform matrix of the given device in the tracked space reference frame.
+        """
+
+        if np is None:
+            return convert_pose_mat(self.poses[device_index].mDeviceToAbsoluteTracking.m)
+        return LMatrix4(*self.matrices[device_index].ravel().tolist())
+
+def bone_transforms_to_matrices(bone_transform_array, out=None):
+    """
+    Convert all the bone transforms of the given array of openvr.VRBoneTransform_t into transform matrices in the
+    Panda3D coordinate system, in one pass. Return a (N, 4, 4) array, or None if NumPy is not available.
+    This is equivalent to calling P3DOpenVR.get_bone_transform_mat() on each bone of the array.
+
+    * bone_transform_array : ctypes array of openvr.VRBoneTransform_t
+
+    * out : If not None, preallocated (N, 4, 4) float32 array receiving the result.
+    """
+
+    if np is None:
+        return None
+    count = len(bone_transform_array)
+    raw = (ctypes.c_float * (count * 8)).from_buffer(bone_transform_array)
+    bones = np.frombuffer(raw, dtype=np.float32).reshape(count, 8)
+    if out is None:
+        out = np.empty((count, 4, 4), dtype=np.float32)
+    position = bones[:, 0:3]
+    w, x, y, z = bones[:, 4], bones[:, 5], bones[:, 6], bones[:, 7]
+    # Rotation matrix of the quaternion, transposed to follow the row vector convention of Panda3D.
+    # The coordinate system conversion is then applied as an axis permutation, see convert_pose_mat()
+    xx, yy, zz = x * x, y * y, z * z
+    xy, xz, yz = x * y, x * z, y * z
+    wx, wy, wz = w * x, w * y, w * z
+    m = np.empty((count, 4, 4), dtype=np.float32)
+    m[:, 0, 0] = 1 - 2 * (yy + zz)
+    m[:, 0, 1] = 2 * (xy + wz)
+    m[:, 0, 2] = 2 * (xz - wy)
+    m[:, 1, 0] = 2 * (xy - wz)
+    m[:, 1, 1] = 1 - 2 * (xx + zz)
+    m[:, 1, 2] = 2 * (yz + wx)
+    m[:, 2, 0] = 2 * (xz + wy)
+    m[:, 2, 1] = 2 * (yz - wx)
+    m[:, 2, 2] = 1 - 2 * (xx + yy)
+    m[:, 3, 0:3] = position
+    m[:, 0:3, 3] = 0.0
+    m[:, 3, 3] = 1.0
+    np.multiply(m[:, _mat_perm][:, :, _mat_perm], _mat_signs, out=out)
+    return out
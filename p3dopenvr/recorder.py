@@ -0,0 +1,509 @@
+"""
+Recording and replay of the data received from OpenVR.
+
+The RecordingBackend wraps an existing backend, by default the openvr module, and writes in a binary file everything
+returned by the OpenVR interfaces : the array of poses filled by waitGetPoses(), the polled events, the action data,
+the skeletal bone arrays and any other query. The ReplayBackend maps the file in memory and feeds the recorded data
+back through the same code paths, either at full speed or at the recorded pace :
+
+    ovr = P3DOpenVR(backend=RecordingBackend('session.p3dvr'))
+    ...
+    ovr = P3DOpenVR(backend=ReplayBackend('session.p3dvr', real_time=True))
+
+The file is a header followed by a sequence of records, each record is :
+
+* The header (frame, kind, key length, payload length), see record_header.
+
+* The key of the call, i.e. the name of the interface and method and the value arguments.
+
+* The payload: the length of the encoded result, the encoded result and then the content of each ctypes buffer given
+  as argument, after the call.
+
+A frame record is written for each call to waitGetPoses(), its payload holds the timestamp of the call followed by
+the content of the arrays of poses.
+"""
+
+import atexit
+import ctypes
+import json
+import mmap
+import openvr
+import struct
+import time
+
+file_magic = b'P3DOVRR1'
+record_header = struct.Struct('<IBHI')
+length_field = struct.Struct('<I')
+timestamp_field = struct.Struct('<d')
+
+record_call = 0
+record_frame = 1
+
+result_json = 0
+result_struct = 1
+result_array = 2
+result_hidden_area_mesh = 3
+result_none = 4
+result_tuple = 5
+
+# Calls that only send data to OpenVR, they are neither recorded nor replayed
+not_recorded = {
+    'submit', 'submitWithArrayIndex', 'postPresentHandoff', 'submitExplicitTimingData', 'setExplicitTimingMode',
+    'updateActionState', 'setActionManifestPath', 'triggerHapticVibrationAction', 'addApplicationManifest',
+    'removeApplicationManifest', 'identifyApplication', 'clearLastSubmittedFrame',
+}
+
+def is_buffer(value):
+    return isinstance(value, (ctypes.Structure, ctypes.Array))
+
+def make_call_key(interface, name, args):
+    """
+    Return the key identifying a call. The ctypes buffers are replaced by their type as their content is an output.
+    """
+
+    values = []
+    for arg in args:
+        if is_buffer(arg):
+            values.append(type(arg).__name__)
+        elif isinstance(arg, bool):
+            values.append(int(arg))
+        elif isinstance(arg, int):
+            # Actions and handles can be int subclasses with a custom repr
+            values.append(int(arg))
+        else:
+            values.append(arg)
+    return interface + '.' + name + json.dumps(values)
+
+def find_ctypes_type(name):
+    value_type = getattr(openvr, name, None)
+    if value_type is None:
+        value_type = getattr(ctypes, name)
+    return value_type
+
+def encode_result(result, args):
+    """
+    Encode the value returned by a call with the given arguments into bytes. The elements of a tuple, e.g. the
+    (bool, Compositor_FrameTiming) returned by getFrameTiming(), are encoded one by one.
+    Raise a TypeError if the value can not be encoded, so it is not silently replayed as None.
+    """
+
+    if result is None:
+        return bytes((result_none,))
+    if isinstance(result, openvr.HiddenAreaMesh_t):
+        count = result.unTriangleCount
+        # A line loop mesh holds one vertex per triangle
+        vertex_count = count if args[-1] == openvr.k_eHiddenAreaMesh_LineLoop else count * 3
+        vertices = [tuple(result.pVertexData[i].v) for i in range(vertex_count)] if result.pVertexData else []
+        return bytes((result_hidden_area_mesh,)) + json.dumps([count, vertices]).encode('utf-8')
+    if isinstance(result, ctypes.Structure):
+        name = type(result).__name__.encode('utf-8')
+        return bytes((result_struct, len(name))) + name + bytes(result)
+    if isinstance(result, ctypes.Array):
+        name = result._type_.__name__.encode('utf-8')
+        return bytes((result_array, len(name))) + name + length_field.pack(len(result)) + bytes(result)
+    if isinstance(result, tuple):
+        parts = [bytes((result_tuple,)), length_field.pack(len(result))]
+        for element in result:
+            encoded = encode_result(element, args)
+            parts.append(length_field.pack(len(encoded)))
+            parts.append(encoded)
+        return b''.join(parts)
+    try:
+        return bytes((result_json,)) + json.dumps(result).encode('utf-8')
+    except TypeError:
+        raise TypeError("Can not record a result of type {}".format(type(result).__name__))
+
+def decode_result(data):
+    """
+    Decode a value encoded by encode_result().
+    """
+
+    tag = data[0]
+    if tag == result_none:
+        return None
+    if tag == result_json:
+        result = json.loads(bytes(data[1:]).decode('utf-8'))
+        return tuple(result) if isinstance(result, list) else result
+    if tag == result_tuple:
+        (count,) = length_field.unpack_from(data, 1)
+        start = 1 + length_field.size
+        elements = []
+        for i in range(count):
+            (length,) = length_field.unpack_from(data, start)
+            start += length_field.size
+            elements.append(decode_result(data[start:start + length]))
+            start += length
+        return tuple(elements)
+    if tag == result_hidden_area_mesh:
+        count, vertices = json.loads(bytes(data[1:]).decode('utf-8'))
+        array = (openvr.HmdVector2_t * len(vertices))()
+        for (vertex, value) in zip(array, vertices):
+            vertex.v[:] = value
+        mesh = openvr.HiddenAreaMesh_t()
+        mesh.pVertexData = ctypes.cast(array, ctypes.POINTER(openvr.HmdVector2_t))
+        mesh.unTriangleCount = count
+        # Keep the vertices alive as long as the mesh
+        mesh._vertices = array
+        return mesh
+    name_length = data[1]
+    name = bytes(data[2:2 + name_length]).decode('utf-8')
+    start = 2 + name_length
+    if tag == result_struct:
+        return find_ctypes_type(name).from_buffer_copy(data[start:])
+    (count,) = length_field.unpack_from(data, start)
+    return (find_ctypes_type(name) * count).from_buffer_copy(data[start + length_field.size:])
+
+def copy_into_buffer(buffer, data):
+    """
+    Copy the recorded content of a ctypes buffer back into it.
+    """
+
+    size = min(len(data), ctypes.sizeof(buffer))
+    ctypes.memmove(ctypes.addressof(buffer), bytes(data[:size]), size)
+
+class SessionWriter:
+    """
+    Writer of the records of a session file.
+    """
+
+    def __init__(self, filename):
+        self.file = open(filename, 'wb', buffering=1 << 20)
+        self.file.write(file_magic)
+        self.frame = 0
+
+    def write(self, kind, key, payload):
+        key = key.encode('utf-8')
+        self.file.write(record_header.pack(self.frame, kind, len(key), len(payload)))
+        self.file.write(key)
+        self.file.write(payload)
+
+    def write_call(self, key, result, args):
+        encoded = encode_result(result, args)
+        parts = [length_field.pack(len(encoded)), encoded]
+        for arg in args:
+            if is_buffer(arg):
+                parts.append(length_field.pack(ctypes.sizeof(arg)))
+                parts.append(bytes(arg))
+        self.write(record_call, key, b''.join(parts))
+
+    def write_frame(self, timestamp, buffers):
+        self.frame += 1
+        parts = [timestamp_field.pack(timestamp)]
+        for buffer in buffers:
+            if buffer is not None:
+                parts.append(length_field.pack(ctypes.sizeof(buffer)))
+                parts.append(bytes(buffer))
+            else:
+                parts.append(length_field.pack(0))
+        self.write(record_frame, '', b''.join(parts))
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+class RecordingInterface:
+    """
+    Proxy around an OpenVR interface recording the result of each call.
+    """
+
+    def __init__(self, writer, name, interface):
+        self._writer = writer
+        self._name = name
+        self._interface = interface
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        method = getattr(self._interface, name)
+        if not callable(method) or name in not_recorded:
+            return method
+        writer = self._writer
+        interface_name = self._name
+
+        def record(*args, **kwargs):
+            result = method(*args, **kwargs)
+            values = args + tuple(kwargs[key] for key in sorted(kwargs))
+            writer.write_call(make_call_key(interface_name, name, values), result, values)
+            return result
+        # Cache the wrapper to avoid rebuilding it on each call
+        setattr(self, name, record)
+        return record
+
+class RecordingCompositor(RecordingInterface):
+    def waitGetPoses(self, renderPoseArray, gamePoseArray):
+        result = self._interface.waitGetPoses(renderPoseArray, gamePoseArray)
+        self._writer.write_frame(time.perf_counter(), (renderPoseArray, gamePoseArray))
+        return result
+
+class RecordingBackend:
+    """
+    Backend recording all the data returned by the wrapped backend into the given file.
+    """
+
+    def __init__(self, filename, backend=None):
+        """
+        * filename : Path of the session file to create.
+
+        * backend : The backend to record, if None the openvr module is used.
+        """
+
+        self.backend = backend if backend is not None else openvr
+        self.writer = SessionWriter(filename)
+        self.system = None
+        atexit.register(self.close)
+
+    def init(self, applicationType):
+        self.system = RecordingInterface(self.writer, 'system', self.backend.init(applicationType))
+        return self.system
+
+    def shutdown(self):
+        self.close()
+        self.backend.shutdown()
+
+    def close(self):
+        """
+        Flush and close the session file.
+        """
+
+        self.writer.close()
+
+    def VRSystem(self):
+        return self.system
+
+    def VRApplications(self):
+        return RecordingInterface(self.writer, 'applications', self.backend.VRApplications())
+
+    def VRCompositor(self):
+        return RecordingCompositor(self.writer, 'compositor', self.backend.VRCompositor())
+
+    def VRInput(self):
+        return RecordingInterface(self.writer, 'input', self.backend.VRInput())
+
+class SessionReader:
+    """
+    Memory-mapped reader of a session file. The records are indexed once when the file is opened, their content is
+    only decoded when replayed.
+    """
+
+    def __init__(self, filename):
+        self.file = open(filename, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(file_magic)] != file_magic:
+            raise ValueError("'{}' is not a session file".format(filename))
+        self.view = memoryview(self.data)
+        # Calls made in each frame, frame 0 holds the calls made before the first waitGetPoses()
+        self.calls = [[]]
+        # Offset and size of the payload of each frame record
+        self.frames = []
+        offset = len(file_magic)
+        size = len(self.data)
+        while offset + record_header.size <= size:
+            frame, kind, key_length, payload_length = record_header.unpack_from(self.data, offset)
+            offset += record_header.size
+            key = bytes(self.view[offset:offset + key_length]).decode('utf-8')
+            offset += key_length
+            if offset + payload_length > size:
+                # Truncated record, the recording was interrupted
+                break
+            if kind == record_frame:
+                self.frames.append((offset, payload_length))
+                self.calls.append([])
+            else:
+                self.calls[-1].append((key, offset, payload_length))
+            offset += payload_length
+
+    def get_payload(self, offset, length):
+        return self.view[offset:offset + length]
+
+    def split_buffers(self, payload, start):
+        buffers = []
+        while start + length_field.size <= len(payload):
+            (length,) = length_field.unpack_from(payload, start)
+            start += length_field.size
+            buffers.append(payload[start:start + length])
+            start += length
+        return buffers
+
+    def close(self):
+        self.view.release()
+        self.data.close()
+        self.file.close()
+
+class ReplayInterface:
+    """
+    Replacement of an OpenVR interface returning the recorded results.
+    """
+
+    def __init__(self, replay, name, fallback=None):
+        self._replay = replay
+        self._name = name
+        self._fallback = fallback
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name in not_recorded:
+            if self._fallback is not None:
+                return getattr(self._fallback, name)
+            return lambda *args: None
+        replay = self._replay
+        interface_name = self._name
+        fallback = self._fallback
+
+        def play(*args, **kwargs):
+            values = args + tuple(kwargs[key] for key in sorted(kwargs))
+            key = make_call_key(interface_name, name, values)
+            found, result = replay.play_call(key, values)
+            if not found:
+                if fallback is None:
+                    raise KeyError("No recorded result for {}".format(key))
+                return getattr(fallback, name)(*args, **kwargs)
+            return result
+        setattr(self, name, play)
+        return play
+
+class ReplayCompositor(ReplayInterface):
+    def waitGetPoses(self, renderPoseArray, gamePoseArray):
+        self._replay.next_frame((renderPoseArray, gamePoseArray))
+        return renderPoseArray, gamePoseArray
+
+class ReplayBackend:
+    """
+    Backend replaying a session recorded with RecordingBackend.
+
+    Each waitGetPoses() moves to the next recorded frame. The calls are matched with the recorded calls of the
+    current frame using their name and arguments, in the order they were recorded. A call not recorded in the current
+    frame returns the result recorded in the closest previous frame.
+    Once all the frames are replayed, the finished attribute is set to True and the last frame is repeated, unless
+    loop is True.
+    """
+
+    def __init__(self, filename, real_time=False, loop=False, fallback=None):
+        """
+        * filename : Path of the session file to replay.
+
+        * real_time : If True, waitGetPoses() follows the recorded pace, otherwise the frames are replayed at full speed.
+
+        * loop : If True, the replay starts again from the first frame once finished.
+
+        * fallback : Optional backend, e.g. a SimulatedBackend, used for the calls that were never recorded and to
+          receive the submitted textures.
+        """
+
+        self.reader = SessionReader(filename)
+        self.real_time = real_time
+        self.loop = loop
+        self.fallback = fallback
+        self.frame = 0
+        self.finished = False
+        self.start_time = None
+        self.start_timestamp = None
+        self.frame_calls = {}
+        self.latest_calls = {}
+        self.load_frame_calls(0)
+        self.system = ReplayInterface(self, 'system', fallback.VRSystem() if fallback is not None else None)
+
+    def init(self, applicationType):
+        if self.fallback is not None:
+            self.fallback.init(applicationType)
+        return self.system
+
+    def shutdown(self):
+        self.reader.close()
+
+    def VRSystem(self):
+        return self.system
+
+    def VRApplications(self):
+        return ReplayInterface(self, 'applications', self.fallback.VRApplications() if self.fallback is not None else None)
+
+    def VRCompositor(self):
+        return ReplayCompositor(self, 'compositor', self.fallback.VRCompositor() if self.fallback is not None else None)
+
+    def VRInput(self):
+        return ReplayInterface(self, 'input', self.fallback.VRInput() if self.fallback is not None else None)
+
+    def get_frame_count(self):
+        """
+        Return the number of recorded frames.
+        """
+
+        return len(self.reader.frames)
+
+    def load_frame_calls(self, frame):
+        self.frame_calls = {}
+        for (key, offset, length) in self.reader.calls[frame]:
+            self.frame_calls.setdefault(key, []).append((offset, length))
+        self.frame_cursors = {}
+
+    def next_frame(self, pose_arrays):
+        """
+        Move to the next recorded frame and copy its poses into the given arrays.
+        """
+
+        reader = self.reader
+        if self.frame >= len(reader.frames):
+            if not self.loop or not reader.frames:
+                self.finished = True
+                self.play_frame(len(reader.frames) - 1, pose_arrays)
+                return
+            self.frame = 0
+            self.start_time = None
+        self.play_frame(self.frame, pose_arrays)
+        self.frame += 1
+        self.load_frame_calls(self.frame)
+
+    def play_frame(self, frame, pose_arrays):
+        if frame < 0:
+            return
+        offset, length = self.reader.frames[frame]
+        payload = self.reader.get_payload(offset, length)
+        (timestamp,) = timestamp_field.unpack_from(payload, 0)
+        if self.real_time and not self.finished:
+            now = time.perf_counter()
+            if self.start_time is None:
+                self.start_time = now
+                self.start_timestamp = timestamp
+            else:
+                delay = (timestamp - self.start_timestamp) - (now - self.start_time)
+                if delay > 0:
+                    time.sleep(delay)
+        buffers = self.reader.split_buffers(payload, timestamp_field.size)
+        for (pose_array, data) in zip(pose_arrays, buffers):
+            if pose_array is not None and len(data) > 0:
+                copy_into_buffer(pose_array, data)
+
+    def play_call(self, key, args):
+        """
+        Return whether a result was recorded for the given call and the recorded result. The recorded content of the
+        ctypes buffers given as arguments is copied back into them.
+        """
+
+        records = self.frame_calls.get(key)
+        if records is not None:
+            cursor = self.frame_cursors.get(key, 0)
+            # Once all the recorded calls are consumed, the last one is repeated
+            record = records[min(cursor, len(records) - 1)]
+            self.frame_cursors[key] = cursor + 1
+            self.latest_calls[key] = record
+        else:
+            record = self.latest_calls.get(key)
+            if record is None:
+                record = self.find_previous_call(key)
+                if record is None:
+                    return False, None
+                self.latest_calls[key] = record
+        payload = self.reader.get_payload(*record)
+        (result_length,) = length_field.unpack_from(payload, 0)
+        result = decode_result(payload[length_field.size:length_field.size + result_length])
+        buffers = self.reader.split_buffers(payload, length_field.size + result_length)
+        for (buffer, data) in zip((arg for arg in args if is_buffer(arg)), buffers):
+            copy_into_buffer(buffer, data)
+        return True, result
+
+    def find_previous_call(self, key):
+        for frame in range(min(self.frame, len(self.reader.calls) - 1), -1, -1):
+            for (record_key, offset, length) in reversed(self.reader.calls[frame]):
+                if record_key == key:
+                    return (offset, length)
+        return None
@@ -0,0 +1,101 @@
+from math import sqrt
+
+import openvr
+
+class DynamicResolution:
+    """
+    Controller adjusting the resolution of the eye buffers to keep the GPU time of each frame within the budget.
+
+    The GPU time is taken from the frame timing reported by the compositor. The resolution is decreased as soon as
+    the GPU time is above the high threshold for a few frames, and increased only when the GPU time stays below the
+    low threshold for a longer period. After each change, the controller waits for a few frames as the frame timing
+    is reported with some latency.
+    The resolution is changed using P3DOpenVR.set_resolution_scale(), which only changes the rendered viewport
+    inside the preallocated eye buffers, nothing is reallocated.
+    """
+
+    def __init__(self, ovr, min_scale=0.6, max_scale=None, target_ratio=0.8, low_ratio=0.65, high_ratio=0.9,
+                 increase_frames=45, decrease_frames=2, max_step_up=0.05, max_step_down=0.2, settle_frames=5):
+        """
+        * ovr : Reference to the instance of P3DOpenVR.
+
+        * min_scale, max_scale : Limits of the resolution scale, relative to the recommended render target size.
+          If max_scale is None, the maximum resolution scale of the eye buffers is used.
+
+        * target_ratio : GPU time aimed for when the resolution is changed, as a ratio of the frame period.
+
+        * low_ratio, high_ratio : GPU time, as a ratio of the frame period, below which the resolution can be increased
+          and above which it is decreased.
+
+        * increase_frames, decrease_frames : Number of consecutive frames below or above the thresholds before the
+          resolution is changed.
+
+        * max_step_up, max_step_down : Maximum relative change of the scale in one step.
+
+        * settle_frames : Number of frames ignored after each change.
+        """
+
+        self.ovr = ovr
+        self.min_scale = min_scale
+        self.max_scale = max_scale if max_scale is not None else ovr.max_resolution_scale
+        self.target_ratio = target_ratio
+        self.low_ratio = low_ratio
+        self.high_ratio = high_ratio
+        self.increase_frames = increase_frames
+        self.decrease_frames = decrease_frames
+        self.max_step_up = max_step_up
+        self.max_step_down = max_step_down
+        self.settle_frames = settle_frames
+        refresh_rate = ovr.vr_system.getFloatTrackedDeviceProperty(openvr.k_unTrackedDeviceIndex_Hmd, openvr.Prop_DisplayFrequency_Float)
+        self.frame_period_ms = 1000.0 / refresh_rate if refresh_rate > 0 else 1000.0 / 90
+        self.frames_over = 0
+        self.frames_under = 0
+        self.settle = 0
+        self.last_frame_index = 0
+        self.changes = 0
+
+    def get_scale(self):
+        return self.ovr.resolution_scale
+
+    def update(self, compositor_stats):
+        """
+        Update the resolution according to the last frame timing, this is called once per frame.
+
+        * compositor_stats : The CompositorStats holding the last frame timing.
+        """
+
+        if compositor_stats.frame_index == self.last_frame_index:
+            return
+        self.last_frame_index = compositor_stats.frame_index
+        gpu_time = compositor_stats.application_gpu_ms
+        if gpu_time <= 0.0:
+            return
+        if self.settle > 0:
+            self.settle -= 1
+            return
+        if gpu_time > self.high_ratio * self.frame_period_ms:
+            self.frames_over += 1
+            self.frames_under = 0
+        elif gpu_time < self.low_ratio * self.frame_period_ms:
+            self.frames_under += 1
+            self.frames_over = 0
+        else:
+            self.frames_over = 0
+            self.frames_under = 0
+            return
+        scale = self.ovr.resolution_scale
+        # The GPU time is assumed to be proportional to the number of pixels, i.e. to the square of the scale
+        ratio = sqrt(self.target_ratio * self.frame_period_ms / gpu_time)
+        if self.frames_over >= self.decrease_frames:
+            new_scale = scale * max(ratio, 1.0 - self.max_step_down)
+        elif self.frames_under >= self.increase_frames:
+            new_scale = scale * min(ratio, 1.0 + self.max_step_up)
+        else:
+            return
+        new_scale = min(max(new_scale, self.min_scale), self.max_scale)
+        self.frames_over = 0
+        self.frames_under = 0
+        if new_scale != scale:
+            self.ovr.set_resolution_scale(new_scale)
+            self.settle = self.settle_frames
+            self.changes += 1
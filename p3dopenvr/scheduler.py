@@ -0,0 +1,301 @@
+import time
+
+class PhaseJob:
+    """
+    A function called once per frame by a phase.
+    """
+
+    def __init__(self, name, func, extra_args, priority):
+        """
+        * name : Name of the job, used to remove it.
+
+        * func : Function called by the job.
+
+        * extra_args : Arguments given to the function.
+
+        * priority : Phase.normal or Phase.low
+        """
+
+        self.name = name
+        self.func = func
+        self.extra_args = extra_args
+        self.priority = priority
+        self.deferred = False
+
+    def run(self):
+        """
+        Call the function of the job.
+        """
+
+        self.func(*self.extra_args)
+
+class Phase:
+    """
+    A named phase of the VR frame, run by its own task with a configurable sort.
+
+    The jobs of the phase are called in order, the normal priority jobs first, then the low priority jobs. When the
+    phase has a time budget and the budget is exhausted, the remaining low priority jobs are deferred to the next
+    frame, where they are called before the other low priority jobs. The oldest deferred job is always called, even
+    when the budget is already exhausted, so every low priority job is eventually called. The normal priority jobs are
+    always called, if they exceed the budget the overrun is reported.
+    """
+
+    normal = 0
+    low = 1
+
+    def __init__(self, scheduler, name, sort, budget_ms=None):
+        """
+        * scheduler : The FrameScheduler owning the phase.
+
+        * name : Name of the phase.
+
+        * sort : Sort of the task running the phase.
+
+        * budget_ms : Time budget of the phase, in milliseconds, or None.
+        """
+
+        self.scheduler = scheduler
+        self.name = name
+        self.sort = sort
+        self.budget_ms = budget_ms
+        self.jobs = []
+        self.deferred_jobs = []
+        self.last_time_ms = 0.0
+        self.frames = 0
+        self.overruns = 0
+        self.deferrals = 0
+        self.task = scheduler.ovr.base.taskMgr.add(self.run_task, 'openvr-phase-' + name, sort=sort)
+
+    def set_sort(self, sort):
+        """
+        Change the sort of the task running the phase.
+        """
+
+        self.sort = sort
+        self.task.set_sort(sort)
+
+    def set_budget(self, budget_ms):
+        """
+        Set the time budget of the phase, in milliseconds. If None, the low priority jobs are never deferred.
+        """
+
+        self.budget_ms = budget_ms
+
+    def add_job(self, func, name=None, priority=normal, extra_args=(), first=False):
+        """
+        Add a function called once per frame with the given extra arguments. If name is None, the name of the
+        function is used. If first is True, the job is called before the jobs already added.
+        Return the job.
+        """
+
+        if name is None:
+            name = getattr(func, '__name__', repr(func))
+        job = PhaseJob(name, func, extra_args, priority)
+        if first:
+            self.jobs.insert(0, job)
+        else:
+            self.jobs.append(job)
+        return job
+
+    def remove_job(self, job):
+        """
+        Remove the given job, or all the jobs with the given name or function.
+        """
+
+        def match(entry):
+            return entry is job or entry.name == job or entry.func == job
+        self.jobs = [entry for entry in self.jobs if not match(entry)]
+        self.deferred_jobs = [entry for entry in self.deferred_jobs if not match(entry)]
+
+    def run(self):
+        """
+        Call the jobs of the phase for the current frame, deferring the low priority jobs exceeding the budget.
+        """
+
+        start = time.perf_counter()
+        budget = self.budget_ms / 1000.0 if self.budget_ms is not None else None
+        for job in self.jobs:
+            if job.priority != Phase.low:
+                job.run()
+        # The low priority jobs deferred in the previous frame are called first, oldest first, and the oldest one is
+        # called even if the normal priority jobs exhausted the budget, so they are not starved
+        oldest = self.deferred_jobs[0] if self.deferred_jobs else None
+        pending = self.deferred_jobs + [job for job in self.jobs if job.priority == Phase.low and not job.deferred]
+        self.deferred_jobs = []
+        for job in pending:
+            if job is not oldest and budget is not None and time.perf_counter() - start >= budget:
+                job.deferred = True
+                self.deferred_jobs.append(job)
+            else:
+                job.deferred = False
+                job.run()
+        self.deferrals += len(self.deferred_jobs)
+        self.last_time_ms = (time.perf_counter() - start) * 1000.0
+        self.frames += 1
+        if self.budget_ms is not None and self.last_time_ms > self.budget_ms:
+            self.overruns += 1
+            self.scheduler.report_overrun(self)
+
+    def run_task(self, task):
+        """
+        Task running the phase once per frame.
+        """
+
+        self.run()
+        return task.cont
+
+    def remove(self):
+        """
+        Remove the task running the phase.
+        """
+
+        self.scheduler.ovr.base.taskMgr.remove(self.task)
+
+class FrameScheduler:
+    """
+    Named phases of the VR frame, replacing the single sort returned by get_update_task_sort() :
+
+    * post-poses : Just after the update of the poses, e.g. to update the objects attached to the devices.
+
+    * input : After the post-poses phase, to process the actions.
+
+    * simulation : The simulation of the application. It runs after the input phase, or at sort 0 if the poses are
+      updated early in the frame.
+
+    * late-latch : Just before the cull, after the application tasks. When the late latching is enabled, the poses
+      are updated at the start of this phase.
+
+    * post-submit : After the frame has been rendered and, unless a pipelined threading model is used, submitted.
+
+    Each phase has a sort, which can be changed, and an optional time budget. The overruns of the budgets are
+    reported to the overrun handler, or printed at most once per report_interval seconds and per phase.
+    """
+
+    post_poses = 'post-poses'
+    input = 'input'
+    simulation = 'simulation'
+    late_latch = 'late-latch'
+    post_submit = 'post-submit'
+
+    phase_names = (post_poses, input, simulation, late_latch, post_submit)
+
+    def __init__(self, ovr, sorts=None, budgets=None, report_interval=1.0):
+        """
+        * ovr : Reference to the instance of P3DOpenVR.
+
+        * sorts : Dictionary of the sort of the phases, by name. The missing phases use the default sort.
+
+        * budgets : Dictionary of the time budget of the phases, in milliseconds, by name. By default the phases have
+          no budget.
+
+        * report_interval : Minimum delay, in seconds, between two printed overrun reports of a phase.
+        """
+
+        self.ovr = ovr
+        self.report_interval = report_interval
+        self.overrun_handler = None
+        self.last_reports = {}
+        default_sorts = self.get_default_sorts()
+        if sorts is not None:
+            default_sorts.update(sorts)
+        if budgets is None:
+            budgets = {}
+        self.phases = {}
+        for name in self.phase_names:
+            self.phases[name] = Phase(self, name, default_sorts[name], budgets.get(name))
+
+    def get_default_sorts(self):
+        """
+        Return the default sort of each phase, relative to the sort of the task updating the poses, to the cull and
+        to the rendering done by igLoop at sort 50.
+        """
+
+        poses_sort = self.ovr.task.get_sort()
+        return {
+            self.post_poses: poses_sort + 1,
+            self.input: poses_sort + 2,
+            self.simulation: max(0, poses_sort + 3),
+            self.late_latch: 49,
+            self.post_submit: 51,
+        }
+
+    def get_phase(self, name):
+        """
+        Return the Phase instance with the given name.
+        """
+
+        return self.phases[name]
+
+    def add_job(self, phase, func, name=None, priority=Phase.normal, extra_args=(), first=False):
+        """
+        Add a function called once per frame during the given phase. See Phase.add_job().
+        """
+
+        return self.phases[phase].add_job(func, name, priority, extra_args, first)
+
+    def remove_job(self, phase, job):
+        """
+        Remove the given job from the given phase. See Phase.remove_job().
+        """
+
+        self.phases[phase].remove_job(job)
+
+    def set_sort(self, phase, sort):
+        """
+        Change the sort of the given phase.
+        """
+
+        self.phases[phase].set_sort(sort)
+
+    def set_budget(self, phase, budget_ms):
+        """
+        Set the time budget of the given phase, in milliseconds. See Phase.set_budget().
+        """
+
+        self.phases[phase].set_budget(budget_ms)
+
+    def set_overrun_handler(self, overrun_handler):
+        """
+        Register a handler called each time a phase exceeds its budget. The handler will receive one parameter :
+        * phase : the instance of Phase, its last_time_ms and budget_ms attributes give the overrun.
+        """
+
+        self.overrun_handler = overrun_handler
+
+    def report_overrun(self, phase):
+        """
+        Report the overrun of the budget of the given phase to the overrun handler, or print it.
+        """
+
+        if self.overrun_handler is not None:
+            self.overrun_handler(phase)
+            return
+        now = time.perf_counter()
+        last_report = self.last_reports.get(phase.name)
+        if last_report is not None and now - last_report < self.report_interval:
+            return
+        self.last_reports[phase.name] = now
+        print("WARNING: Phase '{}' exceeded its budget: {:.2f}ms > {:.2f}ms ({} overruns, {} deferred jobs)".format(
+            phase.name, phase.last_time_ms, phase.budget_ms, phase.overruns, phase.deferrals))
+
+    def get_report(self):
+        """
+        Return the statistics of each phase as a dictionary, by name.
+        """
+
+        return {name: {
+                    'sort': phase.sort,
+                    'budget_ms': phase.budget_ms,
+                    'last_time_ms': phase.last_time_ms,
+                    'frames': phase.frames,
+                    'overruns': phase.overruns,
+                    'deferrals': phase.deferrals,
+                } for (name, phase) in self.phases.items()}
+
+    def remove(self):
+        """
+        Remove the tasks of all the phases.
+        """
+
+        for phase in self.phases.values():
+            phase.remove()
@@ -0,0 +1,760 @@
+"""
+Simulated OpenVR backend, it allows P3DOpenVR to run without any headset or OpenVR runtime, e.g. for automated
+tests or benchmarks.
+
+The backend is given to P3DOpenVR in place of the openvr module :
+
+    backend = SimulatedBackend(refresh_rate=90)
+    ovr = P3DOpenVR(backend=backend)
+    ovr.init()
+
+All the data returned by the simulated runtime are the same ctypes structures as the ones returned by pyopenvr, the
+poses of the devices and the state of the actions can be scripted using either constant values or functions of the
+simulated time.
+"""
+
+from collections import deque
+from math import cos, sin
+
+import ctypes
+import json
+import openvr
+import time
+
+def make_pose_matrix(x=0.0, y=0.0, z=0.0, yaw=0.0):
+    """
+    Return the rows of a OpenVR 3x4 transform matrix, in the OpenVR coordinate system (Y-up, -Z forward),
+    with the given position and the given rotation around the vertical axis, in radians.
+    """
+
+    c = cos(yaw)
+    s = sin(yaw)
+    return ((c, 0.0, s, x),
+            (0.0, 1.0, 0.0, y),
+            (-s, 0.0, c, z))
+
+class SimulatedDevice:
+    """
+    A tracked device of the simulated runtime.
+    """
+
+    def __init__(self, index, device_class, model_name, serial, role=openvr.TrackedControllerRole_Invalid, pose=None, input_source=None):
+        """
+        * index : Index of the device in the array of poses.
+
+        * device_class : One of openvr.TrackedDeviceClass_*
+
+        * model_name, serial : Value of the render model name and serial number properties.
+
+        * role : Role of the controller, one of openvr.TrackedControllerRole_*
+
+        * pose : Either the rows of a 3x4 matrix or a function receiving the simulated time and returning them.
+          If None, the pose of the device is not valid.
+
+        * input_source : Path of the input source bound to this device, e.g. '/user/hand/left'
+        """
+
+        self.index = index
+        self.device_class = device_class
+        self.model_name = model_name
+        self.serial = serial
+        self.role = role
+        self.pose = pose
+        self.input_source = input_source
+        self.connected = True
+
+    def get_matrix(self, sim_time):
+        """
+        Return the rows of the 3x4 matrix of the device at the given simulated time, or None if it has no pose.
+        """
+
+        if callable(self.pose):
+            return self.pose(sim_time)
+        return self.pose
+
+    def fill_pose(self, pose, sim_time):
+        """
+        Copy the pose of the device at the given simulated time into the given openvr.TrackedDevicePose_t
+        """
+
+        matrix = self.get_matrix(sim_time) if self.connected else None
+        pose.bDeviceIsConnected = self.connected
+        if matrix is not None:
+            for (row, values) in enumerate(matrix):
+                pose.mDeviceToAbsoluteTracking.m[row][:] = values
+            pose.bPoseIsValid = True
+            pose.eTrackingResult = openvr.TrackingResult_Running_OK
+        else:
+            pose.bPoseIsValid = False
+            pose.eTrackingResult = openvr.TrackingResult_Uninitialized
+
+class SimulatedSystem:
+    """
+    Simulated IVRSystem interface.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.events = deque()
+        self.hidden_area_meshes = {}
+
+    def getRecommendedRenderTargetSize(self):
+        return self.backend.render_size
+
+    def getProjectionRaw(self, eye):
+        return self.backend.projection_raw[eye]
+
+    def getProjectionMatrix(self, eye, nearZ, farZ):
+        left, right, top, bottom = self.getProjectionRaw(eye)
+        idx = 1.0 / (right - left)
+        idy = 1.0 / (bottom - top)
+        idz = 1.0 / (farZ - nearZ)
+        matrix = openvr.HmdMatrix44_t()
+        matrix.m[0][:] = (2.0 * idx, 0.0, (right + left) * idx, 0.0)
+        matrix.m[1][:] = (0.0, 2.0 * idy, (bottom + top) * idy, 0.0)
+        matrix.m[2][:] = (0.0, 0.0, -(farZ + nearZ) * idz, -2.0 * farZ * nearZ * idz)
+        matrix.m[3][:] = (0.0, 0.0, -1.0, 0.0)
+        return matrix
+
+    def getEyeToHeadTransform(self, eye):
+        offset = self.backend.ipd / 2.0
+        matrix = openvr.HmdMatrix34_t()
+        for (row, values) in enumerate(make_pose_matrix(-offset if eye == openvr.Eye_Left else offset, 0.0, 0.0)):
+            matrix.m[row][:] = values
+        return matrix
+
+    def isTrackedDeviceConnected(self, unDeviceIndex):
+        device = self.backend.devices.get(unDeviceIndex)
+        return device is not None and device.connected
+
+    def getTrackedDeviceClass(self, unDeviceIndex):
+        device = self.backend.devices.get(unDeviceIndex)
+        if device is None:
+            return openvr.TrackedDeviceClass_Invalid
+        return device.device_class
+
+    def getControllerRoleForTrackedDeviceIndex(self, unDeviceIndex):
+        device = self.backend.devices.get(unDeviceIndex)
+        if device is None:
+            return openvr.TrackedControllerRole_Invalid
+        return device.role
+
+    def getTrackedDeviceIndexForControllerRole(self, unDeviceType):
+        for device in self.backend.devices.values():
+            if device.role == unDeviceType:
+                return device.index
+        return openvr.k_unTrackedDeviceIndexInvalid
+
+    def getStringTrackedDeviceProperty(self, unDeviceIndex, prop):
+        device = self.backend.devices.get(unDeviceIndex)
+        if device is None:
+            return ''
+        if prop == openvr.Prop_RenderModelName_String:
+            return device.model_name
+        if prop == openvr.Prop_SerialNumber_String:
+            return device.serial
+        return ''
+
+    def getFloatTrackedDeviceProperty(self, unDeviceIndex, prop):
+        if prop == openvr.Prop_UserIpdMeters_Float:
+            return self.backend.ipd
+        if prop == openvr.Prop_DisplayFrequency_Float:
+            return self.backend.refresh_rate
+        return 0.0
+
+    def getTimeSinceLastVsync(self):
+        compositor = self.backend.compositor
+        return True, time.perf_counter() - compositor.last_vsync, compositor.frame_index
+
+    def getDeviceToAbsoluteTrackingPose(self, eOrigin, fPredictedSecondsToPhotonsFromNow, trackedDevicePoseArray):
+        self.backend.fill_poses(trackedDevicePoseArray, self.backend.get_current_time() + fPredictedSecondsToPhotonsFromNow)
+        return trackedDevicePoseArray
+
+    def pollNextEvent(self, event):
+        if not self.events:
+            return False
+        ctypes.memmove(ctypes.byref(event), ctypes.byref(self.events.popleft()), ctypes.sizeof(openvr.VREvent_t))
+        return True
+
+    def getHiddenAreaMesh(self, eye, type_=openvr.k_eHiddenAreaMesh_Standard):
+        mesh = self.hidden_area_meshes.get((eye, type_))
+        if mesh is None:
+            vertices, count = self.backend.make_hidden_area_mesh(eye, type_)
+            mesh = openvr.HiddenAreaMesh_t()
+            mesh.pVertexData = ctypes.cast(vertices, ctypes.POINTER(openvr.HmdVector2_t))
+            mesh.unTriangleCount = count
+            # Keep a reference on the vertices, the mesh only holds a pointer on them
+            self.hidden_area_meshes[(eye, type_)] = (mesh, vertices)
+        else:
+            mesh = mesh[0]
+        return mesh
+
+class SimulatedApplications:
+    """
+    Simulated IVRApplications interface.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.manifests = {}
+        self.identified = None
+
+    def isApplicationInstalled(self, pchAppKey):
+        return pchAppKey in self.manifests.values()
+
+    def addApplicationManifest(self, pchApplicationManifestFullPath, bTemporary=False):
+        with open(pchApplicationManifestFullPath) as manifest_file:
+            manifest = json.load(manifest_file)
+        for application in manifest.get('applications', []):
+            self.manifests[pchApplicationManifestFullPath] = application.get('app_key')
+
+    def removeApplicationManifest(self, pchApplicationManifestFullPath):
+        self.manifests.pop(pchApplicationManifestFullPath, None)
+
+    def identifyApplication(self, unProcessId, pchAppKey):
+        self.identified = (unProcessId, pchAppKey)
+
+class SimulatedCompositor:
+    """
+    Simulated IVRCompositor interface. waitGetPoses() is paced at the refresh rate of the backend and the submitted
+    textures are recorded in the submits attribute as (frame, eye, handle, bounds, flags, pose) tuples, pose being
+    the rows of the submitted HMD pose, or None.
+
+    The misuses of the frame protocol, a submit before the first wait, an eye submitted twice in a frame,
+    overlapping calls to waitGetPoses() or misplaced explicit timing calls, are counted in protocol_errors and the
+    last one is described in last_protocol_error.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.frame_index = 0
+        self.start_time = None
+        self.last_vsync = time.perf_counter()
+        self.missed_frames = 0
+        self.submits = deque(maxlen=backend.max_recorded_submits)
+        self.frame_submits = 0
+        self.frame_eyes = set()
+        self.waiting = False
+        self.timing_mode = openvr.VRCompositorTimingMode_Implicit
+        self.frame_timing_data = False
+        self.frame_handoff = False
+        self.total_timing_data = 0
+        self.total_handoffs = 0
+        self.protocol_errors = 0
+        self.last_protocol_error = None
+        self.last_render_poses = None
+        self.timings = deque(maxlen=128)
+        self.total_presents = 0
+        self.total_dropped_frames = 0
+        self.total_reprojected_frames = 0
+        self.total_submits = 0
+
+    def protocol_error(self, message):
+        self.protocol_errors += 1
+        self.last_protocol_error = message
+
+    def waitGetPoses(self, renderPoseArray, gamePoseArray):
+        if self.waiting:
+            self.protocol_error("waitGetPoses() called during another wait")
+        self.waiting = True
+        try:
+            return self.wait_get_poses(renderPoseArray, gamePoseArray)
+        finally:
+            self.waiting = False
+
+    def wait_get_poses(self, renderPoseArray, gamePoseArray):
+        if (self.timing_mode == openvr.VRCompositorTimingMode_Explicit_ApplicationPerformsPostPresentHandoff and
+                self.frame_submits > 0 and not self.frame_handoff):
+            self.protocol_error("postPresentHandoff() not called in frame {}".format(self.frame_index))
+        backend = self.backend
+        now = time.perf_counter()
+        missed = 0
+        if self.start_time is None:
+            self.start_time = now
+        elif backend.pace:
+            # Wait for the next vsync, if the application is late the missed vsyncs are skipped
+            period = 1.0 / backend.refresh_rate
+            next_vsync = self.last_vsync + period
+            if now < next_vsync:
+                time.sleep(next_vsync - now)
+                now = next_vsync
+            else:
+                missed = int((now - next_vsync) / period)
+                self.missed_frames += missed
+                now = next_vsync + missed * period
+        if self.frame_index > 0:
+            self.record_frame_timing(now, missed)
+        self.last_vsync = now
+        self.frame_index += 1
+        self.frame_submits = 0
+        self.frame_eyes.clear()
+        self.frame_timing_data = False
+        self.frame_handoff = False
+        backend.advance()
+        if renderPoseArray is not None:
+            backend.fill_poses(renderPoseArray, backend.time)
+            self.last_render_poses = renderPoseArray
+        if gamePoseArray is not None:
+            backend.fill_poses(gamePoseArray, backend.time + 1.0 / backend.refresh_rate)
+        return renderPoseArray, gamePoseArray
+
+    def record_frame_timing(self, now, missed):
+        """
+        Build the timing of the frame that has just been completed, using the simulated GPU time of the backend.
+        """
+
+        gpu_time = self.backend.get_gpu_time()
+        timing = openvr.Compositor_FrameTiming()
+        timing.m_nFrameIndex = self.frame_index
+        timing.m_nNumFramePresents = 1 + missed
+        timing.m_nNumDroppedFrames = missed
+        timing.m_flSystemTimeInSeconds = now
+        timing.m_flTotalRenderGpuMs = gpu_time
+        timing.m_flPreSubmitGpuMs = gpu_time
+        timing.m_flClientFrameIntervalMs = (now - self.last_vsync) * 1000.0
+        if missed > 0:
+            timing.m_nReprojectionFlags |= openvr.VRCompositor_ReprojectionReason_Cpu
+        if gpu_time > 1000.0 / self.backend.refresh_rate:
+            timing.m_nReprojectionFlags |= openvr.VRCompositor_ReprojectionReason_Gpu
+        if timing.m_nReprojectionFlags != 0:
+            self.total_reprojected_frames += 1
+        self.total_presents += 1 + missed
+        self.total_dropped_frames += missed
+        self.timings.append(timing)
+
+    def getFrameTiming(self, framesAgo=0):
+        if not self.timings:
+            return False, openvr.Compositor_FrameTiming()
+        return True, self.timings[-1 - min(framesAgo, len(self.timings) - 1)]
+
+    def getCumulativeStats(self, statsSizeInBytes):
+        stats = openvr.Compositor_CumulativeStats()
+        stats.m_nNumFramePresents = self.total_presents
+        stats.m_nNumDroppedFrames = self.total_dropped_frames
+        stats.m_nNumReprojectedFrames = self.total_reprojected_frames
+        stats.m_nNumFrameSubmits = self.total_submits
+        return stats
+
+    def getLastPoses(self, renderPoseArray, gamePoseArray):
+        if renderPoseArray is not None:
+            self.backend.fill_poses(renderPoseArray, self.backend.time)
+        if gamePoseArray is not None:
+            self.backend.fill_poses(gamePoseArray, self.backend.time + 1.0 / self.backend.refresh_rate)
+        return renderPoseArray, gamePoseArray
+
+    def submit(self, eye, texture, bounds=None, submitFlags=openvr.Submit_Default):
+        if self.frame_index == 0:
+            self.protocol_error("Texture submitted before the first waitGetPoses()")
+        elif self.waiting:
+            self.protocol_error("Texture submitted during waitGetPoses()")
+        elif eye in self.frame_eyes:
+            self.protocol_error("Eye {} submitted twice in frame {}".format(eye, self.frame_index))
+        if self.timing_mode != openvr.VRCompositorTimingMode_Implicit and not self.frame_timing_data:
+            self.protocol_error("Texture submitted before submitExplicitTimingData() in frame {}".format(self.frame_index))
+        self.frame_eyes.add(eye)
+        if bounds is not None:
+            bounds = (bounds.uMin, bounds.vMin, bounds.uMax, bounds.vMax)
+        pose = None
+        if submitFlags & openvr.Submit_TextureWithPose:
+            pose = tuple(tuple(row) for row in texture.mDeviceToAbsoluteTracking.m)
+        self.submits.append((self.frame_index, eye, texture.handle, bounds, submitFlags, pose))
+        self.frame_submits += 1
+        self.total_submits += 1
+
+    def setExplicitTimingMode(self, timingMode):
+        self.timing_mode = timingMode
+
+    def submitExplicitTimingData(self):
+        if self.timing_mode == openvr.VRCompositorTimingMode_Implicit:
+            openvr.error_code.CompositorError.check_error_value(openvr.VRCompositorError_RequestFailed)
+        if self.frame_submits > 0:
+            self.protocol_error("submitExplicitTimingData() called after a submit in frame {}".format(self.frame_index))
+        self.frame_timing_data = True
+        self.total_timing_data += 1
+
+    def postPresentHandoff(self):
+        if len(self.frame_eyes) < 2:
+            self.protocol_error("postPresentHandoff() called before the submit of both eyes in frame {}".format(self.frame_index))
+        self.frame_handoff = True
+        self.total_handoffs += 1
+
+    def getSubmittedFrameCount(self):
+        """
+        Return the number of frames in which at least one texture has been submitted.
+        """
+
+        return len(set(submit[0] for submit in self.submits))
+
+class SimulatedAction:
+    """
+    State of an action of the simulated runtime.
+    """
+
+    def __init__(self, handle, path, action_type):
+        self.handle = handle
+        self.path = path
+        self.action_type = action_type
+        self.value = None
+        self.origin = openvr.k_ulInvalidInputValueHandle
+        self.active = False
+        self.state = (0.0, 0.0, 0.0)
+        self.previous_state = (0.0, 0.0, 0.0)
+
+class SimulatedInput:
+    """
+    Simulated IVRInput interface.
+
+    The handles of the action sets, actions and input sources are allocated on first use, the values of the actions
+    are set using SimulatedBackend.set_action() and are evaluated in updateActionState().
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.handles = {}
+        self.actions = {}
+        self.next_handle = 1
+        self.bone_count = 31
+        self.active_action_sets = set()
+
+    def get_handle(self, path):
+        key = path.lower()
+        handle = self.handles.get(key)
+        if handle is None:
+            handle = self.next_handle
+            self.next_handle += 1
+            self.handles[key] = handle
+        return handle
+
+    def get_action(self, handle):
+        action = self.actions.get(handle)
+        if action is None:
+            action = SimulatedAction(handle, None, None)
+            self.actions[handle] = action
+        return action
+
+    def setActionManifestPath(self, pchActionManifestPath):
+        with open(pchActionManifestPath) as manifest_file:
+            manifest = json.load(manifest_file)
+        for action_desc in manifest.get('actions', []):
+            handle = self.getActionHandle(action_desc['name'])
+            action = self.get_action(handle)
+            action.path = action_desc['name']
+            action.action_type = action_desc.get('type', 'boolean')
+
+    def getActionSetHandle(self, pchActionSetName):
+        return self.get_handle(pchActionSetName)
+
+    def getActionHandle(self, pchActionName):
+        return self.get_handle(pchActionName)
+
+    def getInputSourceHandle(self, pchInputSourcePath):
+        return self.get_handle(pchInputSourcePath)
+
+    def updateActionState(self, pSets):
+        self.active_action_sets = set(active_set.ulActionSet for active_set in pSets) if pSets is not None else set()
+        sim_time = self.backend.time
+        for action in self.actions.values():
+            value = action.value(sim_time) if callable(action.value) else action.value
+            action.previous_state = action.state
+            action.active = value is not None
+            if value is None:
+                action.state = (0.0, 0.0, 0.0)
+            elif isinstance(value, (tuple, list)):
+                action.state = (tuple(value) + (0.0, 0.0, 0.0))[:3]
+            else:
+                action.state = (float(value), 0.0, 0.0)
+
+    def getDigitalActionData(self, action, ulRestrictToDevice):
+        action = self.get_action(action)
+        data = openvr.InputDigitalActionData_t()
+        data.bActive = action.active
+        data.activeOrigin = action.origin
+        data.bState = action.state[0] != 0
+        data.bChanged = (action.state[0] != 0) != (action.previous_state[0] != 0)
+        return data
+
+    def getAnalogActionData(self, action, ulRestrictToDevice):
+        action = self.get_action(action)
+        data = openvr.InputAnalogActionData_t()
+        data.bActive = action.active
+        data.activeOrigin = action.origin
+        data.x, data.y, data.z = action.state
+        data.deltaX, data.deltaY, data.deltaZ = (action.state[i] - action.previous_state[i] for i in range(3))
+        return data
+
+    def getPoseActionDataForNextFrame(self, action, eOrigin, ulRestrictToDevice):
+        # The poses of the next frame are predicted for the same time as the render poses
+        return self.get_pose_action_data(action, ulRestrictToDevice, self.backend.time)
+
+    def getPoseActionDataRelativeToNow(self, action, eOrigin, fPredictedSecondsFromNow, ulRestrictToDevice):
+        return self.get_pose_action_data(action, ulRestrictToDevice, self.backend.get_current_time() + fPredictedSecondsFromNow)
+
+    def get_pose_action_data(self, action, ulRestrictToDevice, sim_time):
+        data = openvr.InputPoseActionData_t()
+        input_source = ulRestrictToDevice
+        if input_source == openvr.k_ulInvalidInputValueHandle:
+            input_source = self.get_action(action).origin
+        device = self.backend.get_device_for_input_source(input_source)
+        if device is not None:
+            data.bActive = True
+            data.activeOrigin = input_source
+            device.fill_pose(data.pose, sim_time)
+        return data
+
+    def getSkeletalActionData(self, action):
+        action = self.get_action(action)
+        data = openvr.InputSkeletalActionData_t()
+        data.bActive = action.active
+        data.activeOrigin = action.origin
+        return data
+
+    def getBoneCount(self, action):
+        return self.bone_count
+
+    def fill_bones(self, transformArray, curl):
+        for bone in transformArray:
+            bone.position.v[:] = (0.0, 0.0, -0.02, 1.0)
+            # Rotation around the X axis, bending the bone by up to 90 degrees
+            bone.orientation.w = cos(curl * 0.785398)
+            bone.orientation.x = sin(curl * 0.785398)
+            bone.orientation.y = 0.0
+            bone.orientation.z = 0.0
+
+    def getSkeletalBoneData(self, action, eTransformSpace, eMotionRange, transformArray):
+        self.fill_bones(transformArray, self.get_action(action).state[0])
+
+    def getSkeletalReferenceTransforms(self, action, eTransformSpace, eReferencePose, transformArray):
+        self.fill_bones(transformArray, 1.0 if eReferencePose == openvr.VRSkeletalReferencePose_Fist else 0.0)
+
+    def getSkeletalSummaryData(self, action, summaryType):
+        data = openvr.VRSkeletalSummaryData_t()
+        data.flFingerCurl[:] = [self.get_action(action).state[0]] * 5
+        return data
+
+    def getOriginTrackedDeviceInfo(self, origin):
+        info = openvr.InputOriginInfo_t()
+        info.devicePath = origin
+        device = self.backend.get_device_for_input_source(origin)
+        info.trackedDeviceIndex = device.index if device is not None else openvr.k_unTrackedDeviceIndexInvalid
+        return info
+
+    def triggerHapticVibrationAction(self, action, fStartSecondsFromNow, fDurationSeconds, fFrequency, fAmplitude, ulRestrictToDevice):
+        pass
+
+class SimulatedBackend:
+    """
+    Pure Python implementation of the parts of the OpenVR API used by P3DOpenVR.
+    """
+
+    def __init__(self, refresh_rate=90.0, render_size=(1512, 1680), ipd=0.064, pace=True, default_devices=True,
+                 max_recorded_submits=1000, gpu_time=0.0):
+        """
+        * refresh_rate : Simulated refresh rate of the HMD, in Hz.
+
+        * render_size : Recommended size of the render target of each eye.
+
+        * ipd : Inter-pupillary distance, in meters.
+
+        * pace : If True, waitGetPoses() blocks until the next simulated vsync, otherwise it returns immediately
+          and the simulated time advances by one refresh period per frame.
+
+        * default_devices : If True, an HMD and two controllers are created, the HMD is at 1.7m from the floor and the
+          controllers in front of it.
+
+        * max_recorded_submits : Maximum number of submits kept in the compositor record.
+
+        * gpu_time : GPU time of each frame reported in the frame timing, in milliseconds, either as a value or as a
+          function of the simulated time. A GPU time larger than the refresh period is reported as a reprojection.
+        """
+
+        self.refresh_rate = refresh_rate
+        self.render_size = render_size
+        self.ipd = ipd
+        self.pace = pace
+        self.max_recorded_submits = max_recorded_submits
+        self.gpu_time = gpu_time
+        self.projection_raw = {
+            openvr.Eye_Left: (-1.39, 1.25, -1.47, 1.47),
+            openvr.Eye_Right: (-1.25, 1.39, -1.47, 1.47),
+        }
+        self.devices = {}
+        self.frame = 0
+        self.time = 0.0
+        self.initialized = False
+        self.system = SimulatedSystem(self)
+        self.applications = SimulatedApplications(self)
+        self.compositor = SimulatedCompositor(self)
+        self.input = SimulatedInput(self)
+        if default_devices:
+            self.add_device(openvr.TrackedDeviceClass_HMD, 'sim_hmd', 'SIM-HMD', pose=make_pose_matrix(0, 1.7, 0),
+                            input_source='/user/head', index=openvr.k_unTrackedDeviceIndex_Hmd)
+            self.add_device(openvr.TrackedDeviceClass_Controller, 'sim_controller', 'SIM-LEFT',
+                            role=openvr.TrackedControllerRole_LeftHand, pose=make_pose_matrix(-0.2, 1.2, -0.3),
+                            input_source='/user/hand/left')
+            self.add_device(openvr.TrackedDeviceClass_Controller, 'sim_controller', 'SIM-RIGHT',
+                            role=openvr.TrackedControllerRole_RightHand, pose=make_pose_matrix(0.2, 1.2, -0.3),
+                            input_source='/user/hand/right')
+
+    # openvr module interface
+
+    def init(self, applicationType):
+        self.initialized = True
+        return self.system
+
+    def shutdown(self):
+        self.initialized = False
+
+    def VRSystem(self):
+        return self.system
+
+    def VRApplications(self):
+        return self.applications
+
+    def VRCompositor(self):
+        return self.compositor
+
+    def VRInput(self):
+        return self.input
+
+    # Scripting interface
+
+    def add_device(self, device_class, model_name, serial, role=openvr.TrackedControllerRole_Invalid, pose=None, input_source=None, index=None):
+        """
+        Add a new tracked device and return it. If the runtime is already initialized, a TrackedDeviceActivated
+        event is sent. See SimulatedDevice for the parameters.
+        """
+
+        if index is None:
+            index = 1
+            while index in self.devices:
+                index += 1
+        device = SimulatedDevice(index, device_class, model_name, serial, role, pose, input_source)
+        self.devices[index] = device
+        if self.initialized:
+            self.queue_event(openvr.VREvent_TrackedDeviceActivated, index)
+        return device
+
+    def set_device_connected(self, index, connected):
+        """
+        Connect or disconnect the given device, the matching TrackedDeviceActivated or TrackedDeviceDeactivated event
+        is sent.
+        """
+
+        device = self.devices[index]
+        if device.connected != connected:
+            device.connected = connected
+            self.queue_event(openvr.VREvent_TrackedDeviceActivated if connected else openvr.VREvent_TrackedDeviceDeactivated, index)
+
+    def set_device_pose(self, index, pose):
+        """
+        Set the pose of the given device, either as the rows of a 3x4 matrix or as a function of the simulated time.
+        """
+
+        self.devices[index].pose = pose
+
+    def get_device_for_input_source(self, input_source):
+        """
+        Return the device bound to the given input source handle, or None.
+        """
+
+        for device in self.devices.values():
+            if device.input_source is not None and self.input.get_handle(device.input_source) == input_source:
+                return device
+        return None
+
+    def set_action(self, path, value, input_source=None):
+        """
+        Set the value of the given action. The value is evaluated at each update of the action state and can be :
+
+        * None : The action is inactive.
+
+        * A boolean or a float : State of a digital action, value of a 1D analog action or curl of a skeletal action.
+
+        * A tuple : Value of a 2D or 3D analog action.
+
+        * A function receiving the simulated time and returning one of the above.
+
+        input_source : Path of the input source triggering the action, e.g. '/user/hand/right'
+        """
+
+        action = self.input.get_action(self.input.getActionHandle(path))
+        action.path = path
+        action.value = value
+        if input_source is not None:
+            action.origin = self.input.getInputSourceHandle(input_source)
+
+    def queue_event(self, event_type, device_index=openvr.k_unTrackedDeviceIndex_Hmd, prop=None):
+        """
+        Queue an event to be returned by pollNextEvent().
+
+        * prop : For PropertyChanged events, the property that changed.
+        """
+
+        event = openvr.VREvent_t()
+        event.eventType = event_type
+        event.trackedDeviceIndex = device_index
+        if prop is not None:
+            event.data.property.prop = prop
+        self.system.events.append(event)
+
+    # Internal simulation
+
+    def advance(self):
+        """
+        Advance the simulated time by one refresh period.
+        """
+
+        self.frame += 1
+        self.time = self.frame / self.refresh_rate
+
+    def get_current_time(self):
+        """
+        Return the simulated time corresponding to the current wall clock time. The simulated time of a frame is the
+        time its photons are emitted, one refresh period after the vsync that started the frame.
+        """
+
+        return self.time - 1.0 / self.refresh_rate + (time.perf_counter() - self.compositor.last_vsync)
+
+    def get_gpu_time(self):
+        """
+        Return the simulated GPU time of the current frame, in milliseconds.
+        """
+
+        if callable(self.gpu_time):
+            return self.gpu_time(self.time)
+        return self.gpu_time
+
+    def fill_poses(self, pose_array, sim_time):
+        """
+        Fill the given array of openvr.TrackedDevicePose_t with the pose of the devices at the given simulated time.
+        """
+
+        for (index, device) in self.devices.items():
+            if index < len(pose_array):
+                device.fill_pose(pose_array[index], sim_time)
+
+    def make_hidden_area_mesh(self, eye, mesh_type, cut=0.2):
+        """
+        Return the vertices, as a ctypes array of openvr.HmdVector2_t, and the triangle count of a canned hidden area
+        mesh for the given eye. The visible area is an octagon whose corners are cut at the given ratio.
+        """
+
+        octagon = [(cut, 0), (1 - cut, 0), (1, cut), (1, 1 - cut), (1 - cut, 1), (cut, 1), (0, 1 - cut), (0, cut)]
+        if mesh_type == openvr.k_eHiddenAreaMesh_Standard:
+            corners = [(0, 0), (1, 0), (1, 1), (0, 1)]
+            points = []
+            for (i, corner) in enumerate(corners):
+                points += [corner, octagon[(i * 2 + 7) % 8], octagon[i * 2]]
+            count = len(corners)
+        elif mesh_type == openvr.k_eHiddenAreaMesh_Inverse:
+            points = []
+            for i in range(8):
+                points += [(0.5, 0.5), octagon[i], octagon[(i + 1) % 8]]
+            count = 8
+        else:
+            points = octagon
+            count = len(octagon)
+        vertices = (openvr.HmdVector2_t * len(points))()
+        for (vertex, point) in zip(vertices, points):
+            vertex.v[:] = point
+        return vertices, count
@@ -1,11 +1,86 @@
 from direct.actor.Actor import Actor
+from panda3d.core import ClockObject, LMatrix4, PTA_LMatrix4f, Shader, InternalName, Geom
+from panda3d.core import GeomVertexData, GeomVertexFormat, GeomVertexArrayFormat, GeomVertexAnimationSpec, GeomVertexReader, GeomVertexWriter
 
-from .definitions import HandSkeletonBone
+from .definitions import HandSkeletonBone, HandSkeletonLOD
+
+import ctypes
+import openvr
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class HandSkeletonLODPolicy:
+    """
+    Policy selecting the level of detail of the hand skeletons it is assigned to:
+
+    * HandSkeletonLOD.Full : All the bones are retrieved from OpenVR.
+
+    * HandSkeletonLOD.Summary : Only the curl of each finger is retrieved and the fingers are animated procedurally
+      between the open hand and fist reference poses.
+
+    * HandSkeletonLOD.Frozen : The skeleton is not updated and keeps its last pose.
+
+    The same policy can be shared between several skeletons to enforce a global budget of full updates per frame.
+    """
+
+    def __init__(self, summary_distance=None, frozen_distance=None, max_full_skeletons=None, freeze_hidden=True, reference=None):
+        """
+        * summary_distance : Distance from the reference above which the summary level is used.
+
+        * frozen_distance : Distance from the reference above which the skeleton is frozen.
+
+        * max_full_skeletons : Maximum number of skeletons updated with the full bones in a frame, the others are
+          updated using the summary level.
+
+        * freeze_hidden : If True, the skeleton is frozen while its model is hidden.
+
+        * reference : NodePath from which the distance is measured, by default the HMD anchor.
+        """
+
+        self.summary_distance = summary_distance
+        self.frozen_distance = frozen_distance
+        self.max_full_skeletons = max_full_skeletons
+        self.freeze_hidden = freeze_hidden
+        self.reference = reference
+        self.frame = None
+        self.full_skeletons = 0
+
+    def get_lod(self, skeleton):
+        """
+        Return the level of detail to use for the given skeleton in this frame.
+        """
+
+        model = skeleton.model
+        if self.freeze_hidden and model.is_hidden():
+            return HandSkeletonLOD.Frozen
+        if self.summary_distance is not None or self.frozen_distance is not None:
+            reference = self.reference if self.reference is not None else skeleton.ovr.hmd_anchor
+            distance = model.get_distance(reference)
+            if self.frozen_distance is not None and distance > self.frozen_distance:
+                return HandSkeletonLOD.Frozen
+            if self.summary_distance is not None and distance > self.summary_distance:
+                return HandSkeletonLOD.Summary
+        if self.max_full_skeletons is not None:
+            frame = ClockObject.get_global_clock().get_frame_count()
+            if frame != self.frame:
+                self.frame = frame
+                self.full_skeletons = 0
+            if self.full_skeletons >= self.max_full_skeletons:
+                return HandSkeletonLOD.Summary
+            self.full_skeletons += 1
+        return HandSkeletonLOD.Full
 
 class HandSkeleton:
     """
     Helper class that will map the skeleton received from OpenVR onto the bones of the model of the hand.
     """
+
+    # Index of the finger curl in VRSkeletalSummaryData_t driving each bone, 5 means the bone is not curled
+    curl_fingers = [5, 5, 0, 0, 0, 0, 1, 1, 1, 1, 1, 2, 2, 2, 2, 2, 3, 3, 3, 3, 3, 4, 4, 4, 4, 4, 5, 5, 5, 5, 5]
+
     def __init__(self, ovr, action, joint_map, part_name="modelRoot"):
         """
         * ovr : Reference to the instance of P3DOpenVR.
@@ -23,6 +98,10 @@ class HandSkeleton:
         self.part_name = part_name
         self.control_map = {}
         self.model = None
+        self.bone_matrices = None
+        self.lod_policy = None
+        self.lod = HandSkeletonLOD.Full
+        self.summary_buffer = None
 
     def set_model(self, model):
         """
@@ -52,18 +131,384 @@ class HandSkeleton:
     def set_default_pose(self, pose):
         pass
 
+    def set_lod_policy(self, lod_policy):
+        """
+        Assign the policy selecting the level of detail of this skeleton, None to always use the full bones.
+
+        * lod_policy : Instance of HandSkeletonLODPolicy or any object with a get_lod(skeleton) method.
+        """
+
+        self.lod_policy = lod_policy
+
     def update(self):
         """
-        Retrieve the transforms for all the bone and update the linked control joints.
+        Update the linked control joints according to the current level of detail of the skeleton.
         This method should be called each frame after the main pose update task.
         """
 
+        if self.lod_policy is not None:
+            self.lod = self.lod_policy.get_lod(self)
+        if self.lod == HandSkeletonLOD.Full:
+            self.update_bones()
+        elif self.lod == HandSkeletonLOD.Summary:
+            self.update_from_summary()
+
+    def update_bones(self):
+        """
+        Retrieve the transforms for all the bone and update the linked control joints.
+        """
+
         bone_transform_array, device_path = self.ovr.get_skeletal_bone_data(self.action)
         if bone_transform_array is not None:
+            self.apply_bone_transforms(bone_transform_array)
+
+    def update_from_summary(self):
+        """
+        Retrieve the curl of each finger and update the linked control joints by blending each finger between the
+        open hand and the fist reference poses. Finger splay is not used.
+        """
+
+        if np is None:
+            self.update_bones()
+            return
+        summary = self.ovr.get_skeletal_summary_data(self.action)
+        if summary is None:
+            return
+        open_hand, device_path = self.ovr.get_skeletal_reference_transform(self.action, openvr.VRSkeletalReferencePose_OpenHand)
+        fist, device_path = self.ovr.get_skeletal_reference_transform(self.action, openvr.VRSkeletalReferencePose_Fist)
+        if open_hand is None or fist is None:
+            return
+        count = len(open_hand)
+        if self.summary_buffer is None:
+            self.summary_buffer = (openvr.VRBoneTransform_t * count)()
+            self.summary_view = self.view_bone_transforms(self.summary_buffer)
+            self.open_hand_view = self.view_bone_transforms(open_hand)
+            self.fist_view = self.view_bone_transforms(fist)
+            self.bone_curl_fingers = np.array((self.curl_fingers + [5] * count)[:count], dtype=np.int32)
+            self.curls = np.zeros(6, dtype=np.float32)
+        self.curls[:5] = summary.flFingerCurl
+        weights = self.curls[self.bone_curl_fingers][:, None]
+        open_pose, fist_pose = self.open_hand_view, self.fist_view
+        self.summary_view[:, 0:4] = open_pose[:, 0:4] + (fist_pose[:, 0:4] - open_pose[:, 0:4]) * weights
+        # Normalized linear interpolation of the orientations, along the shortest path
+        signs = np.where(np.einsum('ij,ij->i', open_pose[:, 4:8], fist_pose[:, 4:8]) < 0, -1.0, 1.0)[:, None]
+        orientations = open_pose[:, 4:8] * (1 - weights) + fist_pose[:, 4:8] * signs * weights
+        self.summary_view[:, 4:8] = orientations / np.linalg.norm(orientations, axis=1)[:, None]
+        self.apply_bone_transforms(self.summary_buffer)
+
+    def view_bone_transforms(self, bone_transform_array):
+        """
+        Return a (N, 8) NumPy view on the given array of openvr.VRBoneTransform_t, position followed by orientation.
+        """
+
+        raw = (ctypes.c_float * (len(bone_transform_array) * 8)).from_buffer(bone_transform_array)
+        return np.frombuffer(raw, dtype=np.float32).reshape(-1, 8)
+
+    def apply_bone_transforms(self, bone_transform_array):
+        """
+        Update the linked control joints using the given array of bone transforms.
+        """
+
+        # Convert all the bones at once, reusing the same matrices buffer each frame
+        self.bone_matrices = self.ovr.get_bone_transform_mats(bone_transform_array, self.bone_matrices)
+        if self.bone_matrices is not None:
+            bone_mats = self.bone_matrices.reshape(-1, 16).tolist()
+            for (bone_index, joint_control) in self.control_map.items():
+                joint_control.set_mat(LMatrix4(*bone_mats[bone_index]))
+        else:
             for (bone_index, joint_control) in self.control_map.items():
                 transform_mat = self.ovr.get_bone_transform_mat(bone_transform_array, bone_index)
                 joint_control.set_mat(transform_mat)
 
+class GPUHandSkeleton(HandSkeleton):
+    """
+    Variant of HandSkeleton that skins the model of the hand on the GPU.
+
+    Instead of controlling the joints of the Actor, the skinning matrices of all the joints are computed at once from
+    the OpenVR bone transforms and written into a shader input array used by a skinning shader. The vertex data of the
+    model is converted once to carry the joint indices and weights and is no longer animated by the CPU.
+    The default shader applies the texture, the vertex colors, the color scale and the material of the model, lit by
+    the ambient light and up to max_lights point or directional lights with a per-pixel diffuse term. Specular
+    highlights, spotlight cones, attenuation and shadows are not supported, a custom shader can be given instead.
+    The joint map is the same as for HandSkeleton, e.g. DefaultLeftHandSkeleton.default_joint_map can be used.
+
+    This requires NumPy, without it the skeleton falls back on the control joints of HandSkeleton.
+    """
+
+    max_joints = 64
+    max_weights = 4
+    max_lights = 4
+
+    vertex_shader = """#version 330
+uniform mat4 p3d_ModelViewProjectionMatrix;
+uniform mat4 p3d_ModelViewMatrix;
+uniform mat3 p3d_NormalMatrix;
+uniform mat4 ovr_joint_matrices[{max_joints}];
+in vec4 p3d_Vertex;
+in vec3 p3d_Normal;
+in vec4 p3d_Color;
+in vec2 p3d_MultiTexCoord0;
+in vec4 ovr_joint_index;
+in vec4 ovr_joint_weight;
+out vec3 position;
+out vec3 normal;
+out vec4 color;
+out vec2 texcoord;
+void main() {{
+    mat4 skin = ovr_joint_weight.x * ovr_joint_matrices[int(ovr_joint_index.x)] +
+                ovr_joint_weight.y * ovr_joint_matrices[int(ovr_joint_index.y)] +
+                ovr_joint_weight.z * ovr_joint_matrices[int(ovr_joint_index.z)] +
+                ovr_joint_weight.w * ovr_joint_matrices[int(ovr_joint_index.w)];
+    vec4 vertex = skin * p3d_Vertex;
+    gl_Position = p3d_ModelViewProjectionMatrix * vertex;
+    position = vec3(p3d_ModelViewMatrix * vertex);
+    normal = p3d_NormalMatrix * (mat3(skin) * p3d_Normal);
+    color = p3d_Color;
+    texcoord = p3d_MultiTexCoord0;
+}}
+"""
+
+    fragment_shader = """#version 330
+uniform sampler2D p3d_Texture0;
+uniform vec4 p3d_ColorScale;
+uniform struct p3d_MaterialParameters {{
+    vec4 ambient;
+    vec4 diffuse;
+    vec4 emission;
+}} p3d_Material;
+uniform struct p3d_LightModelParameters {{
+    vec4 ambient;
+}} p3d_LightModel;
+uniform struct p3d_LightSourceParameters {{
+    vec4 color;
+    vec4 position;
+}} p3d_LightSource[{max_lights}];
+in vec3 position;
+in vec3 normal;
+in vec4 color;
+in vec2 texcoord;
+out vec4 frag_color;
+void main() {{
+    vec3 surface_normal = normalize(normal);
+    vec4 light = p3d_LightModel.ambient * p3d_Material.ambient + p3d_Material.emission;
+    for (int i = 0; i < {max_lights}; ++i) {{
+        vec3 light_vector = p3d_LightSource[i].position.xyz - position * p3d_LightSource[i].position.w;
+        if (dot(light_vector, light_vector) > 0.0) {{
+            float lambert = max(dot(surface_normal, normalize(light_vector)), 0.0);
+            light += p3d_LightSource[i].color * p3d_Material.diffuse * lambert;
+        }}
+    }}
+    vec4 base_color = texture(p3d_Texture0, texcoord) * color;
+    frag_color = vec4(base_color.rgb * light.rgb, base_color.a * p3d_Material.diffuse.a) * p3d_ColorScale;
+}}
+"""
+
+    def __init__(self, ovr, action, joint_map, part_name="modelRoot", shader=None):
+        """
+        * ovr : Reference to the instance of P3DOpenVR.
+
+        * action : Handler of the action holding the bone transforms of the hand
+
+        * joint_map : Dictionary that maps the joints of the model onto the bones of the OpenVR skeleton
+
+        * part_name : Name of the root node in the model that contains the joints.
+
+        * shader : Skinning shader to use instead of the default one. It must use the ovr_joint_index and
+          ovr_joint_weight vertex columns and the ovr_joint_matrices array input.
+        """
+
+        HandSkeleton.__init__(self, ovr, action, joint_map, part_name)
+        self.shader = shader
+        self.gpu_skinning = False
+        self.joint_matrices = None
+        self.joint_matrices_view = None
+
+    def set_model(self, model):
+        """
+        Attach the given model to the skeleton and convert it for GPU skinning.
+
+        * model : Instance of the model of the hand.
+        """
+
+        if np is None:
+            print("WARNING: NumPy is not available, GPU skinning is disabled")
+            HandSkeleton.set_model(self, model)
+            return
+        if not isinstance(model, Actor):
+            model = Actor(model, copy=False)
+        self.model = model
+        self.build_joints()
+        # The last skinning matrix is kept as the identity for the vertices not driven by any joint
+        if len(self.joints) >= self.max_joints:
+            print("WARNING: Too many joints in the model, GPU skinning is disabled")
+            self.build_control_map()
+            return
+        if not self.convert_vertex_data():
+            print("WARNING: Vertices not driven by the joints of the skeleton, GPU skinning is disabled")
+            self.build_control_map()
+            return
+        self.joint_matrices = PTA_LMatrix4f.empty_array(self.max_joints)
+        self.joint_matrices_view = np.frombuffer(memoryview(self.joint_matrices), dtype=np.float32).reshape(self.max_joints, 4, 4)
+        self.joint_matrices_view[:] = np.identity(4, dtype=np.float32)
+        if self.shader is None:
+            self.shader = Shader.make(Shader.SL_GLSL,
+                                      vertex=self.vertex_shader.format(max_joints=self.max_joints),
+                                      fragment=self.fragment_shader.format(max_lights=self.max_lights))
+        self.model.set_shader(self.shader)
+        self.model.set_shader_input('ovr_joint_matrices', self.joint_matrices)
+        self.gpu_skinning = True
+
+    def build_joints(self):
+        """
+        Collect the joints of the model with their parent and bind pose, and map them onto the bones of the skeleton.
+        """
+
+        self.joints = []
+        parents = []
+        default_values = []
+
+        def collect(group, parent_index):
+            for child in group.get_children():
+                if child.is_character_joint():
+                    index = len(self.joints)
+                    self.joints.append(child)
+                    parents.append(parent_index)
+                    default_value = child.get_default_value()
+                    default_values.append([tuple(default_value.get_row(row)) for row in range(4)])
+                    collect(child, index)
+                else:
+                    collect(child, parent_index)
+
+        collect(self.model.get_part_bundle(self.part_name), -1)
+        count = len(self.joints)
+        self.joint_indices = {joint.get_name(): index for (index, joint) in enumerate(self.joints)}
+        self.joint_parents = np.array(parents, dtype=np.int32)
+        self.default_locals = np.array(default_values, dtype=np.float32).reshape(count, 4, 4)
+        # Group the joints by depth in the hierarchy, each level can then be composed with its parents at once
+        depths = []
+        for parent_index in parents:
+            depths.append(0 if parent_index < 0 else depths[parent_index] + 1)
+        self.joint_levels = []
+        for depth in range(max(depths, default=-1) + 1):
+            level = np.array([i for i in range(count) if depths[i] == depth], dtype=np.int32)
+            self.joint_levels.append((level, self.joint_parents[level]))
+        self.net_transforms = np.empty((count, 4, 4), dtype=np.float32)
+        self.local_transforms = self.default_locals.copy()
+        self.compose_net_transforms()
+        self.inverse_bind = np.linalg.inv(self.net_transforms).astype(np.float32)
+        mapped_joints = []
+        mapped_bones = []
+        for (joint_name, bone_index) in self.joint_map.items():
+            joint_index = self.joint_indices.get(joint_name)
+            if joint_index is not None:
+                mapped_joints.append(joint_index)
+                mapped_bones.append(int(bone_index))
+            else:
+                print("Joint '{}' not found".format(joint_name))
+        self.mapped_joints = np.array(mapped_joints, dtype=np.int32)
+        self.mapped_bones = np.array(mapped_bones, dtype=np.int32)
+
+    def compose_net_transforms(self):
+        """
+        Compute the net transforms of all the joints from their local transforms, one hierarchy level at a time.
+        """
+
+        for (level, parents) in self.joint_levels:
+            if parents[0] < 0:
+                self.net_transforms[level] = self.local_transforms[level]
+            else:
+                self.net_transforms[level] = np.matmul(self.local_transforms[level], self.net_transforms[parents])
+
+    def resolve_blend(self, blend):
+        """
+        Return the joint indices and weights of the given TransformBlend, or None if the blend is not driven by the
+        joints of the skeleton. Only the max_weights largest weights are kept and they are renormalized.
+        An empty blend leaves the vertex in place and uses the last skinning matrix, which is always the identity.
+        """
+
+        indices = [0.0] * self.max_weights
+        weights = [0.0] * self.max_weights
+        if blend.get_num_transforms() == 0:
+            indices[0] = self.max_joints - 1
+            weights[0] = 1.0
+            return (indices, weights)
+        influences = []
+        for j in range(blend.get_num_transforms()):
+            transform = blend.get_transform(j)
+            # Only the JointVertexTransform are driven by a joint, the other transforms are ignored
+            if not hasattr(transform, 'get_joint'):
+                continue
+            joint_index = self.joint_indices.get(transform.get_joint().get_name())
+            if joint_index is not None and blend.get_weight(j) > 0:
+                influences.append((blend.get_weight(j), joint_index))
+        influences.sort(reverse=True)
+        influences = influences[:self.max_weights]
+        total = sum(weight for (weight, joint_index) in influences)
+        if total <= 0:
+            return None
+        for (j, (weight, joint_index)) in enumerate(influences):
+            indices[j] = joint_index
+            weights[j] = weight / total
+        return (indices, weights)
+
+    def convert_vertex_data(self):
+        """
+        Replace the animated vertex data of the model with static vertex data holding the joint indices and weights
+        used by the skinning shader.
+        Return False, without modifying the model, if a vertex is not driven by the joints of the skeleton.
+        """
+
+        # Resolve once the joint indices and weights of each blend of the tables
+        geoms = []
+        for geom_np in self.model.find_all_matches('**/+GeomNode'):
+            geom_node = geom_np.node()
+            for i in range(geom_node.get_num_geoms()):
+                vdata = geom_node.get_geom(i).get_vertex_data()
+                blend_table = vdata.get_transform_blend_table()
+                if blend_table is None:
+                    continue
+                blends = []
+                for blend in blend_table.get_blends():
+                    resolved = self.resolve_blend(blend)
+                    if resolved is None:
+                        return False
+                    blends.append(resolved)
+                geoms.append((geom_node, i, vdata, blends))
+        index_name = InternalName.make('ovr_joint_index')
+        weight_name = InternalName.make('ovr_joint_weight')
+        for (geom_node, i, vdata, blends) in geoms:
+            array_format = GeomVertexArrayFormat()
+            array_format.add_column(index_name, self.max_weights, Geom.NT_float32, Geom.C_other)
+            array_format.add_column(weight_name, self.max_weights, Geom.NT_float32, Geom.C_other)
+            vformat = GeomVertexFormat(vdata.get_format())
+            vformat.add_array(array_format)
+            vformat.set_animation(GeomVertexAnimationSpec())
+            new_vdata = GeomVertexData(vdata.convert_to(GeomVertexFormat.register_format(vformat)))
+            new_vdata.clear_transform_blend_table()
+            reader = GeomVertexReader(vdata, InternalName.get_transform_blend())
+            index_writer = GeomVertexWriter(new_vdata, index_name)
+            weight_writer = GeomVertexWriter(new_vdata, weight_name)
+            for row in range(vdata.get_num_rows()):
+                (indices, weights) = blends[reader.get_data1i()]
+                index_writer.set_data4(*indices)
+                weight_writer.set_data4(*weights)
+            geom_node.modify_geom(i).set_vertex_data(new_vdata)
+        return True
+
+    def apply_bone_transforms(self, bone_transform_array):
+        """
+        Update the skinning matrices given to the shader using the given array of bone transforms.
+        """
+
+        if not self.gpu_skinning:
+            HandSkeleton.apply_bone_transforms(self, bone_transform_array)
+            return
+        self.bone_matrices = self.ovr.get_bone_transform_mats(bone_transform_array, self.bone_matrices)
+        self.local_transforms[self.mapped_joints] = self.bone_matrices[self.mapped_bones]
+        self.compose_net_transforms()
+        count = len(self.joints)
+        np.matmul(self.inverse_bind, self.net_transforms, out=self.joint_matrices_view[:count])
+
 class DefaultLeftHandSkeleton(HandSkeleton):
     """
     Helper class that will map the default model of the left hand from Valve to the bones of the skeleton.
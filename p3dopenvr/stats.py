@@ -0,0 +1,145 @@
+from panda3d.core import PStatCollector
+
+import ctypes
+import openvr
+
+# Reprojection flags signaling that the application frame was not ready in time
+reprojection_reasons = openvr.VRCompositor_ReprojectionReason_Cpu | openvr.VRCompositor_ReprojectionReason_Gpu
+
+class CompositorStats:
+    """
+    Counters built from the frame timing and cumulative statistics provided by the OpenVR compositor.
+
+    The per-frame values describe the last frame presented by the compositor, the totals are accumulated since the
+    counters were enabled or reset.
+    """
+
+    def __init__(self):
+        self.frame_timing = None
+        self.cumulative_stats = None
+        self.reset()
+
+    def reset(self):
+        """
+        Reset all the counters.
+        """
+
+        self.frame_index = 0
+        self.application_gpu_ms = 0.0
+        self.pre_submit_gpu_ms = 0.0
+        self.post_submit_gpu_ms = 0.0
+        self.compositor_gpu_ms = 0.0
+        self.compositor_cpu_ms = 0.0
+        self.client_frame_interval_ms = 0.0
+        self.presents = 0
+        self.mis_presented = 0
+        self.dropped_frames = 0
+        self.reprojection_flags = 0
+        self.reprojected = False
+        self.total_frames = 0
+        self.total_dropped_frames = 0
+        self.total_reprojected_frames = 0
+        self.total_mis_presented = 0
+
+    def update_frame_timing(self, compositor):
+        """
+        Retrieve the timing of the last frame from the compositor and update the counters.
+        Return False if no timing is available.
+        """
+
+        result, timing = compositor.getFrameTiming(0)
+        if not result or timing.m_nFrameIndex == self.frame_index:
+            return False
+        self.frame_timing = timing
+        self.frame_index = timing.m_nFrameIndex
+        self.application_gpu_ms = timing.m_flTotalRenderGpuMs
+        self.pre_submit_gpu_ms = timing.m_flPreSubmitGpuMs
+        self.post_submit_gpu_ms = timing.m_flPostSubmitGpuMs
+        self.compositor_gpu_ms = timing.m_flCompositorRenderGpuMs
+        self.compositor_cpu_ms = timing.m_flCompositorRenderCpuMs
+        self.client_frame_interval_ms = timing.m_flClientFrameIntervalMs
+        self.presents = timing.m_nNumFramePresents
+        self.mis_presented = timing.m_nNumMisPresented
+        self.dropped_frames = timing.m_nNumDroppedFrames
+        self.reprojection_flags = timing.m_nReprojectionFlags
+        self.reprojected = (timing.m_nReprojectionFlags & reprojection_reasons) != 0
+        self.total_frames += 1
+        self.total_dropped_frames += timing.m_nNumDroppedFrames
+        self.total_mis_presented += timing.m_nNumMisPresented
+        if self.reprojected:
+            self.total_reprojected_frames += 1
+        return True
+
+    def update_cumulative_stats(self, compositor):
+        """
+        Retrieve the statistics accumulated by the compositor since the application started.
+        """
+
+        self.cumulative_stats = compositor.getCumulativeStats(ctypes.sizeof(openvr.Compositor_CumulativeStats))
+        return self.cumulative_stats
+
+class VRStats:
+    """
+    PStats collectors measuring each stage of the VR frame, and levels reporting the compositor frame timing.
+
+    The stages of the update task are nested under the collector of the task, the draw and submit of each eye are
+    reported under Draw:OpenVR. The Draw collectors are started and stopped with the current thread, so they are
+    charged to the Draw thread when the Draw stage runs in its own thread.
+    """
+
+    def __init__(self, task_name='openvr-update-poses'):
+        task_collector = 'App:Tasks:' + task_name
+        self.wait_poses = PStatCollector(task_collector + ':Wait poses')
+        self.convert_poses = PStatCollector(task_collector + ':Poses')
+        self.events = PStatCollector(task_collector + ':Events')
+        self.hmd = PStatCollector(task_collector + ':HMD')
+        self.devices = PStatCollector(task_collector + ':Devices')
+        self.actions = PStatCollector(task_collector + ':Actions')
+        self.draw_left = PStatCollector('Draw:OpenVR:Left eye')
+        self.draw_right = PStatCollector('Draw:OpenVR:Right eye')
+        self.draw_stereo = PStatCollector('Draw:OpenVR:Stereo')
+        self.submit = PStatCollector('Draw:OpenVR:Submit')
+        self.timing_data = PStatCollector('Draw:OpenVR:Timing data')
+        self.handoff = PStatCollector('Draw:OpenVR:Handoff')
+        self.draw_wait_poses = PStatCollector('Draw:OpenVR:Wait poses')
+        self.application_gpu_level = PStatCollector('OpenVR timing:Application GPU')
+        self.compositor_gpu_level = PStatCollector('OpenVR timing:Compositor GPU')
+        self.compositor_cpu_level = PStatCollector('OpenVR timing:Compositor CPU')
+        self.frame_interval_level = PStatCollector('OpenVR timing:Frame interval')
+        self.dropped_level = PStatCollector('OpenVR frames:Dropped')
+        self.mis_presented_level = PStatCollector('OpenVR frames:Mispresented')
+        self.reprojected_level = PStatCollector('OpenVR frames:Reprojected')
+        self.compositor = CompositorStats()
+        self.frame_timing_enabled = False
+        self.cumulative_interval = 0
+        self.frames = 0
+        # Number of frames rendered with the poses of the previous frame, as the threaded wait timed out
+        self.wait_timeouts = 0
+
+    def enable_frame_timing(self, enabled=True, cumulative_interval=0):
+        """
+        Enable or disable the retrieval of the compositor frame timing, once per frame.
+
+        * cumulative_interval : If not 0, the cumulative statistics are also retrieved every cumulative_interval frames.
+        """
+
+        self.frame_timing_enabled = enabled
+        self.cumulative_interval = cumulative_interval
+
+    def update_frame_timing(self, compositor):
+        """
+        Update the compositor counters and the PStats levels, this is called once per frame after waitGetPoses().
+        """
+
+        stats = self.compositor
+        if stats.update_frame_timing(compositor):
+            self.application_gpu_level.set_level(stats.application_gpu_ms)
+            self.compositor_gpu_level.set_level(stats.compositor_gpu_ms)
+            self.compositor_cpu_level.set_level(stats.compositor_cpu_ms)
+            self.frame_interval_level.set_level(stats.client_frame_interval_ms)
+            self.dropped_level.set_level(stats.dropped_frames)
+            self.mis_presented_level.set_level(stats.mis_presented)
+            self.reprojected_level.set_level(1 if stats.reprojected else 0)
+        self.frames += 1
+        if self.cumulative_interval > 0 and self.frames % self.cumulative_interval == 0:
+            stats.update_cumulative_stats(compositor)
@@ -0,0 +1,78 @@
+import openvr
+
+class SubmitDescriptor:
+    """
+    Arguments of the submit of one eye, kept across frames.
+
+    The OpenVR texture structure and the bounds are allocated once, the native handle of the texture is only
+    resolved again when the texture context has been released or when the properties of the texture, e.g. its size,
+    have changed.
+    """
+
+    def __init__(self, eye, texture, bounds, color_space):
+        self.eye = eye
+        self.texture = texture
+        self.bounds = bounds
+        self.flags = openvr.Submit_Default
+        self.ovr_texture = openvr.Texture_t()
+        self.ovr_texture.handle = 0
+        self.ovr_texture.eType = openvr.TextureType_OpenGL
+        self.ovr_texture.eColorSpace = color_space
+        self.properties_modified = None
+
+    def set_render_pose(self, matrix):
+        """
+        Submit the texture together with the HMD pose used to render it, given as a HmdMatrix34_t. This must be used
+        when the texture was not rendered with the pose returned by waitGetPoses().
+        """
+
+        if not self.flags & openvr.Submit_TextureWithPose:
+            ovr_texture = openvr.VRTextureWithPose_t()
+            ovr_texture.handle = self.ovr_texture.handle
+            ovr_texture.eType = self.ovr_texture.eType
+            ovr_texture.eColorSpace = self.ovr_texture.eColorSpace
+            self.ovr_texture = ovr_texture
+            self.flags |= openvr.Submit_TextureWithPose
+        self.ovr_texture.mDeviceToAbsoluteTracking = matrix
+
+    def clear_render_pose(self):
+        """
+        Submit the texture without pose.
+        """
+
+        if self.flags & openvr.Submit_TextureWithPose:
+            ovr_texture = openvr.Texture_t()
+            ovr_texture.handle = self.ovr_texture.handle
+            ovr_texture.eType = self.ovr_texture.eType
+            ovr_texture.eColorSpace = self.ovr_texture.eColorSpace
+            self.ovr_texture = ovr_texture
+            self.flags &= ~openvr.Submit_TextureWithPose
+
+    def set_color_space(self, color_space):
+        """
+        Change the color space of the submitted texture, one of openvr.ColorSpace_*
+        """
+
+        self.ovr_texture.eColorSpace = color_space
+
+    def invalidate(self):
+        """
+        Force the native handle to be resolved again on the next submit.
+        """
+
+        self.properties_modified = None
+
+    def resolve(self, prepared_objects, gsg):
+        """
+        Make sure the native handle of the texture is up to date. This must be called from within the Draw context.
+        Return False if the texture has no native handle.
+        """
+
+        texture = self.texture
+        modified = texture.get_properties_modified()
+        if modified != self.properties_modified or not texture.is_prepared(prepared_objects):
+            texture_context = texture.prepare_now(0, prepared_objects, gsg)
+            self.ovr_texture.handle = texture_context.get_native_id() if texture_context is not None else 0
+            if self.ovr_texture.handle != 0:
+                self.properties_modified = modified
+        return self.ovr_texture.handle != 0
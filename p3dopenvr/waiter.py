@@ -0,0 +1,93 @@
+import atexit
+import ctypes
+import openvr
+import threading
+import time
+
+class PoseWaiter:
+    """
+    Worker thread calling the blocking waitGetPoses() of the compositor, off the App thread.
+
+    The wait for the next frame is requested once the last eye has been submitted. The worker then blocks in
+    waitGetPoses(), releasing the GIL, while the App thread runs the tasks of the next frame. The poses are written
+    into the back buffer of a pair of pose arrays, which is published once the wait is over. The App thread copies
+    the published buffer when it needs the poses, as the worker only writes into the other buffer and does not start
+    a new wait until requested, no lock is needed.
+    """
+
+    def __init__(self, compositor, count=openvr.k_unMaxTrackedDeviceCount):
+        self.compositor = compositor
+        poses_t = openvr.TrackedDevicePose_t * count
+        self.buffers = (poses_t(), poses_t())
+        self.size = ctypes.sizeof(poses_t)
+        self.front = 0
+        self.sequence = 0
+        self.acquired = 0
+        self.wait_time = 0.0
+        self.waiting = False
+        self.request = threading.Event()
+        self.ready = threading.Event()
+        self.running = True
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name='openvr-wait-poses', daemon=True)
+        self.thread.start()
+        # Make sure the worker is stopped before OpenVR is shut down
+        atexit.register(self.stop)
+
+    def run(self):
+        while True:
+            self.request.wait()
+            self.request.clear()
+            if not self.running:
+                break
+            back = 1 - self.front
+            start = time.perf_counter()
+            try:
+                self.compositor.waitGetPoses(self.buffers[back], None)
+            except Exception as e:
+                # The error is reraised on the App thread
+                self.error = e
+            self.wait_time = time.perf_counter() - start
+            self.front = back
+            self.sequence += 1
+            self.waiting = False
+            self.ready.set()
+
+    def request_wait(self):
+        """
+        Start the wait for the next frame, this is called once the last eye of the current frame has been submitted.
+        """
+
+        if self.waiting:
+            return
+        self.waiting = True
+        self.ready.clear()
+        self.request.set()
+
+    def acquire(self, poses, timeout=0.1):
+        """
+        Wait for the poses of the requested frame and copy them into the given array of poses.
+        If no wait has been requested, e.g. because nothing was submitted, a new wait is started.
+        Return False if no new poses were available within the timeout, the previous poses are then kept.
+        """
+
+        if self.sequence == self.acquired and not self.waiting:
+            self.request_wait()
+        if not self.ready.wait(timeout):
+            return False
+        if self.error is not None:
+            error = self.error
+            self.error = None
+            raise error
+        ctypes.memmove(poses, self.buffers[self.front], self.size)
+        self.acquired = self.sequence
+        return True
+
+    def stop(self):
+        """
+        Stop the worker thread once the current wait is over.
+        """
+
+        self.running = False
+        self.request.set()
+        self.thread.join(1.0)
@@ -19,19 +19,20 @@ class ActionsDemo:
         ovr.identify_application(os.path.join(main_dir, "actions.vrmanifest"), "p3dopenvr.demo.actions", force=True)
 
         # Load the actions manifest, it must be the same as the manifest referenced in the application manifest
-        ovr.load_action_manifest(os.path.join(main_dir, "../manifest/actions.json"))
+        # All the handles of the actions are resolved when the manifest is loaded.
+        actions = ovr.load_action_manifest(os.path.join(main_dir, "../manifest/actions.json"))
 
         # Use the '/actions/default' action set. This action set will be updated each frame
         ovr.add_action_set("/actions/default")
 
         # Get the handle of the action '/actions/default/out/Haptic'. This hande will be used to trigger the haptic vibration.
-        self.action_haptic = ovr.vr_input.getActionHandle('/actions/default/out/Haptic')
+        self.action_haptic = actions.default.Haptic
 
         # Get the handle of the action '/actions/default/in/Pose'. This hande will be used to update the position of the hands.
-        hands_pose = ovr.vr_input.getActionHandle('/actions/default/in/Pose')
+        hands_pose = actions.default.Pose
 
         # Get the handle of the action '/actions/default/in/GrabGrip'. This hande will be used to retrieve the data of the action.
-        self.action_grip = ovr.vr_input.getActionHandle('/actions/default/in/GrabGrip')
+        self.action_grip = actions.default.GrabGrip
 
         # Create the representation of the left hand and attach a simple box on it
         self.left_hand = LeftHand(ovr, "box", hands_pose)
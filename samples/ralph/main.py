@@ -38,11 +38,11 @@ class RoamingRalphDemo(ShowBase):
         # We force it in case it has changed.
         self.ovr.identify_application(os.path.join(main_dir, "ralph.vrmanifest"), "p3dopenvr.demo.ralph", force=True)
         # Load the actions manifest, it must be the same as the manifest referenced in the application manifest
-        self.ovr.load_action_manifest(os.path.join(main_dir, "manifest/actions.json"))
+        actions = self.ovr.load_action_manifest(os.path.join(main_dir, "manifest/actions.json"))
         # Use the '/actions/platformer' action set. This action set will be updated each frame
         self.ovr.add_action_set("/actions/platformer")
         # Get the handle of the action '/actions/platformer/in/Move'. This hande will be used to retrieve the data of the action.
-        self.action_move = self.ovr.vr_input.getActionHandle('/actions/platformer/in/Move')
+        self.action_move = actions.platformer.Move
 
         # Set the background color to black
         self.win.setClearColor((0, 0, 0, 1))
@@ -20,18 +20,19 @@ class SkeletonDemo:
         ovr.identify_application(os.path.join(main_dir, "skeleton.vrmanifest"), "p3dopenvr.demo.skeleton", force=True)
 
         # Load the actions manifest, it must be the same as the manifest referenced in the application manifest
-        ovr.load_action_manifest(os.path.join(main_dir, "../manifest/actions.json"))
+        # All the handles of the actions are resolved when the manifest is loaded.
+        actions = ovr.load_action_manifest(os.path.join(main_dir, "../manifest/actions.json"))
 
         # Use the '/actions/default' action set. This action set will be updated each frame
         ovr.add_action_set("/actions/default")
 
         # Get the handle of the action '/actions/default/in/Pose'. This hande will be used to update the position of the hands.
-        hands_pose = ovr.vr_input.getActionHandle('/actions/default/in/Pose')
+        hands_pose = actions.default.Pose
 
         # Get the handle of the skeleton actions. These handle will be used to update the
         # animation of the hands
-        left_hand_skeleton_input = ovr.vr_input.getActionHandle('/actions/default/in/SkeletonLeftHand')
-        right_hand_skeleton_input = ovr.vr_input.getActionHandle('/actions/default/in/SkeletonRightHand')
+        left_hand_skeleton_input = actions.default.SkeletonLeftHand
+        right_hand_skeleton_input = actions.default.SkeletonRightHand
 
         # Create the representation of the left hand and attach a skinned hand model to it
         self.left_hand = LeftHand(ovr, "models/vr_glove_left_model.glb", hands_pose)
@@ -0,0 +1,36 @@
+"""
+Resolution of the action manifest with the simulated OpenVR runtime.
+"""
+
+import json
+import pytest
+
+pytest.importorskip('panda3d.core')
+openvr = pytest.importorskip('openvr')
+
+from p3dopenvr.actions import ActionManifest
+from p3dopenvr.simulated import SimulatedBackend
+
+def load_manifest(tmp_path, actions):
+    filename = tmp_path / 'actions.json'
+    with open(filename, 'w') as manifest_file:
+        json.dump({'action_sets': [{'name': '/actions/default'}], 'actions': actions}, manifest_file)
+    backend = SimulatedBackend(pace=False)
+    backend.init(openvr.VRApplication_Scene)
+    return ActionManifest(backend.VRInput(), str(filename))
+
+def test_resolve_actions(tmp_path):
+    manifest = load_manifest(tmp_path, [{'name': '/actions/default/in/GrabGrip', 'type': 'boolean'},
+                                        {'name': '/actions/default/in/Pose', 'type': 'pose'}])
+    assert manifest.default.GrabGrip is manifest.get_action('/actions/default/in/GrabGrip')
+    assert manifest.default.boolean.GrabGrip is manifest.default.GrabGrip
+    assert manifest.default.pose.Pose.type == 'pose'
+
+@pytest.mark.parametrize('name', ['handle', 'path', 'name', 'boolean', 'skeleton', 'register_actions'])
+def test_action_name_collision(tmp_path, name):
+    with pytest.raises(ValueError):
+        load_manifest(tmp_path, [{'name': '/actions/default/in/' + name, 'type': 'boolean'}])
+
+def test_unknown_action_type(tmp_path):
+    with pytest.raises(ValueError):
+        load_manifest(tmp_path, [{'name': '/actions/default/in/Grab', 'type': 'button'}])
@@ -0,0 +1,53 @@
+"""
+Cull bounds restricted to the area visible from the simulated HMD.
+"""
+
+import pytest
+
+pytest.importorskip('panda3d.core')
+openvr = pytest.importorskip('openvr')
+
+from panda3d.core import load_prc_file_data, BoundingSphere, BoundingVolume, PerspectiveLens, LPoint3
+
+from p3dopenvr.p3dopenvr import P3DOpenVR
+from p3dopenvr.simulated import SimulatedBackend
+
+@pytest.fixture(scope='module')
+def base():
+    load_prc_file_data('', 'window-type offscreen\naudio-library-name null')
+    from direct.showbase.ShowBase import ShowBase
+    base = ShowBase()
+    yield base
+    base.destroy()
+
+def make_cull_bounds(base, cut):
+    backend = SimulatedBackend(pace=False)
+    make_hidden_area_mesh = backend.make_hidden_area_mesh
+    backend.make_hidden_area_mesh = lambda eye, mesh_type: make_hidden_area_mesh(eye, mesh_type, cut)
+    ovr = P3DOpenVR(base=base, verbose=False, backend=backend)
+    ovr.vr_system = backend.init(openvr.VRApplication_Scene)
+    lens = PerspectiveLens()
+    lens.set_fov(90, 90)
+    lens.set_near_far(0.1, 100)
+    return ovr.get_visible_cull_bounds(openvr.Eye_Left, lens.get_projection_mat())
+
+def is_visible(bounds, x, z):
+    # Small sphere 10 units in front of the camera, x and z are given in clip space
+    sphere = BoundingSphere(LPoint3(x * 10, 10, z * 10), 0.05)
+    return (bounds.contains(sphere) & BoundingVolume.IF_some) != 0
+
+def test_corners_culled(base):
+    bounds = make_cull_bounds(base, 0.2)
+    assert is_visible(bounds, 0, 0)
+    assert is_visible(bounds, 0.9, 0)
+    assert is_visible(bounds, 0, -0.9)
+    # The visible octagon cuts the corners at 0.4 from the edges of the clip space
+    for (x, z) in ((0.9, 0.9), (-0.9, 0.9), (0.9, -0.9), (-0.9, -0.9)):
+        assert not is_visible(bounds, x, z)
+    assert is_visible(bounds, 0.7, 0.7)
+
+def test_no_cut(base):
+    bounds = make_cull_bounds(base, 0.0)
+    for (x, z) in ((0, 0), (0.9, 0.9), (-0.9, -0.9)):
+        assert is_visible(bounds, x, z)
+    assert not is_visible(bounds, 1.5, 0)
@@ -0,0 +1,22 @@
+"""
+Lifetime of the watchdog thread of the flight recorder.
+"""
+
+import pytest
+
+pytest.importorskip('panda3d.core')
+
+from p3dopenvr.flightrecorder import FlightRecorder
+
+def test_watchdog_without_budget():
+    recorder = FlightRecorder(None, size=4, budget_ms=None, watchdog=True)
+    assert recorder.watchdog is None
+    recorder.stop()
+
+def test_watchdog_stopped():
+    recorder = FlightRecorder(None, size=4, budget_ms=10.0, watchdog=True)
+    watchdog = recorder.watchdog
+    assert watchdog.is_alive()
+    recorder.stop()
+    assert not watchdog.is_alive()
+    assert recorder.watchdog is None
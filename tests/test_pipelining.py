@@ -0,0 +1,46 @@
+"""
+Run the simulated OpenVR runtime under each threading model of Panda3D and check the submitted frames.
+
+Each threading model is run in its own process by the pipelining harness, as the threading model must be configured
+before the window is opened.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('panda3d.core')
+pytest.importorskip('openvr')
+
+main_dir = os.path.dirname(os.path.abspath(__file__))
+harness = os.path.join(main_dir, '..', 'benchmarks', 'pipelining.py')
+
+def run_model(model, frames=60, warmup=10, extra_args=()):
+    command = [sys.executable, harness, '--run', model, '--frames', str(frames), '--warmup', str(warmup)]
+    command.extend(extra_args)
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.join(main_dir, '..'), env.get('PYTHONPATH')]))
+    output = subprocess.run(command, env=env, stdout=subprocess.PIPE, universal_newlines=True, timeout=300).stdout
+    for line in reversed(output.splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    pytest.fail("The run of the threading model {!r} failed".format(model))
+
+@pytest.mark.parametrize('model', ['', 'Cull', '/Draw', 'Cull/Draw'])
+def test_threading_model(model):
+    result = run_model(model)
+    assert result['protocol_errors'] == 0, result['last_protocol_error']
+    assert result['incomplete_frames'] == 0
+    assert result['pose_mismatches'] == 0
+    assert result['bounds_mismatches'] == 0
+    assert result['pipelined'] == (result['depth'] > 0)
+    assert result['ok']
+
+@pytest.mark.parametrize('model', ['', 'Cull/Draw'])
+def test_explicit_timing(model):
+    result = run_model(model, extra_args=('--explicit-timing', '--post-present-handoff'))
+    assert result['protocol_errors'] == 0, result['last_protocol_error']
+    assert result['ok']
@@ -0,0 +1,58 @@
+"""
+Deferral of the low priority jobs of the phases of the frame scheduler.
+"""
+
+import time
+
+from p3dopenvr.scheduler import Phase
+
+class FakeTask:
+    def set_sort(self, sort):
+        pass
+
+class FakeTaskManager:
+    def add(self, func, name, sort=0):
+        return FakeTask()
+
+    def remove(self, task):
+        pass
+
+class FakeBase:
+    def __init__(self):
+        self.taskMgr = FakeTaskManager()
+
+class FakeOpenVR:
+    def __init__(self):
+        self.base = FakeBase()
+
+class FakeScheduler:
+    def __init__(self):
+        self.ovr = FakeOpenVR()
+        self.overruns = []
+
+    def report_overrun(self, phase):
+        self.overruns.append(phase.last_time_ms)
+
+def test_low_jobs_within_budget():
+    phase = Phase(FakeScheduler(), 'test', 0, budget_ms=100.0)
+    calls = []
+    phase.add_job(lambda: calls.append('normal'))
+    phase.add_job(lambda: calls.append('low'), priority=Phase.low)
+    phase.run()
+    assert calls == ['normal', 'low']
+    assert phase.deferrals == 0
+
+def test_low_jobs_not_starved():
+    scheduler = FakeScheduler()
+    phase = Phase(scheduler, 'test', 0, budget_ms=1.0)
+    calls = []
+    # The normal job alone exhausts the budget each frame
+    phase.add_job(lambda: time.sleep(0.002))
+    for name in ('a', 'b', 'c'):
+        phase.add_job(calls.append, name=name, priority=Phase.low, extra_args=(name, ))
+    for frame in range(6):
+        phase.run()
+    # The oldest deferred job is called each frame, so each low priority job is called in turn
+    assert calls == ['a', 'b', 'c', 'a', 'b']
+    assert phase.deferrals > 0
+    assert len(scheduler.overruns) == 6
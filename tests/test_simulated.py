@@ -0,0 +1,131 @@
+"""
+Drive the simulated OpenVR runtime through the frame protocol and replay a recorded session.
+"""
+
+import pytest
+
+openvr = pytest.importorskip('openvr')
+
+from p3dopenvr.simulated import SimulatedBackend, make_pose_matrix
+from p3dopenvr.recorder import RecordingBackend, ReplayBackend, encode_result
+
+poses_t = openvr.TrackedDevicePose_t * openvr.k_unMaxTrackedDeviceCount
+
+def make_texture(handle):
+    texture = openvr.Texture_t()
+    texture.handle = handle
+    texture.eType = openvr.TextureType_OpenGL
+    texture.eColorSpace = openvr.ColorSpace_Gamma
+    return texture
+
+def get_hmd_pose(poses):
+    return tuple(tuple(row) for row in poses[openvr.k_unTrackedDeviceIndex_Hmd].mDeviceToAbsoluteTracking.m)
+
+def run_frames(backend, frames):
+    """
+    Run the given number of frames through the backend, submitting both eyes, and return the HMD pose of each frame.
+    """
+
+    backend.init(openvr.VRApplication_Scene)
+    compositor = backend.VRCompositor()
+    poses = poses_t()
+    textures = {openvr.Eye_Left: make_texture(1), openvr.Eye_Right: make_texture(2)}
+    hmd_poses = []
+    for i in range(frames):
+        compositor.waitGetPoses(poses, None)
+        hmd_poses.append(get_hmd_pose(poses))
+        for (eye, texture) in textures.items():
+            compositor.submit(eye, texture)
+    return hmd_poses
+
+def make_backend():
+    backend = SimulatedBackend(refresh_rate=90.0, render_size=(64, 64), pace=False)
+    backend.set_device_pose(openvr.k_unTrackedDeviceIndex_Hmd, lambda t: make_pose_matrix(t, 1.7, 0, yaw=t))
+    return backend
+
+def test_simulated_frames():
+    backend = make_backend()
+    hmd_poses = run_frames(backend, 10)
+    compositor = backend.compositor
+    assert compositor.protocol_errors == 0, compositor.last_protocol_error
+    assert compositor.frame_index == 10
+    assert len(compositor.submits) == 20
+    # The simulated time advances by one refresh period per frame
+    assert hmd_poses[-1][0][3] - hmd_poses[0][0][3] == pytest.approx(9 / 90.0)
+
+def test_protocol_errors():
+    backend = make_backend()
+    backend.init(openvr.VRApplication_Scene)
+    compositor = backend.VRCompositor()
+    texture = make_texture(1)
+    compositor.submit(openvr.Eye_Left, texture)
+    assert compositor.protocol_errors == 1
+    compositor.waitGetPoses(poses_t(), None)
+    compositor.submit(openvr.Eye_Left, texture)
+    compositor.submit(openvr.Eye_Left, texture)
+    assert compositor.protocol_errors == 2
+
+def test_record_replay(tmp_path):
+    filename = str(tmp_path / 'session.p3dvr')
+    recorder = RecordingBackend(filename, make_backend())
+    recorded_poses = run_frames(recorder, 10)
+    recorder.close()
+    replay = ReplayBackend(filename)
+    assert replay.get_frame_count() == 10
+    replayed_poses = run_frames(replay, 10)
+    replay.shutdown()
+    assert replayed_poses == recorded_poses
+
+def run_session(backend, frames):
+    """
+    Run the given number of frames through the backend, polling the events and the action data and retrieving the
+    frame timing, and return the data received in each frame.
+    """
+
+    backend.init(openvr.VRApplication_Scene)
+    system = backend.VRSystem()
+    compositor = backend.VRCompositor()
+    vr_input = backend.VRInput()
+    grip = vr_input.getActionHandle('/actions/default/in/GrabGrip')
+    trigger = vr_input.getActionHandle('/actions/default/in/Trigger')
+    action_sets = (openvr.VRActiveActionSet_t * 1)()
+    action_sets[0].ulActionSet = vr_input.getActionSetHandle('/actions/default')
+    poses = poses_t()
+    event = openvr.VREvent_t()
+    texture = make_texture(1)
+    session = []
+    for i in range(frames):
+        compositor.waitGetPoses(poses, None)
+        events = []
+        while system.pollNextEvent(event):
+            events.append((event.eventType, event.trackedDeviceIndex))
+        vr_input.updateActionState(action_sets)
+        digital = vr_input.getDigitalActionData(grip, openvr.k_ulInvalidInputValueHandle)
+        analog = vr_input.getAnalogActionData(trigger, openvr.k_ulInvalidInputValueHandle)
+        result, timing = compositor.getFrameTiming(0)
+        session.append((get_hmd_pose(poses), events, digital.bActive, digital.bState, analog.x,
+                        result, timing.m_nFrameIndex, timing.m_flTotalRenderGpuMs))
+        compositor.submit(openvr.Eye_Left, texture)
+        compositor.submit(openvr.Eye_Right, texture)
+    return session
+
+def test_record_replay_frame_data(tmp_path):
+    filename = str(tmp_path / 'session.p3dvr')
+    backend = make_backend()
+    backend.set_action('/actions/default/in/GrabGrip', lambda t: int(t * 90) % 3 == 0, '/user/hand/right')
+    backend.set_action('/actions/default/in/Trigger', lambda t: t, '/user/hand/right')
+    backend.queue_event(openvr.VREvent_IpdChanged)
+    backend.queue_event(openvr.VREvent_TrackedDeviceUpdated, 1)
+    recorder = RecordingBackend(filename, backend)
+    recorded = run_session(recorder, 10)
+    recorder.close()
+    assert recorded[0][1] == [(openvr.VREvent_IpdChanged, 0), (openvr.VREvent_TrackedDeviceUpdated, 1)]
+    assert any(frame[5] for frame in recorded)
+    replay = ReplayBackend(filename)
+    replayed = run_session(replay, 10)
+    replay.shutdown()
+    assert replayed == recorded
+
+def test_record_unsupported_result():
+    with pytest.raises(TypeError):
+        encode_result(object(), ())